@@ -10,6 +10,7 @@ from .core.avmsig import WHY_HANDLING_ERR, WHY_ERROR
 from .core.abuiltins import init_builtins
 from .core.pyexec import exec_pyc_main
 from .core.alex import Lex
+from .core.asource import open_source
 from .core.aparser import Parser, ASTConverter
 from .core.acompiler import Compiler
 from .core.avm import Interpreter, InterpreterWrapper
@@ -21,7 +22,7 @@ from ._config import (
 
 from . import _config
 
-_HELP = r''' ail [filename] [--help | -h]'''
+_HELP = r''' ail [--engine table | switch] [-O] [filename] [--help | -h]'''
 
 
 class _Option:
@@ -30,6 +31,7 @@ class _Option:
         self.filename = ''
         self.rest_args = []
         self.source = False
+        self.vm_mode = False  # 不走 pyc 模式, 用 AIL 虚拟机执行
 
 
 class ArgParser:
@@ -90,6 +92,23 @@ class ArgParser:
         aconfig.OLD_PRINT = True
         self.__ok = True
 
+    def _do_O(self, opt: _Option):
+        aconfig.OPTIMIZE = True
+        # pyc 模式不经过 AIL 编译器, 所以 -O 也意味着不走 pyc 模式
+        opt.vm_mode = True
+        self.__ok = True
+
+    def _do_engine(self, opt: _Option):
+        n = self.__next_arg()
+        if n not in ('table', 'switch'):
+            print('--engine: engine must be \'table\' or \'switch\'')
+            self.__ok = False
+            return
+        aconfig.VM_ENGINE = n
+        # engine 只对 AIL 虚拟机有效, 所以 --engine 意味着不走 pyc 模式
+        opt.vm_mode = True
+        self.__ok = True
+
     def parse(self, arg_list: list) -> _Option:
         option = _Option()
         self.__now_arg_list = arg_list
@@ -152,13 +171,14 @@ def _launch_main(argv: list, pyc_mode: bool = True) -> int:
     init_builtins()
 
     option = ArgParser().parse(argv)
-    option.rest_args.insert(0, option.filename)
-    shared.GLOBAL_SHARED_DATA.prog_argv = option.rest_args
-    sys.argv = option.rest_args
 
     if option is None:
         return 1
 
+    option.rest_args.insert(0, option.filename)
+    shared.GLOBAL_SHARED_DATA.prog_argv = option.rest_args
+    sys.argv = option.rest_args
+
     if option.shell_mode:
         from .core import ashell
         ashell.Shell().run_shell()
@@ -177,13 +197,13 @@ def _launch_main(argv: list, pyc_mode: bool = True) -> int:
         if not os.path.exists(file_path):
             raise FileNotFoundError('file \'%s\' not found' % file_path)
 
-        source = open(file_path, encoding='UTF-8').read()
-
-        if pyc_mode and not source_mode:
-            MAIN_INTERPRETER_STATE.global_interpreter = InterpreterWrapper()
-            return exec_pyc_main(source, file_path, dict())
+        with open_source(file_path) as source:
+            if pyc_mode and not source_mode and not option.vm_mode:
+                MAIN_INTERPRETER_STATE.global_interpreter = InterpreterWrapper()
+                return exec_pyc_main(source, file_path, dict())
 
-        ast = Parser().parse(Lex().lex(source), source, file_path, source_mode)
+            ast = Parser().parse(
+                    Lex().lex_stream(source), source, file_path, source_mode)
         if source_mode:
             try:
                 import astunparse
@@ -86,7 +86,7 @@ def func_locals():
     """
     frame_stack = MAIN_INTERPRETER_STATE.frame_stack
     if len(frame_stack) > 0:
-        return amap.convert_to_ail_map(frame_stack[-1].variable)
+        return amap.convert_to_ail_map(frame_stack[-1].get_variables())
     return AILRuntimeError('No frame found', 'VMError')
 
 
@@ -501,8 +501,8 @@ def func_hash(o):
     return hash(o)
 
 
-true = objs.ObjectCreater.new_object(abool.BOOL_TYPE, 1)
-false = objs.ObjectCreater.new_object(abool.BOOL_TYPE, 0)
+true = abool.get_bool(1)
+false = abool.get_bool(0)
 
 BUILTINS = {}
 BUILTINS_NAMESPACE = Namespace('builtins', BUILTINS)
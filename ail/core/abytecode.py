@@ -1,11 +1,14 @@
+import marshal
 import pickle
 
+from math import copysign
 from types import CodeType
-from typing import List, Set
+from typing import Dict, List, Set
 
 from . import aobjects as obj
 
 from .aconfig import BYTE_CODE_SIZE
+from .aopcode import QUICKENED_OPS, FORWARD_JUMP_OPS, SETUP_BLOCK_OPS
 
 from ..objects import (
     string  as astr,
@@ -19,6 +22,182 @@ from ..objects import (
 from ..objects.null import null
 
 
+# .ailc 文件格式: MAGIC + 格式版本 + marshal 数据
+AILC_MAGIC = b'AILC'
+AILC_FORMAT_VERSION = 4
+
+_CONST_STR = 0
+_CONST_INT = 1
+_CONST_FLOAT = 2
+_CONST_BOOL = 3
+_CONST_NULL = 4
+_CONST_ARRAY = 5
+_CONST_CODE = 6
+
+_CONST_TYPE_MAP = {
+    _CONST_STR: astr.STRING_TYPE,
+    _CONST_INT: aint.INTEGER_TYPE,
+    _CONST_FLOAT: afloat.FLOAT_TYPE,
+    _CONST_BOOL: abool.BOOL_TYPE,
+}
+
+# 常量表中 null 的键 (null 只有一个, 所有 null 常量共用一个槽)
+_NULL_CONST_KEY = ('null',)
+
+
+class SerializeError(Exception):
+    pass
+
+
+def _const_to_tuple(const) -> tuple:
+    if const is null:
+        return (_CONST_NULL,)
+
+    if isinstance(const, obj.AILCodeObject):
+        return (_CONST_CODE, _code_object_to_tuple(const))
+
+    if not isinstance(const, obj.AILObject):
+        raise SerializeError('cannot serialize const %s' % repr(const))
+
+    ctype = const['__class__']
+
+    if ctype is array.ARRAY_TYPE:
+        return (_CONST_ARRAY, tuple(
+            _const_to_tuple(x) for x in const['__value__']))
+
+    for tag, t in _CONST_TYPE_MAP.items():
+        if ctype is t:
+            return (tag, const['__value__'])
+
+    raise SerializeError('cannot serialize const %s' % repr(const))
+
+
+def _new_const(target: obj.AILObjectType, const) -> obj.AILObject:
+    # 常量使用池中的对象 (小整数, 布尔值, 驻留字符串)
+    if target is astr.STRING_TYPE:
+        return astr.intern_string(const)
+    elif target is aint.INTEGER_TYPE:
+        return aint.get_integer(const)
+    elif target is abool.BOOL_TYPE:
+        return abool.get_bool(const)
+    return obj.ObjectCreater.new_object(target, const)
+
+
+def _const_key(const):
+    """
+    常量表的键: (类型, 值), 1 与 1.0, 0.0 与 -0.0 相等, 但不能共用一个常量
+    :return: 键, 不共用的常量 (数组, 代码对象等) 返回 None
+    """
+    t = type(const)
+
+    if t is float:
+        return t, const, copysign(1.0, const)
+    if t is str or t is int or t is bool:
+        return t, const
+    if const is null:
+        return _NULL_CONST_KEY
+    return None
+
+
+def _tuple_to_const(t: tuple, filename: str):
+    tag = t[0]
+
+    if tag == _CONST_NULL:
+        return null
+
+    if tag == _CONST_CODE:
+        return _tuple_to_code_object(t[1], filename)
+
+    if tag == _CONST_ARRAY:
+        return obj.ObjectCreater.new_object(
+            array.ARRAY_TYPE,
+            [_tuple_to_const(x, filename)['__value__'] for x in t[1]])
+
+    return _new_const(_CONST_TYPE_MAP[tag], t[1])
+
+
+def _dequicken(bytecodes: list) -> tuple:
+    # 虚拟机运行时特化的字节码不写入缓存
+    bc = list(bytecodes)
+    for i in range(0, len(bc), BYTE_CODE_SIZE):
+        bc[i] = QUICKENED_OPS.get(bc[i], bc[i])
+    return tuple(bc)
+
+
+def _code_object_to_tuple(cobj: obj.AILCodeObject) -> tuple:
+    return (
+        tuple(_const_to_tuple(c) for c in cobj.consts),
+        tuple(cobj.varnames),
+        _dequicken(cobj.bytecodes),
+        cobj.firstlineno,
+        cobj.argcount,
+        cobj.name,
+        tuple(cobj.lnotab),
+        tuple(cobj.lineno_list),
+        cobj.closure,
+        cobj.is_main,
+        tuple(cobj.global_names) if cobj.global_names is not None else None,
+        tuple(cobj.nonlocal_names)
+            if cobj.nonlocal_names is not None else None,
+        cobj.var_arg,
+        cobj.doc_string,
+        cobj._function_signature,
+        tuple(cobj.fast_locals),
+    )
+
+
+def _tuple_to_code_object(t: tuple, filename: str) -> obj.AILCodeObject:
+    (consts, varnames, bytecodes, firstlineno, argcount, name, lnotab,
+     lineno_list, closure, is_main, global_names, nonlocal_names,
+     var_arg, doc_string, signature, fast_locals) = t
+
+    cobj = obj.AILCodeObject(
+        [_tuple_to_const(c, filename) for c in consts],
+        list(varnames), bytecodes, firstlineno, filename, argcount,
+        name, list(lnotab), lineno_list, closure, is_main,
+        global_names=global_names, nonlocal_names=nonlocal_names)
+
+    cobj.var_arg = var_arg
+    cobj.doc_string = doc_string
+    cobj._function_signature = signature
+    cobj.fast_locals = frozenset(fast_locals)
+
+    return cobj
+
+
+def dump_code_object(cobj: obj.AILCodeObject, extra=None) -> bytes:
+    """
+    将 code object 序列化为字节
+    :param extra: 附加数据 (必须能被 marshal 序列化), 由调用者自行校验
+    :raise SerializeError: 若 code object 中有无法序列化的常量
+    """
+    data = marshal.dumps((extra, _code_object_to_tuple(cobj)))
+    return AILC_MAGIC + bytes([AILC_FORMAT_VERSION]) + data
+
+
+def load_code_object(data: bytes, filename: str, with_extra: bool = False):
+    """
+    从 dump_code_object 生成的字节中恢复 code object
+    :return: code object (with_extra 为 True 时返回 (extra, code object))
+             若数据无效则返回 None
+    """
+    head_size = len(AILC_MAGIC) + 1
+
+    if data[:len(AILC_MAGIC)] != AILC_MAGIC or \
+            data[len(AILC_MAGIC):head_size] != bytes([AILC_FORMAT_VERSION]):
+        return None
+
+    try:
+        extra, t = marshal.loads(data[head_size:])
+        cobj = _tuple_to_code_object(t, filename)
+    except (EOFError, ValueError, TypeError, KeyError, IndexError):
+        return None
+
+    if with_extra:
+        return extra, cobj
+    return cobj
+
+
 class LineNumberTableGenerator:
     def __init__(self):
         self.__lnotab: List[int] = []
@@ -62,12 +241,27 @@ class LineNumberTableGenerator:
         self.__update_lnotab()
 
 
+class Label:
+    """
+    字节码中的位置, 用 ByteCode.mark 标记,
+    作为跳转或块处理地址的参数, 在 ByteCode.assemble 时解析为偏移量
+    """
+    __slots__ = ('offset',)
+
+    def __init__(self):
+        self.offset = None
+
+
 class ByteCode:
     """表示字节码序列"""
 
     def __init__(self, blist=None):
         self.blist = blist if blist is not None else list()
         self.lineno_list = list()
+        # 以下三个列表在用到时才创建 (大部分 ByteCode 不含跳转)
+        self.labels = None  # [(偏移量, Label)]
+        self.jumps = None  # [(偏移量, Label)], 参数为 Label 的字节码
+        self.fragments = None  # [(偏移量, labels, jumps, fragments)], 子序列的 Label
 
     def to_bytes(self) -> bytes:
         return bytes(self.blist)
@@ -76,20 +270,75 @@ class ByteCode:
         self.blist += [opcode, argv]
         self.lineno_list.append(lineno)
 
+    def add_jump(self, opcode: int, label: Label, lineno: int):
+        """
+        添加跳转到 label 的字节码 (绝对跳转或 SETUP_BLOCK_OPS)
+        """
+        if self.jumps is None:
+            self.jumps = []
+        self.jumps.append((len(self.blist), label))
+        self.add_bytecode(opcode, 0, lineno)
+
+    def mark(self, label: Label):
+        """
+        将 label 标记在下一条字节码处
+        """
+        if self.labels is None:
+            self.labels = []
+        self.labels.append((len(self.blist), label))
+
+    def assemble(self):
+        """
+        解析所有 Label, 填入跳转的参数
+        向前的跳转改用对应的相对跳转 (见 FORWARD_JUMP_OPS)
+        """
+        blist = self.blist
+        jumps = []
+
+        # 子序列在 += 时不移动偏移量, 在这里一次性加上
+        stack = [(0, self.labels, self.jumps, self.fragments)]
+        while stack:
+            base, labels, frag_jumps, fragments = stack.pop()
+
+            for ofs, label in labels or ():
+                label.offset = base + ofs
+            for ofs, label in frag_jumps or ():
+                jumps.append((base + ofs, label))
+            for ofs, *frag in fragments or ():
+                stack.append((base + ofs, *frag))
+
+        for ofs, label in jumps:
+            target = label.offset
+            assert target is not None, 'unmarked label'
+
+            op = blist[ofs]
+
+            if op not in SETUP_BLOCK_OPS and target > ofs and \
+                    op in FORWARD_JUMP_OPS:
+                blist[ofs] = FORWARD_JUMP_OPS[op]
+                blist[ofs + 1] = target - ofs
+            else:
+                blist[ofs + 1] = target
+
+        self.labels = self.jumps = self.fragments = None
+
     def __add__(self, b: 'ByteCode'):
-        bc = ByteCode(self.blist + b.blist)
-        bc.lineno_list = self.lineno_list + b.lineno_list
+        bc = ByteCode()
+        bc += self
+        bc += b
+        return bc
 
     def __iadd__(self, b: 'ByteCode'):
+        if b.labels or b.jumps or b.fragments:
+            if self.fragments is None:
+                self.fragments = []
+            self.fragments.append(
+                (len(self.blist), b.labels, b.jumps, b.fragments))
+
         self.blist += b.blist
         self.lineno_list.extend(b.lineno_list)
         return self
 
-    # @debugger.debug_python_runtime
-    def __setattr__(self, n, v):
-        # print('attr set %s = %s' % (n, v))
-        super().__setattr__(n, v)
-
 
 class ByteCodeFileBuffer:
     """
@@ -108,12 +357,17 @@ class ByteCodeFileBuffer:
         self.filename = '<FILE>'
         self.global_names: Set[str] = set()
         self.nonlocal_names: Set[str] = set()
+        self.fast_locals: Set[int] = set()
+
+        # 常量 / 名称 -> 在 consts / varnames 中的下标
+        self.__const_index: Dict[tuple, int] = {}
+        self.__varname_index: Dict[str, int] = {}
 
     def serialize(self) -> bytes:
         """
         将这个Buffer里的数据转换为字节码
         """
-        pass
+        return dump_code_object(self.code_object)
 
     def add_const(self, const) -> int:
         """
@@ -121,6 +375,13 @@ class ByteCodeFileBuffer:
             将const加入到self.consts中
         :return: const 在 self.consts 中的index
         """
+        key = _const_key(const)
+
+        if key is not None:
+            index = self.__const_index.get(key)
+            if index is not None:
+                return index
+
         # convert const to ail object
         target = {
             str: astr.STRING_TYPE,
@@ -132,41 +393,47 @@ class ByteCodeFileBuffer:
 
         allowed_type = (obj.AILCodeObject,)
 
-        if const != null:
+        if const is not null:
             if target == awrapper.WRAPPER_TYPE and type(const) in allowed_type:
                 ac = const
             else:
-                ac = obj.ObjectCreater.new_object(target, const)
+                ac = _new_const(target, const)
         else:
             ac = null
 
-        if ac not in self.consts:
-            self.consts.append(ac)
+        index = len(self.consts)
+        self.consts.append(ac)
+
+        if key is not None:
+            self.__const_index[key] = index
 
-        return self.consts.index(ac)
+        return index
 
     def get_varname_index(self, name: str):
-        return self.varnames.index(name) \
-            if name in self.varnames \
-            else None
+        return self.__varname_index.get(name)
 
     def get_or_add_varname_index(self, name: str):
         """
         若 name 不存在 varname，则先加入到varname再返回
         :return: index of name in self.varnames
         """
+        index = self.__varname_index.get(name)
 
-        if name not in self.varnames:
+        if index is None:
+            index = self.__varname_index[name] = len(self.varnames)
             self.varnames.append(name)
-        return self.varnames.index(name)
+
+        return index
 
     @property
     def code_object(self) -> obj.AILCodeObject:
-        return obj.AILCodeObject(self.consts, self.varnames, self.bytecodes.blist,
+        cobj = obj.AILCodeObject(self.consts, self.varnames, self.bytecodes.blist,
                                  self.lnotab.firstlineno, self.filename, self.argcount,
                                  self.name, self.lnotab.table, tuple(self.lineno_list),
                                  global_names=tuple(self.global_names),
                                  nonlocal_names=tuple(self.nonlocal_names))
+        cobj.fast_locals = frozenset(self.fast_locals)
+        return cobj
 
     def dump_obj(self):
         """
@@ -0,0 +1,153 @@
+# bytecode cache
+
+import hashlib
+import marshal
+import os
+import os.path
+
+from importlib.util import MAGIC_NUMBER
+from types import CodeType
+
+from . import aconfig
+from .abytecode import dump_code_object, load_code_object, SerializeError
+from .asource import MappedSource
+from .version import AIL_VERSION
+
+'''
+模块编译后的 code object 会缓存在源文件同目录下的 __ailcache__ 中
+缓存以 (AIL 版本, 源文件 mtime, 大小, 哈希) 作为键, 任一不符即失效
+开启优化 (-O) 时编译出的 code object 缓存为 .opt.ailc
+
+pyc 模式下编译出的 Python code object 缓存为 .ailpyc
+以 (AIL 版本, 格式版本, Python magic number, 文件名, 哈希) 作为键
+'''
+
+PYC_CACHE_MAGIC = b'AILP'
+
+# ASTConverter 或 afold 生成的代码改变时递增 (同 abytecode.AILC_FORMAT_VERSION)
+PYC_FORMAT_VERSION = 1
+
+
+def get_cache_path(source_path: str, suffix: str = '.ailc') -> str:
+    dirname, basename = os.path.split(os.path.abspath(source_path))
+    return os.path.join(
+        dirname, aconfig.BYTE_CODE_CACHE_DIR, basename + suffix)
+
+
+def code_cache_suffix() -> str:
+    return '.opt.ailc' if aconfig.OPTIMIZE else '.ailc'
+
+
+def source_hash(source) -> str:
+    if isinstance(source, MappedSource):
+        return hashlib.sha1(source.buffer).hexdigest()
+    return hashlib.sha1(source.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def source_key(source_path: str, source: str) -> tuple:
+    st = os.stat(source_path)
+
+    return (AIL_VERSION, st.st_mtime_ns, st.st_size, source_hash(source))
+
+
+def pycode_key(filename: str, source: str) -> tuple:
+    return (AIL_VERSION, PYC_FORMAT_VERSION, MAGIC_NUMBER,
+            filename, source_hash(source))
+
+
+def read_cache(cache_path: str) -> bytes:
+    """
+    :return: 缓存文件内容, 若无法读取则返回 None
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_cache(cache_path: str, data: bytes) -> bool:
+    """
+    写入缓存文件, 失败时 (如目录只读) 静默忽略
+    """
+    tmp_path = '%s.%s.tmp' % (cache_path, os.getpid())
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+    return True
+
+
+def load_cached_code(source_path: str, source: str):
+    """
+    :return: 缓存的 code object, 若缓存不存在或已失效则返回 None
+    """
+    if not aconfig.BYTE_CODE_CACHE:
+        return None
+
+    data = read_cache(get_cache_path(source_path, code_cache_suffix()))
+    if data is None:
+        return None
+
+    r = load_code_object(data, source_path, with_extra=True)
+    if r is None:
+        return None
+
+    key, cobj = r
+    if key != source_key(source_path, source):
+        return None
+
+    return cobj
+
+
+def cache_code(source_path: str, source: str, cobj) -> bool:
+    if not aconfig.BYTE_CODE_CACHE:
+        return False
+
+    try:
+        data = dump_code_object(cobj, source_key(source_path, source))
+    except (SerializeError, ValueError, OSError):
+        return False
+
+    return write_cache(
+        get_cache_path(source_path, code_cache_suffix()), data)
+
+
+def load_cached_pycode(filename: str, source: str) -> CodeType:
+    """
+    :return: 缓存的 Python code object, 若缓存不存在或已失效则返回 None
+    """
+    if not aconfig.BYTE_CODE_CACHE or not os.path.isfile(filename):
+        return None
+
+    data = read_cache(get_cache_path(filename, '.ailpyc'))
+    if data is None or data[:len(PYC_CACHE_MAGIC)] != PYC_CACHE_MAGIC:
+        return None
+
+    try:
+        key, code = marshal.loads(data[len(PYC_CACHE_MAGIC):])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+    if key != pycode_key(filename, source) or not isinstance(code, CodeType):
+        return None
+
+    return code
+
+
+def cache_pycode(filename: str, source: str, code: CodeType) -> bool:
+    if not aconfig.BYTE_CODE_CACHE or not os.path.isfile(filename):
+        return False
+
+    data = PYC_CACHE_MAGIC + marshal.dumps((pycode_key(filename, source), code))
+
+    return write_cache(get_cache_path(filename, '.ailpyc'), data)
@@ -15,12 +15,16 @@ from .tokentype import (
 from .abytecode import (
     ByteCode,
     ByteCodeFileBuffer,
+    Label,
     LineNumberTableGenerator,
 )
 
 from .aconfig import BYTE_CODE_SIZE
+from .afold import fold_constants
+from .apeephole import optimize
 
 from . import (
+    aconfig,
     aobjects as obj,
     aobjects as objs,
     asts as ast,
@@ -71,6 +75,12 @@ _assign_op_map = {
     AIL_INP_BIN_AND: inplace_bin_and,
 }
 
+# 含有这些字节码的函数会通过名称访问 (或捕获) 局部变量, 不能使用 fast locals
+_NO_FAST_LOCALS_OPS = frozenset((
+    make_function, build_class, load_module, load_varname, bind_function,
+    input_value, store_struct,
+))
+
 _cell_action_map = {
     AIL_NUMBER: lambda n: convert_numeric_str_to_number(n),
     AIL_STRING: lambda s: s
@@ -99,7 +109,8 @@ def _make_function_signature(tree: ast.FunctionDefineAST):
 
 class Compiler:
     def __init__(self, mode=COMPILER_MODE_MAIN, filename='<DEFAULT>',
-                 ext_varname: tuple = (), name: str = COMPILE_MAIN_NAME):
+                 ext_varname: tuple = (), name: str = COMPILE_MAIN_NAME,
+                 fast_locals: bool = True):
         self.__general_bytecode = ByteCode()
         self.__buffer = ByteCodeFileBuffer()
 
@@ -121,6 +132,10 @@ class Compiler:
         self.__filename = filename
         self.__ext_varname = ext_varname
         self.__name = name
+        self.__fast_locals = fast_locals
+
+        self.__expr_table = self.__make_expr_table()
+        self.__stmt_table = self.__make_stmt_table()
 
         self.__init_ext_varname(ext_varname)
 
@@ -169,58 +184,68 @@ class Compiler:
     def __get_operator(self, op: str):
         return _opcode_map[op]
 
-    def __compile_binary_expr(self, tree: ast.AddSubExprAST, is_attr=False,
-                              is_single=False) -> ByteCode:
+    def __compile_cell_expr(self, tree: ast.CellAST, is_attr=False) -> ByteCode:
         bc = ByteCode()
 
-        # 先递归处理 left，然后再递归处理right
-
-        if isinstance(tree, ast.CellAST):
-            s, i = self.__do_cell_ast(tree)
-
-            bc.add_bytecode(
-                load_const if s == 0 else (load_attr if is_attr else load_variable),
-                i, tree.ln)
-
-            return bc
-
-        elif isinstance(tree, ast.AssignExprAST):
-            return self.__compile_assign_expr(tree, is_single)
-
-        elif isinstance(tree, ast.CallExprAST):
-            bc += self.__compile_call_expr(tree)
-
-        elif isinstance(tree, ast.DefineExprAST):
-            bc += self.__compile_assign_expr(tree, single=False)
-
-        elif isinstance(tree, ast.SubscriptExprAST):
-            bc += self.__compile_subscript_expr(tree)
+        s, i = self.__do_cell_ast(tree)
 
-        elif isinstance(tree, ast.ArrayAST):
-            bc += self.__compile_array_expr(tree)
+        bc.add_bytecode(
+            load_const if s == 0 else (load_attr if is_attr else load_variable),
+            i, tree.ln)
 
-        elif isinstance(tree, ast.MapAST):
-            bc += self.__compile_map_expr(tree)
+        return bc
 
-        elif isinstance(tree, ast.MemberAccessAST):
-            bc += self.__compile_member_access_expr(tree)
+    def __make_expr_table(self) -> list:
+        """
+        表达式的分派表, 以 AST 的 kind 为下标
+        处理函数形如 f(tree, is_attr, is_single) -> ByteCode,
+        为 None 的按二元表达式 (left, right) 处理
+        """
+        table = [None] * len(ast.AST_KINDS)
+
+        for ast_type, handler in (
+                (ast.CellAST,
+                    lambda t, a, s: self.__compile_cell_expr(t, a)),
+                (ast.AssignExprAST,
+                    lambda t, a, s: self.__compile_assign_expr(t, s)),
+                (ast.CallExprAST,
+                    lambda t, a, s: self.__compile_call_expr(t)),
+                (ast.DefineExprAST,
+                    lambda t, a, s: self.__compile_assign_expr(t, single=False)),
+                (ast.SubscriptExprAST,
+                    lambda t, a, s: self.__compile_subscript_expr(t)),
+                (ast.ArrayAST,
+                    lambda t, a, s: self.__compile_array_expr(t)),
+                (ast.MapAST,
+                    lambda t, a, s: self.__compile_map_expr(t)),
+                (ast.MemberAccessAST,
+                    lambda t, a, s: self.__compile_member_access_expr(t)),
+                (ast.UnaryExprAST,
+                    lambda t, a, s: self.__compile_unary_expr(t, s)),
+                (ast.TestExprAST,
+                    lambda t, a, s: self.__compile_test_expr(t)),
+                (ast.FunctionDefineAST,
+                    lambda t, a, s: self.__compile_function(
+                        t, anonymous_function=True)),
+                (ast.TupleAST,
+                    lambda t, a, s: self.__compile_tuple_expr(t)),
+                ):
+            table[ast_type.kind] = handler
+
+        return table
 
-        elif isinstance(tree, ast.AssignExprAST):
-            bc += self.__compile_assign_expr(tree, single=is_single)
+    def __compile_binary_expr(self, tree: ast.AddSubExprAST, is_attr=False,
+                              is_single=False) -> ByteCode:
+        handler = self.__expr_table[tree.kind]
 
-        elif isinstance(tree, ast.UnaryExprAST):
-            bc += self.__compile_unary_expr(tree, is_single)
+        if handler is not None:
+            return handler(tree, is_attr, is_single)
 
-        elif isinstance(tree, ast.TestExprAST):
-            return self.__compile_test_expr(tree, 0)
-
-        elif isinstance(tree, ast.FunctionDefineAST):
-            bc += self.__compile_function(tree, anonymous_function=True)
+        bc = ByteCode()
 
-        elif isinstance(tree, ast.TupleAST):
-            bc += self.__compile_tuple_expr(tree)
+        # 先递归处理 left，然后再递归处理right
 
-        elif type(tree.left) in ast.BINARY_AST_TYPES:
+        if type(tree.left) in ast.BINARY_AST_TYPES:
             bc += self.__compile_binary_expr(tree.left)
 
         # right
@@ -440,7 +465,15 @@ class Compiler:
                                  is_attr=False, store=False) -> ByteCode:
         bc = ByteCode()
 
-        lc = self.__compile_binary_expr(tree.left, is_attr=is_attr)
+        if not store and self.__is_const_array(tree.left):
+            # 只读的常量数组, 直接作为常量载入
+            lc = ByteCode()
+            lc.add_bytecode(load_const, self.__buffer.add_const(
+                [_cell_action_map[item.type](item.value)
+                 for item in tree.left.items.item_list]), tree.left.ln)
+        else:
+            lc = self.__compile_binary_expr(tree.left, is_attr=is_attr)
+
         ec = self.__compile_binary_expr(tree.expr)
 
         bc += lc
@@ -450,6 +483,17 @@ class Compiler:
 
         return bc
 
+    def __is_const_array(self, tree) -> bool:
+        if not isinstance(tree, ast.ArrayAST):
+            return False
+
+        for item in tree.items.item_list:
+            if not isinstance(item, ast.CellAST) or \
+                    (item.type != AIL_NUMBER and item.type != AIL_STRING):
+                return False
+
+        return True
+
     def __compile_array_expr(self, tree: ast.ArrayAST) -> ByteCode:
         bc = ByteCode()
 
@@ -532,7 +576,7 @@ class Compiler:
 
         return bc
 
-    def __compile_try_catch_expr(self, tree: ast.TryCatchStmtAST, extofs: int = 0):
+    def __compile_try_catch_expr(self, tree: ast.TryCatchStmtAST):
         # structure of try-catch-finally block:
         # ? setup_finally:  $finally block  (has finally)   +
         # ? setup_try:      $catch block    (has catch)     +
@@ -557,140 +601,46 @@ class Compiler:
         #   end_finally                                     +
 
         bc = ByteCode()
-        clbc = ByteCode()
 
         has_finally = len(tree.finally_block.stmts) > 0
         has_catch = len(tree.catch_block.stmts) > 0
         if not has_finally:
             assert has_catch  # otherwise, this try block is meaningless.
 
-        head_extofs = extofs + \
-                      BYTE_CODE_SIZE * (int(has_finally) + int(has_catch))
-
-        try_block_extofs = head_extofs
+        catch_label = Label()
+        over_catch_label = Label()
+        finally_label = Label()
 
         name_index = self.__buffer.get_or_add_varname_index(tree.name)
 
-        try_bc = self.__compile_block(tree.try_block, try_block_extofs)
-        catch_bc = ByteCode()
-        finally_bc = ByteCode()
-
-        catch_block_extofs = head_extofs + \
-                             len(try_bc.blist) + \
-                             BYTE_CODE_SIZE * (
-                                int(has_catch)    # jump_absolute $over catch
-                             ) * 2 + \
-                             BYTE_CODE_SIZE  # setup_catch
-
-        if has_catch:
-            catch_bc = self.__compile_block(tree.catch_block, catch_block_extofs)
-        else:
-            catch_block_extofs -= BYTE_CODE_SIZE  # -setup_catch
-
-        finally_block_extofs = catch_block_extofs + (
-            BYTE_CODE_SIZE * 2 if has_finally else 0)
-        # push_none and pop_finally
-        if has_catch:
-            finally_block_extofs += len(catch_bc.blist) + \
-                                    BYTE_CODE_SIZE  # pop_catch
-
-        if has_finally:
-            finally_bc = self.__compile_block(
-                    tree.finally_block, finally_block_extofs)
-        
-        whole_extofs = finally_block_extofs + len(finally_bc.blist) + \
-                       BYTE_CODE_SIZE  # pop_finally
-
-        # build block bytecode
-        
-        to_finally = finally_block_extofs - BYTE_CODE_SIZE  # -pop_finally
-        jump_to_finally = finally_block_extofs - (
-                          (BYTE_CODE_SIZE * 2) if has_finally else 0 )
-                          # push_none and pop_finally
-        to_catch = catch_block_extofs - BYTE_CODE_SIZE  # setup_catch
-        
         if has_finally:
-            bc.add_bytecode(setup_finally, to_finally, -1)
+            bc.add_jump(setup_finally, finally_label, -1)
         if has_catch:
-            bc.add_bytecode(setup_try, to_catch, -1)
+            bc.add_jump(setup_try, catch_label, -1)
 
-        bc += try_bc 
+        bc += self.__compile_block(tree.try_block)
 
         if has_catch:
             bc.add_bytecode(pop_try, 0, -1)
-            bc.add_bytecode(jump_absolute, jump_to_finally, -1)
+            bc.add_jump(jump_absolute, over_catch_label, -1)
 
+            bc.mark(catch_label)
             bc.add_bytecode(setup_catch, name_index, -1)
-            bc += catch_bc
+            bc += self.__compile_block(tree.catch_block)
             bc.add_bytecode(pop_catch, 0, -1)
 
+        bc.mark(over_catch_label)
+
         if has_finally:
             bc.add_bytecode(push_none, 0, -1)
+            bc.mark(finally_label)
             bc.add_bytecode(pop_finally, 0, -1)
-            bc += finally_bc
+            bc += self.__compile_block(tree.finally_block)
             bc.add_bytecode(end_finally, 0, -1)
 
         return bc
 
-    def __compile_try_catch_expr0(self,
-                                  tree: ast.TryCatchStmtAST, extofs: int = 0):
-        bc = ByteCode()
-        clbc = ByteCode()  # clean err variable
-
-        has_finally = len(tree.finally_block.stmts) > 0
-        has_catch = len(tree.catch_block.stmts) > 0
-        extofs += BYTE_CODE_SIZE * (2 if has_finally else 1)  # for setup_try
-
-        ni = self.__buffer.get_or_add_varname_index(tree.name)
-
-        tbc = self.__compile_block(tree.try_block, extofs)
-
-        vi = self.__buffer.add_const(0)
-        clbc.add_bytecode(load_const, vi, -1)
-        clbc.add_bytecode(store_var, ni, -1)
-        clbc.add_bytecode(delete_var, ni, -1)
-
-        cat_ext = extofs + len(tbc.blist) + len(clbc.blist) + BYTE_CODE_SIZE * 3
-        # for setup_catch and jump_absolute
-        cabc = self.__compile_block(tree.catch_block, cat_ext)
-
-        jump_over = cat_ext + len(cabc.blist) + BYTE_CODE_SIZE * 3
-        # for pop_catch load_const, and pop_finally (if it has)
-        to_catch = extofs + len(tbc.blist) + BYTE_CODE_SIZE * (
-                3 if has_finally else 2) 
-        # for load_const (if necessary), jump_absolute and setup_try
-
-        if has_finally:
-            fnbc = self.__compile_block(tree.finally_block, jump_over)
-        else:
-            fnbc = ByteCode()
-
-        if has_finally:
-            bc.add_bytecode(setup_finally, fn_ext, tree.ln)
-
-        if has_catch:
-            bc.add_bytecode(setup_try, to_catch, tree.ln)
-            bc += tbc
-            bc.add_bytecode(pop_try, 0, -1)
-
-        if has_finally:
-            bc.add_bytecode(load_const, self.__buffer.add_const(null), -1)
-        
-        if has_catch:
-            bc.add_bytecode(jump_absolute, jump_over, -1)
-            bc.add_bytecode(setup_catch, ni, -1)
-            bc += cabc
-            bc += clbc
-            bc.add_bytecode(pop_catch, 0, -1)
-        
-        if has_finally:
-            bc.add_bytecode(pop_finally, 0, -1)
-
-        bc += fnbc
-
-        return bc
-
-    def __compile_comp_expr(self, tree: ast.CmpTestAST, extofs: int = 0) -> ByteCode:
+    def __compile_comp_expr(self, tree: ast.CmpTestAST) -> ByteCode:
         bc = ByteCode()
 
         # left
@@ -708,7 +658,7 @@ class Compiler:
             return self.__compile_call_expr(tree)
 
         elif isinstance(tree, ast.TestExprAST):
-            return self.__compile_test_expr(tree, extofs)
+            return self.__compile_test_expr(tree)
 
         elif type(tree.left) in ast.BINARY_AST_TYPES:
             bc += self.__compile_binary_expr(tree.left)
@@ -728,65 +678,43 @@ class Compiler:
 
         return bc
 
-    def __compile_not_test_expr(self, tree: ast.NotTestAST, extofs: int = 0):
+    def __compile_not_test_expr(self, tree: ast.NotTestAST):
         bc = ByteCode()
 
         if isinstance(tree, ast.NotTestAST):
-            bce = self.__compile_comp_expr(tree.expr, extofs)
+            bce = self.__compile_comp_expr(tree.expr)
             bc += bce
             bc.add_bytecode(binary_not, 0, tree.ln)
 
             return bc
-        return self.__compile_comp_expr(tree, extofs)
-
-    def __compile_or_expr(self, tree: ast.AndTestAST, extofs: int = 0) -> ByteCode:
-        """
-        extofs : 当 and 不成立约过的除右部以外的字节码偏移量
-                 当为 0 时，则不处理extofs
-        """
-        bc = ByteCode()
+        return self.__compile_comp_expr(tree)
 
+    def __compile_or_expr(self, tree: ast.AndTestAST) -> ByteCode:
         if isinstance(tree, ast.AndTestAST):
-            return self.__compile_and_expr(tree, extofs)
+            return self.__compile_and_expr(tree)
         if isinstance(tree, ast.NotTestAST):
-            return self.__compile_not_test_expr(tree, extofs)
+            return self.__compile_not_test_expr(tree)
         if isinstance(tree, ast.TestExprAST):
-            return self.__compile_test_expr(tree, extofs)
+            return self.__compile_test_expr(tree)
         if isinstance(tree.left, ast.TestExprAST):
-            return self.__compile_test_expr(tree.left, extofs)
-
-        lbc = self.__compile_and_expr(tree.left, with_or=True)
+            return self.__compile_test_expr(tree.left)
 
-        rbcl = []
-
-        r_ext = len(lbc.blist) + BYTE_CODE_SIZE
+        bc = self.__compile_and_expr(tree.left)
+        end_label = Label()
 
+        # 任意一项为真时跳到末尾, 该项作为结果
         for rt in tree.right:
-            tbc = self.__compile_and_expr(rt, r_ext)
-            rbcl.append(tbc)
+            bc.add_jump(jump_if_true_or_pop, end_label, -1)
+            bc += self.__compile_and_expr(rt)
 
-        bc += lbc
-
-        for jopc in range(1, len(rbcl) + 1):
-            rbc = rbcl.pop(0)
-            last_ofs = sum([len(x.blist) for x in rbcl]) + len(rbc.blist) + \
-                       BYTE_CODE_SIZE * (len(rbcl) + 1)
-            bc.add_bytecode(jump_forward_true_or_pop, last_ofs, -1)
-            bc += rbc
+        bc.mark(end_label)
 
         return bc
 
-    def __compile_and_expr(self, tree: ast.AndTestAST, extofs: int = 0, with_or=False) -> ByteCode:
-        """
-        extofs : 当 and 不成立约过的除右部以外的字节码偏移量
-                 当为 0 时，则不处理extofs
-        """
-
+    def __compile_and_expr(self, tree: ast.AndTestAST) -> ByteCode:
         if isinstance(tree, ast.NotTestAST):
             return self.__compile_not_test_expr(tree)
 
-        bc = ByteCode()
-
         # similar to or
 
         if type(tree) in ast.BINARY_AST_TYPES:
@@ -796,195 +724,181 @@ class Compiler:
             return self.__compile_comp_expr(tree)
 
         elif isinstance(tree, ast.TestExprAST):
-            return self.__compile_test_expr(tree, extofs)
+            return self.__compile_test_expr(tree)
 
         elif isinstance(tree.left, ast.TestExprAST):
-            return self.__compile_test_expr(tree.left, extofs)
-
-        lbc = self.__compile_not_test_expr(tree.left)
-
-        rbcl = []
+            return self.__compile_test_expr(tree.left)
 
-        r_ext = len(lbc.blist) + BYTE_CODE_SIZE
+        bc = self.__compile_not_test_expr(tree.left)
+        end_label = Label()
 
+        # 任意一项为假时跳到末尾, 该项作为结果
         for rt in tree.right:
-            tbc = self.__compile_not_test_expr(rt, r_ext)
-            rbcl.append(tbc)
+            bc.add_jump(jump_if_false_or_pop, end_label, -1)
+            bc += self.__compile_not_test_expr(rt)
 
-        bc += lbc
-
-        for jopc in range(1, len(rbcl) + 1):
-            rbc = rbcl.pop(0)
-            last_ofs = sum([len(x.blist) for x in rbcl]) + len(rbc.blist) + \
-                       BYTE_CODE_SIZE * (len(rbcl) + 1)
-            bc.add_bytecode(jump_forward_if_false_or_pop, last_ofs, -1)
-            bc += rbc
+        bc.mark(end_label)
 
         return bc
 
-    def __compile_test_expr(self, tree: ast.TestExprAST, extofs: int = 0) -> ByteCode:
-        bc = ByteCode()
-
+    def __compile_test_expr(self, tree: ast.TestExprAST) -> ByteCode:
         if type(tree) in ast.BINARY_AST_TYPES and type(tree) != ast.TestExprAST:
             return self.__compile_binary_expr(tree)
 
         test = tree.test
         
         if isinstance(test, ast.CmpTestAST):
-            return self.__compile_comp_expr(test, extofs)
+            return self.__compile_comp_expr(test)
         else:
-            return self.__compile_or_expr(test, extofs)
+            return self.__compile_or_expr(test)
+
+    def __compile_while_stmt(self, tree: ast.WhileStmtAST):
+        # structure of while loop:
+        #   setup_while:                $end
+        # > loop:
+        #   [test]
+        #   pop_jump_if_false_or_pop:   $exit
+        #   [block]
+        #   jump_absolute:              $loop
+        # > exit:
+        #   pop_loop
+        # > end:
+        #
+        # continue 跳到 $end 前第二条字节码, 即 jump_absolute $loop
 
-    def __compile_while_stmt(self, tree: ast.WhileStmtAST, extofs: int):
         bc = ByteCode()
-        extofs += BYTE_CODE_SIZE
-
-        b = tree.block
-
-        tc = self.__compile_test_expr(tree.test, extofs)
 
-        bcc = self.__compile_block(b, len(tc.blist) + extofs + BYTE_CODE_SIZE)
-        # _byte_code_size for 'setup_while'
+        loop_label = Label()
+        exit_label = Label()
+        end_label = Label()
 
-        jump_over = extofs + len(bcc.blist) + BYTE_CODE_SIZE * 2
-        # three times of _byte_code_size means (
-        #   jump over setup_while, jump over block, jump over jump_absolute)
+        bc.add_jump(setup_while, end_label, -1)
+        bc.mark(loop_label)
+        bc += self.__compile_test_expr(tree.test)
+        bc.add_jump(pop_jump_if_false_or_pop, exit_label, -1)
 
-        tc = self.__compile_test_expr(tree.test, jump_over)
-        # compile again. first time for the length of test opcodes
-        # second time for jump offset
+        bc += self.__compile_block(tree.block)
+        bc.add_jump(jump_absolute, loop_label, -1)
 
-        back = extofs  # move to first opcode in block
-        to = len(bcc.blist) + extofs + len(tc.blist) + BYTE_CODE_SIZE * 2
-        # including setup_while and jump over block
-
-        bc.add_bytecode(setup_while, to + BYTE_CODE_SIZE, -1)
-        # jump over clean_loop
-        bc += tc
-        bc.add_bytecode(pop_jump_if_false_or_pop, to, -1)
-
-        bc += bcc
-        bc.add_bytecode(jump_absolute, back, -1)
+        bc.mark(exit_label)
         bc.add_bytecode(pop_loop, 0, -1)
+        bc.mark(end_label)
 
         return bc
 
-    def __compile_do_loop_stmt(self, tree: ast.DoLoopStmtAST, extofs: int):
-        bc = ByteCode()
+    def __compile_do_loop_stmt(self, tree: ast.DoLoopStmtAST):
+        # structure of do loop:
+        #   setup_doloop:               $end
+        #   jump_absolute:              $block
+        # > test:
+        #   [test]
+        #   pop_jump_if_true_or_pop:    $exit
+        # > block:
+        #   [block]
+        #   jump_absolute:              $test
+        # > exit:
+        #   pop_loop
+        # > end:
 
-        tc = self.__compile_test_expr(tree.test, 0)  # first compile
-
-        loopb_ext = extofs + BYTE_CODE_SIZE  # setup_do_loop
+        bc = ByteCode()
 
-        bcc = self.__compile_block(tree.block, loopb_ext)
+        test_label = Label()
+        block_label = Label()
+        exit_label = Label()
+        end_label = Label()
 
-        jump_over = len(bcc.blist) + len(tc.blist) + extofs + BYTE_CODE_SIZE * 4
+        bc.add_jump(setup_doloop, end_label, -1)
+        bc.add_jump(jump_absolute, block_label, -1)
 
-        bc.add_bytecode(setup_doloop, jump_over + BYTE_CODE_SIZE, -1)  # jump over clean_loop
+        bc.mark(test_label)
+        bc += self.__compile_test_expr(tree.test)
+        bc.add_jump(pop_jump_if_true_or_pop, exit_label, -1)
 
-        test_jump = extofs + len(bcc.blist)
-
-        tc = self.__compile_test_expr(tree.test, test_jump)
- 
-        jump_back = extofs + BYTE_CODE_SIZE * 2  # over setup_doloop and jump_forward
-        bc.add_bytecode(jump_forward, len(tc.blist) + BYTE_CODE_SIZE * 2, -1)
-        bc += tc
-        bc.add_bytecode(pop_jump_if_true_or_pop, jump_over, -1)
-        bc += bcc
-        bc.add_bytecode(jump_absolute, jump_back, -1)
+        bc.mark(block_label)
+        bc += self.__compile_block(tree.block)
+        bc.add_jump(jump_absolute, test_label, -1)
 
+        bc.mark(exit_label)
         bc.add_bytecode(pop_loop, 0, -1)
+        bc.mark(end_label)
 
         return bc
 
-    def __compile_for_stmt(self, tree: ast.ForStmtAST, extofs: int):
+    def __compile_for_stmt(self, tree: ast.ForStmtAST):
+        # structure of for loop:
+        #   setup_for:                  $end
+        #   [init]
+        #   jump_absolute:              $test
+        # > update:
+        #   [update]
+        # > test:
+        #   [test]
+        #   pop_jump_if_false_or_pop:   $exit
+        #   [block]
+        #   jump_absolute:              $update
+        # > exit:
+        #   pop_for
+        # > end:
+
         bc = ByteCode()
 
-        extofs += BYTE_CODE_SIZE  # for init_for
+        update_label = Label()
+        test_label = Label()
+        exit_label = Label()
+        end_label = Label()
 
-        initbc = ByteCode()
+        bc.add_jump(setup_for, end_label, -1)
 
         for et in tree.init_list.expr_list:
-            initbc += self.__compile_assign_expr(et, single=True)
+            bc += self.__compile_assign_expr(et, single=True)
 
-        updbc = ByteCode()
+        bc.add_jump(jump_absolute, test_label, -1)
 
+        bc.mark(update_label)
         for et in tree.update_list.expr_list:
-            updbc += self.__compile_binary_expr(et, is_single=True)
-
-        test_ext = extofs + len(initbc.blist) + len(updbc.blist) + BYTE_CODE_SIZE
-        # _byte_code_size for jump_forward
-
-        jump_back = test_ext - len(updbc.blist)
+            bc += self.__compile_binary_expr(et, is_single=True)
 
+        bc.mark(test_label)
         if tree.test is not None:
-            tbc = self.__compile_test_expr(tree.test, test_ext)
+            bc += self.__compile_test_expr(tree.test)
         else:
-            tbc = ByteCode()
-            tbc.add_bytecode(load_const, self.__buffer.add_const(True), tree.ln)
-
-        block_ext = extofs + len(tbc.blist) + \
-                    len(initbc.blist) + \
-                    len(updbc.blist) + BYTE_CODE_SIZE * 2
-        # _byte_code_size is for jump_if_false_or_pop, setup_for and jump_forward
-
-        blc = self.__compile_block(tree.block, block_ext)
-
-        jump_over = block_ext + len(blc.blist) + BYTE_CODE_SIZE
-
-        bc.add_bytecode(setup_for, jump_over + BYTE_CODE_SIZE, -1)
-        # jump over clean_loop
-        bc += initbc
-        bc.add_bytecode(jump_forward, len(updbc.blist) + BYTE_CODE_SIZE, -1)
-        bc += updbc
-        bc += tbc
-        bc.add_bytecode(pop_jump_if_false_or_pop, jump_over, -1)
-        bc += blc
-        bc.add_bytecode(jump_absolute, jump_back, -1)
+            bc.add_bytecode(load_const, self.__buffer.add_const(True), tree.ln)
+
+        bc.add_jump(pop_jump_if_false_or_pop, exit_label, -1)
+
+        bc += self.__compile_block(tree.block)
+        bc.add_jump(jump_absolute, update_label, -1)
+
+        bc.mark(exit_label)
         bc.add_bytecode(pop_for, 0, -1)
+        bc.mark(end_label)
 
         return bc
 
-    def __compile_if_else_stmt(self, tree: ast.IfStmtAST, extofs: int):
+    def __compile_if_else_stmt(self, tree: ast.IfStmtAST):
         bc = ByteCode()
 
         has_else = len(tree.else_block.stmts) > 0
 
-        tc = self.__compile_test_expr(tree.test, extofs)
+        else_label = Label()
+        end_label = Label()
 
-        ifbc_ext = extofs + len(tc.blist) + BYTE_CODE_SIZE  # jump_if_false_or_pop
+        # 如果拥有 else 则条件为false时跳到else块
 
-        ifbc = self.__compile_block(tree.block, ifbc_ext)
+        bc += self.__compile_test_expr(tree.test)
+        bc.add_jump(pop_jump_if_false_or_pop, else_label, -1)
 
-        jump_over_ifb = len(ifbc.blist) + len(tc.blist) + extofs + BYTE_CODE_SIZE + \
-                        (BYTE_CODE_SIZE if has_else else 0)  # jump_absolute if has else
+        bc += self.__compile_block(tree.block)
 
         if has_else:
-            elbc = self.__compile_block(tree.else_block, jump_over_ifb)
-        else:
-            elbc = ByteCode()
+            bc.add_jump(jump_absolute, end_label, -1)
 
-        # 如果拥有 if 则条件为false时跳到else块
-
-        jump_over = extofs + len(tc.blist) + len(ifbc.blist) \
-                    + len(elbc.blist) + BYTE_CODE_SIZE * (2
-                                                           if has_else
-                                                           else 1)  # + _BYTE_CODE_SIZE
-        # include 'jump_absolute' at the end of ifbc
-        # last _byte_code_size is for 'jump_if_false_or_pop'
+        bc.mark(else_label)
 
         if has_else:
-            ifbc.add_bytecode(jump_absolute, jump_over, -1)
-
-        test_jump = len(tc.blist) + len(ifbc.blist) + extofs + BYTE_CODE_SIZE
-        # 不需要加elbc的长度
-
-        # tc = self.__compile_test_expr(tree.test, test_jump)
-        tc.add_bytecode(pop_jump_if_false_or_pop, test_jump, -1)
+            bc += self.__compile_block(tree.else_block)
 
-        bc += tc
-        bc += ifbc
-        bc += elbc
+        bc.mark(end_label)
 
         return bc
 
@@ -1017,19 +931,18 @@ class Compiler:
         self.__buffer.nonlocal_names.add(tree.name)
         return ByteCode()  # empty
 
-    def __compile_assert_expr(self, tree: ast.AssertStmtAST, extofs: int) -> ByteCode:
+    def __compile_assert_expr(self, tree: ast.AssertStmtAST) -> ByteCode:
         bc = ByteCode()
 
-        ec = self.__compile_test_expr(tree.expr, extofs)
         ci = self.__buffer.add_const('AssertionError')
+        end_label = Label()
 
-        jump = len(ec.blist) + BYTE_CODE_SIZE * 3
-
-        bc += ec
+        bc += self.__compile_test_expr(tree.expr)
 
-        bc.add_bytecode(jump_forward_true_or_pop, jump, -1)
+        bc.add_jump(jump_if_true_or_pop, end_label, -1)
         bc.add_bytecode(load_const, ci, -1)
         bc.add_bytecode(throw_error, 0, tree.ln)
+        bc.mark(end_label)
 
         return bc
 
@@ -1084,7 +997,8 @@ class Compiler:
             tree: ast.FunctionDefineAST, 
             anonymous_function: bool = False,
             just_make: bool = False,
-            doc_string: str = '') -> ByteCode:
+            doc_string: str = '',
+            fast_locals: bool = True) -> ByteCode:
         bc = ByteCode()
 
         signature = _make_function_signature(tree)
@@ -1104,7 +1018,8 @@ class Compiler:
 
         cobj = Compiler(mode=COMPILER_MODE_FUNC, 
                         filename=self.__filename, name=name,
-                        ext_varname=ext).compile(tree.block).code_object
+                        ext_varname=ext,
+                        fast_locals=fast_locals).compile(tree.block).code_object
         cobj.argcount = argc
         cobj.var_arg = var_arg
         cobj._function_signature = signature
@@ -1221,8 +1136,10 @@ class Compiler:
         """
         bc = ByteCode()
         
+        # 类的命名空间就是类定义函数的局部变量, 所以不能使用 fast locals
         func_bc = self.__compile_function(
-            tree.func, just_make=True, doc_string=tree.doc_str)
+            tree.func, just_make=True, doc_string=tree.doc_str,
+            fast_locals=False)
 
         name_const_index = self.__buffer.add_const(tree.name)
         name_var_index = self.__buffer.get_or_add_varname_index(tree.name)
@@ -1241,106 +1158,86 @@ class Compiler:
 
         return bc
 
-    def __compile_block(self, tree: ast.BlockAST, firstoffset=0) -> ByteCode:
-        bc = self.__general_bytecode = ByteCode()
-        last_ln = 0
-        total_offset = firstoffset
-        et = None
-
-        for eti in range(len(tree.stmts)):
-            et = tree.stmts[eti]
-
-            # self.__lnotab.mark(et.ln, total_offset)
-
-            if isinstance(et, ast.InputStmtAST):
-                tbc = self.__compile_input_expr(et)
-
-            elif isinstance(et, ast.PrintStmtAST):
-                tbc = self.__compile_print_expr(et)
-
-            elif isinstance(et, ast.DefineExprAST):
-                tbc = self.__compile_assign_expr(et, single=True)
-
-            elif isinstance(et, ast.IfStmtAST):
-                tbc = self.__compile_if_else_stmt(et, total_offset)
-
-            elif isinstance(et, ast.WhileStmtAST):
-                tbc = self.__compile_while_stmt(et, total_offset)
-
-            elif isinstance(et, ast.DoLoopStmtAST):
-                tbc = self.__compile_do_loop_stmt(et, total_offset)
-
-            elif isinstance(et, ast.FunctionDefineAST):
-                tbc = self.__compile_function(et)
+    def __compile_expr_stmt(self, tree: ast.ExprAST) -> ByteCode:
+        bc = self.__compile_binary_expr(tree, is_single=True)
 
-            elif isinstance(et, ast.ReturnStmtAST):
-                tbc = self.__compile_return_expr(et)
-
-            elif isinstance(et, ast.BreakStmtAST):
-                tbc = self.__compile_break_expr(et)
-
-            elif isinstance(et, ast.ContinueStmtAST):
-                tbc = self.__compile_continue_expr(et)
-
-            elif isinstance(et, ast.CallExprAST):
-                tbc = self.__compile_call_expr(et, plain_call=True)
-
-            elif isinstance(et, ast.LoadStmtAST):
-                tbc = self.__compile_load_stmt(et)
-
-            elif isinstance(et, ast.AssignExprAST):
-                tbc = self.__compile_assign_expr(et, True)
-
-            elif isinstance(et, ast.StructDefineAST):
-                tbc = self.__compile_struct(et)
-
-            elif isinstance(et, ast.ClassDefineAST):
-                tbc = self.__compile_class(et)
-
-            elif isinstance(et, ast.ForStmtAST):
-                tbc = self.__compile_for_stmt(et, total_offset)
-
-            elif isinstance(et, ast.AssertStmtAST):
-                tbc = self.__compile_assert_expr(et, total_offset)
-
-            elif isinstance(et, ast.ThrowStmtAST):
-                tbc = self.__compile_throw_expr(et)
-
-            elif isinstance(et, ast.TryCatchStmtAST):
-                tbc = self.__compile_try_catch_expr(et, total_offset)
-
-            elif isinstance(et, ast.ImportStmtAST):
-                tbc = self.__compile_import_stmt(et)
-
-            elif isinstance(et, ast.GlobalStmtAST):
-                tbc = self.__compile_global_stmt(et)
+        if not self.__is_single_line:
+            bc.add_bytecode(pop_top, 0, -1)
 
-            elif isinstance(et, ast.NonlocalStmtAST):
-                tbc = self.__compile_nonlocal_stmt(et)
+        return bc
 
-            elif isinstance(et, ast.UnaryExprAST):
-                tbc = self.__compile_unary_expr(et, single=True)
+    def __make_stmt_table(self) -> list:
+        """
+        语句的分派表, 以 AST 的 kind 为下标
+        处理函数形如 f(tree) -> ByteCode,
+        跳转的目标使用 Label, 由 compile 最后统一解析 (见 ByteCode.assemble)
+        """
+        table = [None] * len(ast.AST_KINDS)
+
+        for ast_type, handler in (
+                (ast.InputStmtAST,
+                    lambda t: self.__compile_input_expr(t)),
+                (ast.PrintStmtAST,
+                    lambda t: self.__compile_print_expr(t)),
+                (ast.DefineExprAST,
+                    lambda t: self.__compile_assign_expr(t, single=True)),
+                (ast.IfStmtAST, self.__compile_if_else_stmt),
+                (ast.WhileStmtAST, self.__compile_while_stmt),
+                (ast.DoLoopStmtAST, self.__compile_do_loop_stmt),
+                (ast.FunctionDefineAST,
+                    lambda t: self.__compile_function(t)),
+                (ast.ReturnStmtAST,
+                    lambda t: self.__compile_return_expr(t)),
+                (ast.BreakStmtAST,
+                    lambda t: self.__compile_break_expr(t)),
+                (ast.ContinueStmtAST,
+                    lambda t: self.__compile_continue_expr(t)),
+                (ast.CallExprAST,
+                    lambda t: self.__compile_call_expr(t, plain_call=True)),
+                (ast.LoadStmtAST,
+                    lambda t: self.__compile_load_stmt(t)),
+                (ast.AssignExprAST,
+                    lambda t: self.__compile_assign_expr(t, True)),
+                (ast.StructDefineAST,
+                    lambda t: self.__compile_struct(t)),
+                (ast.ClassDefineAST,
+                    lambda t: self.__compile_class(t)),
+                (ast.ForStmtAST, self.__compile_for_stmt),
+                (ast.AssertStmtAST, self.__compile_assert_expr),
+                (ast.ThrowStmtAST,
+                    lambda t: self.__compile_throw_expr(t)),
+                (ast.TryCatchStmtAST, self.__compile_try_catch_expr),
+                (ast.ImportStmtAST,
+                    lambda t: self.__compile_import_stmt(t)),
+                (ast.GlobalStmtAST,
+                    lambda t: self.__compile_global_stmt(t)),
+                (ast.NonlocalStmtAST,
+                    lambda t: self.__compile_nonlocal_stmt(t)),
+                (ast.UnaryExprAST,
+                    lambda t: self.__compile_unary_expr(t, single=True)),
+                ):
+            table[ast_type.kind] = handler
+
+        # 其余的表达式作为表达式语句
+        for ast_type in ast.BINARY_AST_TYPES:
+            if table[ast_type.kind] is None:
+                table[ast_type.kind] = self.__compile_expr_stmt
+
+        return table
+
+    def __compile_block(self, tree: ast.BlockAST) -> ByteCode:
+        bc = self.__general_bytecode = ByteCode()
 
-            elif type(et) in ast.BINARY_AST_TYPES:
-                tbc = self.__compile_binary_expr(et, is_single=True)
+        stmt_table = self.__stmt_table
 
-                if not self.__is_single_line:
-                    tbc.add_bytecode(pop_top, 0, -1)
+        for et in tree.stmts:
+            handler = stmt_table[et.kind]
 
-            else:
+            if handler is None:
                 print('W: Unknown AST type: %s' % type(et))
+                continue
 
-            total_offset += len(tbc.blist)
-
-            if eti + 1 < len(tree.stmts):
-                # self.__lnotab.update(tree.stmts[eti + 1].ln, total_offset)
-                pass
-
-            bc += tbc
-        else:
-            if et:
-                # self.__lnotab.update(et.ln + 1, total_offset)
-                pass
+            bc += handler(et)
 
         return bc
 
@@ -1358,9 +1255,14 @@ class Compiler:
         return bc
 
     def compile(self, astree: ast.BlockAST, single_line=False) -> ByteCodeFileBuffer:
-        self.__init__(self.__mode, self.__filename, self.__ext_varname, self.__name)
+        self.__init__(self.__mode, self.__filename, self.__ext_varname,
+                      self.__name, self.__fast_locals)
         self.__is_single_line = single_line
 
+        # 函数的 block 在编译外层代码时已经折叠过了
+        if self.__mode != COMPILER_MODE_FUNC:
+            astree = fold_constants(astree)
+
         self.__lnotab.firstlineno = astree.stmts[0].ln \
             if isinstance(astree, ast.BlockAST) and astree.stmts \
             else 1
@@ -1369,18 +1271,83 @@ class Compiler:
 
         # if tbc.blist and tbc.blist[-2] != return_value:
         tbc += self.__make_final_return()
+        tbc.assemble()
 
         self.__buffer.bytecodes = tbc
         self.__buffer.first_lineno = astree.ln
         self.__buffer.lineno_list = tbc.lineno_list
 
+        if self.__mode == COMPILER_MODE_FUNC and self.__fast_locals:
+            self.__make_fast_locals(tbc.blist)
+
+        if aconfig.OPTIMIZE:
+            optimize(self.__buffer)
+
+        self.__make_superinstructions(
+            self.__buffer.bytecodes.blist, self.__buffer.lineno_list)
+
         return self.__buffer
 
+    def __make_superinstructions(self, blist: list, lineno_list: list):
+        """
+        将 SUPERINSTRUCTIONS 中的字节码对的第一条改写为超级指令,
+        第二条原样保留, 所以跳转到第二条的代码不受影响
+        两条的行号不同时不改写 (出错时的行号以第一条为准)
+        """
+        i = 0
+        n = len(blist) - BYTE_CODE_SIZE
+
+        while i < n:
+            sop = SUPERINSTRUCTIONS.get((blist[i], blist[i + BYTE_CODE_SIZE]))
+
+            if sop is not None:
+                ln = i // BYTE_CODE_SIZE
+                if lineno_list[ln + 1] in (-1, lineno_list[ln]):
+                    blist[i] = sop
+                    i += BYTE_CODE_SIZE * 2
+                    continue
+
+            i += BYTE_CODE_SIZE
+
+    def __make_fast_locals(self, blist: list):
+        """
+        将函数局部变量的 load_variable / store_var 替换为 load_fast / store_fast
+        局部变量: 参数, 以及在函数中被赋值且未声明为 global / nonlocal 的名称
+        """
+        if not _NO_FAST_LOCALS_OPS.isdisjoint(blist[::2]):
+            return
+
+        buffer = self.__buffer
+        args = self.__ext_varname
+        outer_names = buffer.global_names | buffer.nonlocal_names
+
+        if len(set(args)) != len(args) or not outer_names.isdisjoint(args):
+            return
+
+        varnames = buffer.varnames
+        fast = set(range(len(args)))
+
+        for i in range(0, len(blist), BYTE_CODE_SIZE):
+            if blist[i] in (store_var, setup_catch, delete_var) and \
+                    varnames[blist[i + 1]] not in outer_names:
+                fast.add(blist[i + 1])
+
+        for i in range(0, len(blist), BYTE_CODE_SIZE):
+            op = blist[i]
+            if blist[i + 1] in fast:
+                if op == store_var:
+                    blist[i] = store_fast
+                elif op == load_variable:
+                    blist[i] = load_fast
+
+        buffer.fast_locals = fast
+
     def __test(self, tree) -> ByteCodeFileBuffer:
-        bc = self.__compile_block(tree, 0)
+        bc = self.__compile_block(tree)
 
         if bc.blist[-2] != return_value:
             bc += self.__make_final_return()
+        bc.assemble()
         self.__buffer.bytecodes = bc
 
         return self.__buffer
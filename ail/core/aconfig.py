@@ -19,3 +19,17 @@ PY_RUNTIME_IMPORT_NAME = 'ail.py_runtime'
 
 RENAME_PY_RUNTIME = True
 
+
+BYTE_CODE_CACHE = True  # cache compiled modules (.ailc)
+
+BYTE_CODE_CACHE_DIR = '__ailcache__'
+
+MMAP_SOURCE_SIZE = 1 << 20  # source files of at least this size are mmap-ed, 0: never
+
+PARSER_MEMO = True  # memoize sub-expressions that the parser re-parses after backtracking
+
+LEX_ENGINE = 'regex'  # 'regex' (master regex) | 'char' (char by char)
+
+OPTIMIZE = False  # run the peephole optimizer on compiled bytecode, -O runs the VM
+
+VM_ENGINE = 'table'  # 'table' (dispatch table) | 'switch' (if/elif chain), --engine runs the VM
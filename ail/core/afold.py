@@ -0,0 +1,343 @@
+# 常量折叠
+
+import operator
+
+from math import isfinite
+
+from . import asts as ast
+from .tokentype import AIL_IDENTIFIER, AIL_NUMBER, AIL_STRING
+
+'''
+在 AST 上做的常量折叠, 虚拟机的 Compiler 与 ASTConverter 共用:
+    60 * 60 * 24        ->  86400
+    'prefix' + 'suffix' ->  'prefixsuffix'
+    -1                  ->  -1 (常量, 而不是 unary_negative)
+    not true            ->  false
+    1 < 2               ->  true
+    1 and x             ->  x
+
+折叠的结果必须与虚拟机运行时的结果一致:
+    数字的运算与虚拟机一样直接使用 Python 的运算 ('/' 为真除法),
+    运算出错 (除零, 溢出等), 结果不是有限的 int / float 或者太大时都不折叠,
+    留到运行时报错;
+    字符串只折叠 '+';
+    比较只折叠两个数字或两个字符串的单个比较 (a < b < c 为 (a < b) < c);
+    true / false 只参与 not, and, or
+常量数组由 Compiler 在只读 (被直接取下标) 时作为常量载入
+'''
+
+__all__ = ['fold_constants']
+
+_MAX_INT_BITS = 128  # 折叠得到的整数最多这么多位
+_MAX_STR_LENGTH = 4096  # 折叠得到的字符串最长这么长
+
+_NUMBER_OPS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    'mod': operator.mod,
+    '**': operator.pow,
+    '<<': operator.lshift,
+    '>>': operator.rshift,
+    '&': operator.and_,
+    '|': operator.or_,
+    '^': operator.xor,
+}
+
+_COMPARE_OPS = {
+    '==': operator.eq,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+    '!=': operator.ne,
+}
+
+_UNARY_OPS = {
+    '-': operator.neg,
+    '~': operator.invert,
+}
+
+_LITERAL_TRUTH = {'true': True, 'false': False}
+
+_TEST_AST_TYPES = (
+    ast.AndTestAST, ast.OrTestAST, ast.NotTestAST, ast.CmpTestAST)
+
+_NOT_A_CONST = object()
+
+
+def _const_value(tree):
+    """
+    :return: 数字或字符串常量的值, 不是则返回 _NOT_A_CONST
+    """
+    if type(tree) is not ast.CellAST:
+        return _NOT_A_CONST
+
+    if tree.type == AIL_STRING:
+        return tree.value
+
+    if tree.type == AIL_NUMBER:
+        # 与编译器载入数字常量时的转换方式一致
+        from .acompiler import convert_numeric_str_to_number
+
+        v = convert_numeric_str_to_number(tree.value)
+        if type(v) in (int, float):
+            return v
+
+    return _NOT_A_CONST
+
+
+def _const_truth(tree):
+    """
+    :return: 常量 (包括 true / false) 的真值, 不是常量则返回 None
+    """
+    if type(tree) is ast.CellAST and tree.type == AIL_IDENTIFIER:
+        return _LITERAL_TRUTH.get(tree.value)
+
+    v = _const_value(tree)
+    if v is _NOT_A_CONST:
+        return None
+    return bool(v)
+
+
+def _make_const(value, ln: int) -> ast.CellAST:
+    if type(value) is bool:
+        return ast.CellAST('true' if value else 'false', AIL_IDENTIFIER, ln)
+    if type(value) is str:
+        return ast.CellAST(value, AIL_STRING, ln)
+    return ast.CellAST(repr(value), AIL_NUMBER, ln)
+
+
+def _is_small_number(v) -> bool:
+    t = type(v)
+
+    if t is int:
+        return v.bit_length() <= _MAX_INT_BITS
+
+    return t is float and isfinite(v)
+
+
+def _too_large(op: str, a, b) -> bool:
+    """
+    避免在编译期算出巨大的整数 (如 2 ** 100000000)
+    """
+    if type(a) is not int or type(b) is not int:
+        return False
+
+    if op == '**':
+        return b > 0 and a.bit_length() * b > _MAX_INT_BITS
+    if op == '<<':
+        return b > 0 and a.bit_length() + b > _MAX_INT_BITS
+    if op == '*':
+        return a.bit_length() + b.bit_length() > _MAX_INT_BITS + 1
+
+    return False
+
+
+def _binary_op(op: str, a, b):
+    """
+    :return: 常量 a op b 的值, 不能折叠则返回 _NOT_A_CONST
+    """
+    if type(a) is str or type(b) is str:
+        if op == '+' and type(a) is str and type(b) is str and \
+                len(a) + len(b) <= _MAX_STR_LENGTH:
+            return a + b
+        return _NOT_A_CONST
+
+    py_op = _NUMBER_OPS.get(op)
+
+    if py_op is None or _too_large(op, a, b):
+        return _NOT_A_CONST
+
+    try:
+        res = py_op(a, b)
+    except Exception:
+        return _NOT_A_CONST
+
+    return res if _is_small_number(res) else _NOT_A_CONST
+
+
+def _fold_children(tree):
+    for name in _CHILD_SLOTS[tree.kind]:
+        child = getattr(tree, name, None)
+
+        if isinstance(child, ast.BaseAST):
+            new = _fold(child)
+            if new is not child:
+                setattr(tree, name, new)
+
+        elif type(child) is list:
+            for i, item in enumerate(child):
+                if isinstance(item, ast.BaseAST):
+                    child[i] = _fold(item)
+                elif type(item) is tuple:
+                    child[i] = tuple(
+                        _fold(x) if isinstance(x, ast.BaseAST) else x
+                        for x in item)
+
+    return tree
+
+
+def _fold_binary_expr(tree):
+    """
+    运算从左到右进行, 所以只折叠左边的常量前缀: 60 * 60 * x -> 3600 * x
+    """
+    _fold_children(tree)
+
+    value = _const_value(tree.left)
+    if value is _NOT_A_CONST:
+        return tree
+
+    right = tree.right
+    n = 0
+
+    for op, rtree in right:
+        b = _const_value(rtree)
+        if b is _NOT_A_CONST:
+            break
+
+        res = _binary_op(op, value, b)
+        if res is _NOT_A_CONST:
+            break
+        value = res
+        n += 1
+
+    if n == 0:
+        return tree
+
+    if n == len(right):
+        return _make_const(value, tree.ln)
+
+    tree.left = _make_const(value, tree.ln)
+    tree.right = right[n:]
+
+    return tree
+
+
+def _fold_unary_expr(tree):
+    py_op = _UNARY_OPS.get(tree.op)
+
+    if py_op is None:  # ++ / --
+        return tree
+
+    _fold_children(tree)
+
+    value = _const_value(tree.right_expr)
+
+    # 虚拟机只对 int / float 取负, 只对 int 取反
+    if type(value) is int or (type(value) is float and tree.op == '-'):
+        res = py_op(value)
+        if _is_small_number(res):
+            return _make_const(res, tree.ln)
+
+    return tree
+
+
+def _fold_not_test(tree):
+    _fold_children(tree)
+
+    truth = _const_truth(tree.expr)
+    if truth is None:
+        return tree
+
+    return _make_const(not truth, tree.expr.ln)
+
+
+def _fold_cmp_test(tree):
+    _fold_children(tree)
+
+    if len(tree.right) != 1:
+        return tree
+
+    op, rtree = tree.right[0]
+    a = _const_value(tree.left)
+    b = _const_value(rtree)
+
+    if a is _NOT_A_CONST or b is _NOT_A_CONST or \
+            (type(a) is str) != (type(b) is str):
+        return tree
+
+    py_op = _COMPARE_OPS.get(op)
+    if py_op is None:
+        return tree
+
+    return _make_const(py_op(a, b), tree.ln)
+
+
+def _fold_bool_test(tree, is_and: bool):
+    """
+    去掉开头不影响结果的常量: 1 and x -> x, 0 or x -> x, 0 and x -> 0
+    """
+    _fold_children(tree)
+
+    operands = [tree.left] + tree.right
+
+    while len(operands) > 1:
+        truth = _const_truth(operands[0])
+        if truth is None:
+            break
+        if truth != is_and:  # 短路
+            return operands[0]
+        operands.pop(0)
+
+    if len(operands) == 1:
+        return operands[0]
+
+    tree.left = operands[0]
+    tree.right = operands[1:]
+
+    return tree
+
+
+def _fold_test_expr(tree):
+    _fold_children(tree)
+
+    # 与 Parser 一致, 不是逻辑表达式时不包在 TestExprAST 里
+    if type(tree.test) not in _TEST_AST_TYPES:
+        return tree.test
+
+    return tree
+
+
+def _make_fold_table() -> list:
+    table = [_fold_children] * len(ast.AST_KINDS)
+
+    for ast_type in ast.BIN_OP_AST:
+        table[ast_type.kind] = _fold_binary_expr
+
+    for ast_type, handler in (
+            (ast.CellAST, lambda t: t),
+            (ast.UnaryExprAST, _fold_unary_expr),
+            (ast.NotTestAST, _fold_not_test),
+            (ast.CmpTestAST, _fold_cmp_test),
+            (ast.AndTestAST, lambda t: _fold_bool_test(t, True)),
+            (ast.OrTestAST, lambda t: _fold_bool_test(t, False)),
+            (ast.TestExprAST, _fold_test_expr),
+            ):
+        table[ast_type.kind] = handler
+
+    return table
+
+
+def _child_slots(ast_type) -> tuple:
+    return tuple(
+        name for cls in ast_type.__mro__
+        for name in getattr(cls, '__slots__', ())
+        if name != 'ln')
+
+
+_CHILD_SLOTS = [_child_slots(t) for t in ast.AST_KINDS]
+_FOLD_TABLE = _make_fold_table()
+
+
+def _fold(tree):
+    return _FOLD_TABLE[tree.kind](tree)
+
+
+def fold_constants(tree: ast.BaseAST) -> ast.BaseAST:
+    """
+    折叠 tree 中的常量表达式 (原地修改)
+    :return: 折叠后的 tree, 整个 tree 是常量时为新的 CellAST
+    """
+    return _fold(tree)
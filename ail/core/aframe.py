@@ -22,7 +22,8 @@ class Frame:
     __slots__ = ('code', 'stack', 'varnames', 'consts',
                  'variable', 'break_stack', 'temp_env_stack', 'block_stack',
                  'try_stack', '_marked_opcounter', '_latest_call_opcounter',
-                 'closure_outer', 'globals', 'lineno')
+                 '_caller_globals',
+                 'closure_outer', 'globals', 'lineno', 'fast_locals')
 
     def __init__(self, code: objs.AILCodeObject = None, varnames: list = None,
                  consts: list = None, globals: dict = None,
@@ -38,6 +39,9 @@ class Frame:
         self.block_stack: List[Block] = []
         self.lineno = 0
 
+        # 局部变量槽, 下标与 varnames 相同 (None 表示未赋值)
+        self.fast_locals: list = None
+
         # for closure
         self.closure_outer = closure_outer_variable \
             if closure_outer_variable is not None \
@@ -46,6 +50,25 @@ class Frame:
         self._marked_opcounter = 0
         self._latest_call_opcounter = 0
 
+        # 在求值循环内调用 (见 Interpreter.__call_in_loop) 时,
+        # 调用者的全局命名空间, 返回时恢复
+        self._caller_globals: dict = None
+
+    def get_variables(self) -> dict:
+        """
+        :return: 所有的局部变量 (包括 fast_locals 中的变量)
+        """
+        if self.fast_locals is None:
+            return self.variable
+
+        variables = self.variable.copy()
+
+        for name, value in zip(self.varnames, self.fast_locals):
+            if value is not None:
+                variables[name] = value
+
+        return variables
+
     def __str__(self):
         return '<Frame object for code object \'%s\'>' % self.code.name
 
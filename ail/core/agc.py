@@ -104,7 +104,9 @@ class GC:
             return
         self.__sprintln('Checking %s object\'s properties...' % ail_obj)
 
-        prop = ail_obj.properties
+        prop = ail_obj._properties
+        if prop is None:
+            return
 
         for p in prop.values():
             if p in self.__references_table and self.__references_table.count(p) == 1:
@@ -1,7 +1,12 @@
 # 用于ail的词法分析器
 
+import re
+
+from array import array
 from string import hexdigits, octdigits
 
+from . import aconfig
+from .asource import MappedSource, read_source
 from .tokentype import *
 from .error import error_msg
 
@@ -11,7 +16,7 @@ ALEX_VERSION_NUM = (0, 1)  # 数字版本号
 ALEX_VERSION_EXTRA = 'Beta'  # 额外版本信息
 ALEX_VERSION_DATE = (10, 27, 2019)
 
-__all__ = ['Token', 'TokenStream', 'Lex']
+__all__ = ['Token', 'TokenView', 'TokenStream', 'LazyTokenStream', 'Lex']
 
 _hex_num_chars = ('0123456789ABCDEFabcdef', 16)
 _ord_num_chars_with_sci = ('0123456789.eE', 10)
@@ -394,6 +399,87 @@ def get_doc_string(source: str, cursor: int) -> tuple:
     return ccur - cursor, ln_inc, doc_string
 
 
+def _make_operator_table() -> tuple:
+    """
+    生成运算符 / 符号表, 与逐字符引擎 (Lex.__lex_char) 的判断规则保持一致
+    :returns: (table, special)
+              table: 源码文本 -> (单词内容, 单词类型)
+              special: 需要特殊处理的文本 -> 单词列表, 为 None 则是语法错误
+    """
+    single = {
+        '+': AIL_PLUS, '*': AIL_MULT, '-': AIL_SUB, '%': AIL_MOD,
+        '^': AIL_XOR, '|': AIL_BIN_OR, '&': AIL_BIN_AND,
+        '(': AIL_SLBASKET, ')': AIL_SRBASKET, '[': AIL_MLBASKET,
+        ']': AIL_MRBASKET, '{': AIL_LLBASKET, '}': AIL_LRBASKET,
+        ',': AIL_COMMA, '.': AIL_DOT, ';': AIL_SEMI, '$': AIL_MONEY,
+        '@': AIL_AT, '\\': AIL_ESCAPE, ':': AIL_COLON, '~': AIL_WAVE,
+        '>': AIL_LARGER, '<': AIL_SMALER, '/': AIL_DIV,
+        '!': AIL_NOT, '=': AIL_ASSI,
+    }
+    inplace = {
+        '+': AIL_INP_PLUS, '*': AIL_INP_MULT, '%': AIL_INP_MOD,
+        '^': AIL_INP_XOR, '-': AIL_INP_SUB,
+    }
+
+    table = {c: (c, t) for c, t in single.items()}
+
+    for c in '+*^%|&-':
+        if c in inplace:
+            table[c + '='] = (c + '=', inplace[c])
+        # 自增自减, 注意 '*+' 之类的组合也会被当作 '**' (PLUS_PLUS)
+        table[c + '+'] = (c + c, AIL_PLUS_PLUS)
+        table[c + '-'] = (c + c, AIL_SUB_SUB)
+
+    table.update({
+        '||': ('||', AIL_OR),
+        '&&': ('&&', AIL_AND),
+        '**': ('**', AIL_POW),
+        '**=': ('**=', AIL_INP_POW),
+        '->': ('->', AIL_RARROW),
+        '<<': ('<<', AIL_LSHIFT),
+        '>>': ('>>', AIL_RSHIFT),
+        '<<=': ('<<=', AIL_INP_LSHIFT),
+        '>>=': ('>>=', AIL_INP_RSHIFT),
+        '>=': ('>=', AIL_LARGER_EQ),
+        '<=': ('<=', AIL_SMALER_EQ),
+        '!=': ('!=', AIL_UEQ),
+        '==': ('==', AIL_EQ),
+    })
+
+    special = {
+        '<>': (('<', AIL_SMALER), ('>', AIL_LARGER)),  # 空参数列表
+        '<>=': None,
+        '><=': None,
+        '><': None,
+    }
+
+    return table, special
+
+
+_OPERATOR_TABLE, _OPERATOR_SPECIAL = _make_operator_table()
+
+# 主正则表达式, 每次匹配跳过空白符并识别一个单词.
+# 只有常见的简单形式走快速路径, 其余 (带转义的字符串, 十六进制 / 科学计数法数字,
+# 含非 ASCII 字符的标识符等) 交给 'other' 分支, 由上面的辅助函数处理
+_TOKEN_REGEX = re.compile(
+    r'(?:[^\S\n]|[\x00-\x09\x0b-\x1f\x7f])*(?:' + '|'.join((
+        r'(?P<name>[A-Za-z_][0-9A-Za-z_]*(?![0-9A-Za-z_\x80-\U0010ffff]))',
+        r'(?P<enter>\n)',
+        r'(?P<comment_line>//[^\n]*\n?)',
+        r'(?P<comment_block>/\*.*?\*/)',
+        r'(?P<bad_comment>/\*)',
+        r'(?P<cont>\\\n)',
+        r'(?P<op>%s)' % '|'.join(
+            re.escape(k) for k in sorted(
+                (*_OPERATOR_TABLE, *_OPERATOR_SPECIAL), key=len, reverse=True)),
+        r'(?P<number>[1-9][0-9]*(?:\.[0-9]*)?(?![0-9eE.])|0(?![xXoObBeE.]))',
+        r'(?P<string>\'[^\'\\]*\'|"[^"\\]*")',
+        r'(?P<doc>#(?:[^\n]*\n#)*[^\n]*\n?)',
+        r'(?P<other>.)',
+        r'(?P<eof>\Z)',
+    )) + ')', re.S)
+
+
 class Cursor:  # 字符指针类型
     """
     指向源码中的字符的指针
@@ -403,11 +489,12 @@ class Cursor:  # 字符指针类型
         self.value = value
 
 
-class Token:
-    def __init__(self, value: str, ttype: int, ln: int):
-        self.value = value
-        self.ttype = ttype
-        self.ln = ln
+class BaseToken:
+    """
+    Token 和 TokenView 的公共部分
+    """
+
+    __slots__ = ()
 
     def __repr__(self):
         return '<Token \'{0}\'  Type:{1}  LineNumber:{2}>'.format(
@@ -419,7 +506,7 @@ class Token:
     def __eq__(self, obj: object):
         if isinstance(obj, str):
             return self.value == obj and self.ttype != AIL_STRING
-        elif isinstance(obj, Token):
+        elif isinstance(obj, BaseToken):
             return self.value == obj.value
         else:
             return super().__eq__(obj)
@@ -427,7 +514,7 @@ class Token:
     def __ne__(self, obj: object):
         if isinstance(obj, str):
             return self.value != obj and self.ttype != AIL_STRING
-        elif isinstance(obj, Token):
+        elif isinstance(obj, BaseToken):
             return self.value != obj.value
         else:
             return super().__ne__(obj)
@@ -435,43 +522,236 @@ class Token:
     __str__ = __repr__
 
 
+class Token(BaseToken):
+    __slots__ = ('value', 'ttype', 'ln')
+
+    def __init__(self, value: str, ttype: int, ln: int):
+        self.value = value
+        self.ttype = ttype
+        self.ln = ln
+
+
+class TokenView(BaseToken):
+    """
+    TokenStream 中一个单词的视图, 读写都直接作用于 TokenStream 的各列
+    """
+
+    __slots__ = ('__stream', '__index', '__values', '__types', '__table')
+
+    def __init__(self, stream: 'TokenStream', index: int):
+        self.__stream = stream
+        self.__index = index
+        self.__values, self.__types, _, self.__table = stream.columns
+
+    @property
+    def value(self) -> str:
+        return self.__table[self.__values[self.__index]]
+
+    @value.setter
+    def value(self, value: str):
+        self.__stream.set_value(self.__index, value)
+
+    @property
+    def ttype(self) -> int:
+        return self.__types[self.__index]
+
+    @ttype.setter
+    def ttype(self, ttype: int):
+        self.__types[self.__index] = ttype
+
+    @property
+    def ln(self) -> int:
+        return self.__stream.get_ln(self.__index)
+
+    @ln.setter
+    def ln(self, ln: int):
+        self.__stream.set_ln(self.__index, ln)
+
+
 class TokenStream:
     """
     单词流
+    按列存储: 单词类型, 行号, 单词内容在值表中的下标各为一个 array('i'),
+    相同的单词内容在值表中只保存一次. 下标访问得到 TokenView
     """
 
     def __init__(self):
-        self.__tli = []
+        self.__types = array('i')
+        self.__lines = array('i')
+        self.__values = array('i')
+
+        self.__value_table = []
+        self.__value_index = {}
+
+        # 语法分析器会反复访问同一个单词, 缓存最近一次的视图
+        self.__view_index = None
+        self.__view = None
+
+    def __intern(self, value: str) -> int:
+        i = self.__value_index.get(value)
+        if i is None:
+            i = self.__value_index[value] = len(self.__value_table)
+            self.__value_table.append(value)
+        return i
 
     def __iter__(self):
-        return iter(self.__tli)
+        for i in range(len(self.__types)):
+            yield TokenView(self, i)
 
-    def append(self, tok: Token):
+    def append(self, tok: BaseToken):
         """
         将 tok 增加到尾部
         """
 
-        self.__tli.append(tok)
+        self.__values.append(self.__intern(tok.value))
+        self.__types.append(tok.ttype)
+        self.__lines.append(tok.ln)
+
+    def extend(self, toks):
+        """
+        toks: 可迭代的 (value, ttype, ln)
+        """
+        add_value = self.__values.append
+        add_type = self.__types.append
+        add_line = self.__lines.append
+        table = self.__value_table
+        index = self.__value_index
+
+        for value, ttype, ln in toks:
+            i = index.get(value)
+            if i is None:
+                i = index[value] = len(table)
+                table.append(value)
+            add_value(i)
+            add_type(ttype)
+            add_line(ln)
 
     def __repr__(self):
-        return repr(self.__tli)
+        return repr(self.token_list)
 
     __str__ = __repr__
 
     def __getitem__(self, index):
+        if index == self.__view_index:
+            return self.__view
+
         if isinstance(index, slice):
-            return self.__tli[index]
+            return [TokenView(self, i) for i in range(*index.indices(len(self)))]
+
+        n = len(self.__types)
+        if index >= n:
+            index = n - 1  # EOF
+        elif index < 0:
+            index += n
 
-        return self.__tli[index] \
-            if len(self.__tli) > index \
-            else self.__tli[-1]  # EOF
+        if index < 0:
+            raise IndexError('token stream index out of range')
+
+        view = TokenView(self, index)
+        self.__view_index, self.__view = index, view
+        return view
 
     def __len__(self):
-        return len(self.__tli)
+        return len(self.__types)
+
+    @property
+    def token_list(self) -> list:
+        return list(self)
 
     @property
-    def token_list(self):
-        return self.__tli
+    def columns(self) -> tuple:
+        """
+        (值表下标, 单词类型, 行号, 值表), 各列只会就地修改
+        """
+        return self.__values, self.__types, self.__lines, self.__value_table
+
+    def get_value(self, index: int) -> str:
+        return self.__value_table[self.__values[index]]
+
+    def set_value(self, index: int, value: str):
+        self.__values[index] = self.__intern(value)
+
+    def get_ttype(self, index: int) -> int:
+        return self.__types[index]
+
+    def set_ttype(self, index: int, ttype: int):
+        self.__types[index] = ttype
+
+    def get_ln(self, index: int) -> int:
+        return self.__lines[index]
+
+    def set_ln(self, index: int, ln: int):
+        self.__lines[index] = ln
+
+    def is_empty(self) -> bool:
+        return len(self.__types) == 0
+
+    def release(self, index: int):
+        """
+        完整的单词流不丢弃单词, 见 LazyTokenStream.release
+        """
+        pass
+
+
+class LazyTokenStream:
+    """
+    惰性单词流
+    按需从词法分析的生成器中取出单词, 并丢弃语法分析器不再需要的单词,
+    内存占用只与语法分析器的回退范围有关, 与源码长度无关
+    """
+
+    RELEASE_CHUNK = 256  # 攒够这么多可丢弃的单词再一起删除
+
+    def __init__(self, tok_iter):
+        """
+        tok_iter: 产生 (value, ttype, ln) 的迭代器, 如 Lex.lex_iter
+        """
+        self.__iter = iter(tok_iter)
+        self.__buf = []
+        self.__base = 0  # __buf[0] 在整个单词流中的下标
+        self.__last = None
+
+    def __fill(self, index: int) -> bool:
+        buf = self.__buf
+        next_tok = self.__iter.__next__
+
+        try:
+            while index - self.__base >= len(buf):
+                tok = Token(*next_tok())
+                buf.append(tok)
+                self.__last = tok
+        except StopIteration:
+            return False
+        return True
+
+    def __getitem__(self, index):
+        i = index - self.__base
+
+        if i < 0:
+            raise IndexError('token %s has been released' % index)
+
+        if i >= len(self.__buf) and not self.__fill(index):
+            return self.__last  # EOF
+
+        return self.__buf[i]
+
+    def __repr__(self):
+        return '<LazyTokenStream %s tokens buffered at %s>' % (
+            len(self.__buf), self.__base)
+
+    __str__ = __repr__
+
+    def is_empty(self) -> bool:
+        return self[0] is None
+
+    def release(self, index: int):
+        """
+        index 之前的单词不再需要, 可以丢弃
+        """
+        n = index - self.__base
+        if n >= self.RELEASE_CHUNK:
+            del self.__buf[:n]
+            self.__base = index
 
 
 class Lex:
@@ -491,9 +771,9 @@ class Lex:
 
         self.__blevel = 0
 
-    def __get_source(self, filename: str) -> str:
+    def __get_source(self, filename: str):
         try:
-            return open(filename, encoding='utf-8').read()
+            return read_source(filename)
         except (UnicodeDecodeError, OSError) as e:
             return self.__error_msg(str(e))
 
@@ -538,20 +818,211 @@ class Lex:
     def __error_msg(self, msg):
         error_msg(self.__ln, msg, self.__filename, source=self.__source)
 
-    def lex(self, source: str, filename: str = '<string>') -> TokenStream:
-        if filename is not None:
-            self.__filename = filename
-            self.__source = source
+    def __reset(self, source: str, filename: str):
+        self.__filename = filename
+        self.__source = source
 
-            self.__cursor = Cursor()  # 源码的字符指针
-            self.__stream = TokenStream()
-            self.__ln = 1  # 行号
+        self.__cursor = Cursor()  # 源码的字符指针
+        self.__stream = TokenStream()
+        self.__ln = 1  # 行号
 
-            self.__blevel = 0
+        self.__blevel = 0
+
+    def __end_tokens(self) -> list:
+        return [
+            ('\n', AIL_ENTER, self.__ln),  # 加回车是有利于语法分析行的检测
+            ('<EOF>', AIL_EOF, self.__ln),
+        ]
+
+    def lex(self, source: str, filename: str = '<string>') -> TokenStream:
+        if filename is not None:
+            if aconfig.LEX_ENGINE == 'char' and isinstance(source, MappedSource):
+                source = source.read()
+            self.__reset(source, filename)
 
         if len(self.__source) == 0:
             return self.__stream
 
+        if aconfig.LEX_ENGINE == 'char':
+            self.__lex_char()
+        else:
+            self.__stream.extend(self.__lex_regex())
+
+        self.__stream.extend(self.__end_tokens())
+
+        return self.__stream
+
+    def lex_iter(self, source: str, filename: str = '<string>'):
+        """
+        流式的词法分析, 返回逐个产生 (value, ttype, ln) 的生成器, 不保存完整的单词流
+        ('char' 引擎不支持流式, 会先完成整个分析)
+        """
+        if aconfig.LEX_ENGINE == 'char':
+            for tok in self.lex(source, filename):
+                yield tok.value, tok.ttype, tok.ln
+            return
+
+        self.__reset(source, filename)
+
+        if len(source) == 0:
+            return
+
+        yield from self.__lex_regex()
+        yield from self.__end_tokens()
+
+    def lex_stream(self, source: str,
+                   filename: str = '<string>') -> 'LazyTokenStream':
+        return LazyTokenStream(self.lex_iter(source, filename))
+
+    def __lex_regex(self):
+        """
+        基于主正则表达式 _TOKEN_REGEX 的词法分析, 逐个产生 (value, ttype, ln)
+        (不包括结尾的回车和 EOF),
+        结果与 __lex_char 相同
+        """
+        source = self.__source
+
+        if not isinstance(source, MappedSource):
+            yield from self.__lex_text(source, self.__chp, True)
+            self.__chp = len(source)
+            return
+
+        # 逐块分析, 块尾可能不完整的单词留到与下一块拼接后重新分析
+        rest = ''
+        for text, is_last in source.chunks():
+            rest = yield from self.__lex_text(rest + text, 0, is_last)
+
+    def __lex_text(self, source: str, pos: int, is_last: bool):
+        """
+        分析 source[pos:]
+        is_last 为 False 时 source 后面还有内容, 遇到可能被截断的单词就停止
+        :returns: 没有分析的剩余部分
+        """
+        scan = _TOKEN_REGEX.scanner(source, pos).match
+        operators = _OPERATOR_TABLE
+
+        enter = self.__blevel == 0
+        ln = self.__ln
+
+        while True:
+            m = scan()
+            kind = m.lastgroup
+
+            if kind == 'name':
+                yield m.group(kind), AIL_IDENTIFIER, ln
+
+            elif kind == 'op':
+                text = m.group(kind)
+                tok = operators.get(text)
+                if tok is not None:
+                    yield tok[0], tok[1], ln
+                else:
+                    toks = _OPERATOR_SPECIAL[text]
+                    if toks is None:
+                        self.__ln = ln
+                        self.__error_msg('Syntax error:{0}'.format(text))
+                    else:
+                        for value, ttype in toks:
+                            yield value, ttype, ln
+
+            elif kind == 'enter':
+                ln += 1
+                if enter:
+                    yield '\n', AIL_ENTER, ln
+
+            elif kind == 'number':
+                yield m.group(kind), AIL_NUMBER, ln
+
+            elif kind == 'string':
+                text = m.group(kind)
+                yield text[1:-1], AIL_STRING, ln
+                ln += text.count('\n')
+
+            elif kind == 'comment_line':
+                yield '\n', AIL_ENTER, ln
+                ln += 1
+
+            elif kind == 'comment_block':
+                ln += m.group(kind).count('\n')
+
+            elif kind == 'doc':
+                if not is_last and m.end() == len(source):  # 下一块可能以 '#' 开始
+                    self.__ln = ln
+                    return source[m.start(kind):]
+
+                text = m.group(kind)[1:]  # skip '#'
+                yield text.replace('\n#', '\n'), AIL_DOC_STRING, ln
+                ln += text.count('\n')
+
+            elif kind == 'cont':
+                ln += 1
+
+            elif kind == 'other':
+                pos = m.start(kind)
+                r = self.__lex_other(source, pos, ln, is_last)
+                if r is None:
+                    self.__ln = ln
+                    return source[pos:]
+
+                pos, ln, tok = r
+                if tok is not None:
+                    yield tok
+                scan = _TOKEN_REGEX.scanner(source, pos).match
+
+            elif kind == 'bad_comment':
+                self.__ln = ln
+                if not is_last:
+                    return source[m.start(kind):]
+                self.__error_msg('EOL while scanning comment block')
+
+            else:  # eof
+                break
+
+        self.__ln = ln
+        return ''
+
+    def __lex_other(self, source: str, pos: int, ln: int, is_last: bool) -> tuple:
+        """
+        处理主正则表达式快速路径以外的单词
+        :returns: (新的字符指针, 新的行号, 单词), 出错时单词为 None
+                  若单词可能被块尾截断, 返回 None
+        """
+        c = source[pos]
+
+        self.__ln = ln  # 报错时使用
+
+        if c in ('"', '\''):
+            mov, lni, buf = get_string(source, pos)
+
+            if mov == -1:
+                if not is_last:
+                    return None
+                self.__error_msg('EOL while scanning string literal')
+            elif mov == -2:
+                self.__error_msg('Cannot decode an escape character')
+            else:
+                return pos + mov, ln + lni, (buf, AIL_STRING, ln)
+
+        elif isidentifier(c) or c == '_':
+            mov, buf = get_identifier(source, pos)
+            return pos + mov, ln, (buf, AIL_IDENTIFIER, ln)
+
+        elif c.isnumeric():
+            mov, buf = get_number(source, pos)
+            if mov <= 0:
+                self.__error_msg('SyntaxError')
+            else:
+                return pos + mov, ln, (buf, AIL_NUMBER, ln)
+
+        else:
+            self.__error_msg('Unknown character')
+
+        return pos + 1, ln, None
+
+    def __lex_char(self):
+        """
+        逐字符的词法分析
+        """
         while self.__chp < len(self.__source):
             c = self.__chnow
 
@@ -870,21 +1341,6 @@ class Lex:
             else:
                 self.__error_msg('Unknown character')
 
-        if self.__nextch(-1) != '\\n':
-            self.__stream.append(Token(
-                '\n',
-                AIL_ENTER,
-                self.__ln
-            ))  # 加回车是有利于语法分析行的检测
-
-        self.__stream.append(Token(
-            '<EOF>',
-            AIL_EOF,
-            self.__ln
-        ))  # 加回车是有利于语法分析行的检测
-
-        return self.__stream
-
 
 def test_lex():
     import pprint
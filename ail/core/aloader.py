@@ -10,6 +10,8 @@ from typing import Tuple, Union
 from .alex import Lex
 from .aparser import Parser
 from .acompiler import Compiler
+from .acache import load_cached_code, cache_code
+from .asource import open_source
 from .astate import MAIN_INTERPRETER_STATE
 from .avmsig import WHY_HANDLING_ERR, WHY_ERROR
 
@@ -183,9 +185,13 @@ class ModuleLoader:
             return ns, p
 
         elif self.__get_type(p) == 'ail':
-            source = open(p).read()
-            ast = Parser().parse(Lex().lex(source), source, p)
-            cobj = Compiler(filename=p, name=p).compile(ast).code_object
+            with open_source(p) as source:
+                cobj = load_cached_code(p, source)
+
+                if cobj is None:
+                    ast = Parser().parse(Lex().lex_stream(source), source, p)
+                    cobj = Compiler(filename=p, name=p).compile(ast).code_object
+                    cache_code(p, source, cobj)
 
             frame = Frame(cobj, cobj.varnames, cobj.consts)
 
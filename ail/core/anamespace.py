@@ -1,25 +1,63 @@
 
+
 from .aobjects import AILObject
 
 
 class Namespace:
-    def __init__(self, 
-                 ns_name: str, 
-                 ns_dict: dict, 
+    """
+    名称空间
+
+    version 是所有名称空间共享的版本号, 当某个名称空间的名称集合发生变化
+    (增加 / 删除名称, 创建新的名称空间) 时递增,
+    虚拟机中的全局 / 内建名称查找缓存依靠它判断是否失效.
+    若绕过 set / pop 直接修改 ns_dict 的名称集合, 需要调用 Namespace.touch()
+    """
+
+    version = 0
+
+    def __init__(self,
+                 ns_name: str,
+                 ns_dict: dict,
                  ns_last: 'Namespace' = None):
         self.ns_name = ns_name
         self.ns_dict = ns_dict
         self.ns_last = ns_last
 
+        Namespace.touch()
+
+    @staticmethod
+    def touch():
+        Namespace.version += 1
+
     def get(self, name: str) -> AILObject:
-        v = self.ns_dict.get(name, None)
-        if v is None:
-            last = self.ns_last
-            if last is None:
-                return None
-            return last.get(name)
-        return v
+        ns = self
+        while ns is not None:
+            v = ns.ns_dict.get(name, None)
+            if v is not None:
+                return v
+            ns = ns.ns_last
+        return None
+
+    def lookup(self, name: str) -> dict:
+        """
+        @returns 包含 name 的 ns_dict, 若找不到, 返回 None
+        """
+        ns = self
+        while ns is not None:
+            d = ns.ns_dict
+            if d.get(name, None) is not None:
+                return d
+            ns = ns.ns_last
+        return None
 
     def set(self, name: str, value: AILObject):
-        self.ns_dict[name] = value
+        d = self.ns_dict
+        if name not in d:
+            Namespace.version += 1
+        d[name] = value
 
+    def pop(self, name: str) -> AILObject:
+        v = self.ns_dict.pop(name, None)
+        if v is not None:
+            Namespace.version += 1
+        return v
@@ -46,7 +46,7 @@ class AILCodeObject:
     __slots__ = ('consts', 'varnames', 'bytecodes', 'firstlineno', 'lineno_list',
                  'argcount', 'name', 'lnotab', 'closure', 'is_main', 'filename',
                  '_closure_outer', 'global_names', 'nonlocal_names', 'var_arg',
-                 'doc_string', '_function_signature')
+                 'doc_string', '_function_signature', 'fast_locals', 'name_cache')
 
     def __init__(self, consts: list, varnames: list,
                  bytecodes: list, firstlineno: int, filename: str,
@@ -55,7 +55,7 @@ class AILCodeObject:
                  global_names: list=None, nonlocal_names: list=None,):
         self.consts = consts
         self.varnames = varnames
-        self.bytecodes = tuple(bytecodes)
+        self.bytecodes = list(bytecodes)  # 虚拟机会就地特化 (quicken) 部分字节码
         self.firstlineno = firstlineno
         self.argcount = argcount  # if function or -1
         self.name = name
@@ -74,27 +74,109 @@ class AILCodeObject:
 
         self._function_signature = ''
 
+        # varnames 中使用 load_fast / store_fast 访问的变量的下标
+        self.fast_locals: frozenset = frozenset()
+
+        # 名称查找的内联缓存, 每条指令一项 (见 Interpreter.__load_name)
+        self.name_cache: list = [None] * (len(self.bytecodes) // 2)
+
     def __str__(self):
         return '<AIL CodeObject \'%s\'>' % self.name
 
     __repr__ = __str__
 
 
+_NO_VALUE = object()  # 对象没有 __value__ 属性
+
+
 class AILObject:
     """Base object, do noting..."""
 
+    # __class__ 和 __value__ 存放在固定的槽中,
+    # 类型共享的属性 (__init__, __str__ ...) 在 slot_table 中 (见 ObjectCreater),
+    # _properties 只存放实例自己的属性, 没有时为 None
+    #
+    # 保留 __dict__ 是因为部分对象和扩展模块 (通过 ail.api) 会在对象上挂 Python 属性:
+    #   struct 类型与对象: members, protected, _this, _pthis_ (objects/struct.py)
+    #   class 与其实例: _attr_version, _attr_cache, _attr_cache_stamp,
+    #                   _bound_methods (objects/class_object.py)
+    #   error 对象: error_object (modules/_error.py)
+    #   file 对象: _file_flags, _file_object_fd, _file_readable ... (modules/fileio.py)
+    # 这些属性只在少数对象上出现, 若都放入槽中, 每个对象 (包括整数) 都要多出十几个槽.
+    # CPython 只在第一次设置这类属性时才创建 __dict__, 其余对象没有这个开销
+    __slots__ = ('obj_type', 'value', 'slot_table', '_properties',
+                 'hash_handler', 'reference', '__hash_target', '__dict__')
+
     def __init__(self, **ps):
-        self.__hash_target = object()  # hash
+        self.__hash_target = None  # None 表示按 id 求 hash
 
         self.hash_handler = None
-        self.properties = ps
         self.reference = 0
 
+        self.obj_type = ps.pop('__class__', None)
+        self.value = ps.pop('__value__', _NO_VALUE)
+        self.slot_table = None
+        self._properties = ps if ps else None
+
+    @property
+    def properties(self) -> dict:
+        """
+        实例自己的属性 (不包括 __class__, __value__ 和类型共享的属性)
+        """
+        p = self._properties
+        if p is None:
+            p = self._properties = dict()
+        return p
+
+    @properties.setter
+    def properties(self, p: dict):
+        self._properties = p
+
     def __getitem__(self, key: str):
-        return self.properties.get(key)
+        if key == '__value__':
+            v = self.value
+            return None if v is _NO_VALUE else v
+        if key == '__class__':
+            return self.obj_type
+
+        p = self._properties
+        if p is not None:
+            v = p.get(key)
+            if v is not None:
+                return v
+
+        t = self.slot_table
+        if t is not None:
+            return t.get(key)
+        return None
 
     def __setitem__(self, key: str, value):
-        self.properties[key] = value
+        if key == '__value__':
+            self.value = value
+        elif key == '__class__':
+            self.obj_type = value
+        else:
+            p = self._properties
+            if p is None:
+                p = self._properties = dict()
+            p[key] = value
+
+    def __copy__(self):
+        o = self.__class__.__new__(self.__class__)
+
+        o.obj_type = self.obj_type
+        o.value = self.value
+        o.slot_table = self.slot_table
+        o._properties = self._properties
+        o.hash_handler = self.hash_handler
+        o.reference = self.reference
+        o.__hash_target = self.__hash_target
+
+        d = self.__dict__
+        if d:  # 没有 Python 属性时不给副本创建 __dict__
+            o.__dict__.update(d)
+
+        return o
 
     def __str__(self):
         s = self['__str__'](self)
@@ -139,6 +221,8 @@ class AILObject:
 
     def __hash__(self) -> int:
         if self.hash_handler is None:
+            if self.__hash_target is None:
+                return object.__hash__(self)
             return hash(self.__hash_target)
         hash_val = check_object(self.hash_handler(self), not_convert=True)
 
@@ -159,6 +243,10 @@ class AILObjectType:
         self.otype = types.I_TYPE_TYPE if otype is None else otype
         self.methods = methods if methods is not None else dict()
 
+        # 由 ObjectCreater 在第一次使用时生成, 该类型的所有对象共享
+        self.slot_table: dict = None  # __class__, required 以及默认的 required
+        self.method_table: dict = None  # 方法名 -> 未绑定的方法对象
+
     def __str__(self):
         return '<AIL Type \'%s\'>' % self.name
 
@@ -180,37 +268,68 @@ class ObjectCreater:
     }
 
     @staticmethod
-    def new_object(obj_type: AILObjectType, *args) -> AILObject:
-        """
-        ATTENTION : 返回的对象的引用为0
-        :return : obj_type 创建的对象，并将 *args 作为初始化参数
-        """
+    def __make_slot_table(obj_type: AILObjectType) -> dict:
+        table = dict(obj_type.required)
 
-        obj = AILObject()  # create an object
-        obj.properties['__class__'] = obj_type
+        # check normal required
+        for name, default in ObjectCreater.__required_normal.items():
+            if name not in table:
+                table[name] = default
 
-        for k, v in obj_type.required.items():
-            obj.properties[k] = v
+        obj_type.slot_table = table
+        return table
+
+    @staticmethod
+    def __make_method_table(obj_type: AILObjectType) -> dict:
+        table = dict()
 
         if obj_type.methods is not None:
             for mn, mo in obj_type.methods.items():
                 if not isinstance(mo, AILObject):
-                    f = ObjectCreater.__to_wrapper(mo)
+                    table[mn] = ObjectCreater.__to_wrapper(mo)
 
-                    f.properties['__this__'] = obj  # bound self to __this__
-                    obj.properties[mn] = f
+        obj_type.method_table = table
+        return table
 
-        # check normal required
-        t_req_keys = set(obj_type.required.keys())
+    @staticmethod
+    def bind_method(obj: AILObject, name: str) -> AILObject:
+        """
+        在访问时才将类型的方法绑定到 obj 上
+        :return : 绑定了 __this__ 的方法对象, 若 obj 的类型没有该方法, 返回 None
+        """
+        obj_type = obj.obj_type
 
-        for name, default in ObjectCreater.__required_normal.items():
-            if name in t_req_keys:
-                continue
-            obj.properties[name] = default
+        table = obj_type.method_table
+        if table is None:
+            table = ObjectCreater.__make_method_table(obj_type)
+
+        m = table.get(name)
+        if m is None:
+            return None
+
+        f = m.__copy__()
+        p = m._properties
+        f._properties = dict() if p is None else p.copy()
+        f._properties['__this__'] = obj  # bound self to __this__
+
+        return f
+
+    @staticmethod
+    def new_object(obj_type: AILObjectType, *args) -> AILObject:
+        """
+        ATTENTION : 返回的对象的引用为0
+        :return : obj_type 创建的对象，并将 *args 作为初始化参数
+        """
+        table = obj_type.slot_table
+        if table is None:
+            table = ObjectCreater.__make_slot_table(obj_type)
+
+        obj = AILObject()  # create an object
+        obj.obj_type = obj_type
+        obj.slot_table = table
 
         # call init method
-        init_mthd = obj.properties['__init__']
-        r = init_mthd(obj, *args)
+        r = table['__init__'](obj, *args)
 
         if isinstance(r, error.AILRuntimeError):
             return r
@@ -232,6 +351,8 @@ _WRAPPER_TYPE = None
 _PY_FUNCTION_TYPE = None
 _BYTES_TYPE = None
 _null = None
+_get_integer = None
+_get_string = None
 _not_loaded = True
 
 
@@ -247,6 +368,8 @@ def convert_to_ail_object(pyobj: object) -> AILObject:
     global _PY_FUNCTION_TYPE
     global _BYTES_TYPE
     global _null
+    global _get_integer
+    global _get_string
 
     if isinstance(pyobj, AILObject):
         return pyobj
@@ -262,6 +385,8 @@ def convert_to_ail_object(pyobj: object) -> AILObject:
         from ..objects.function import PY_FUNCTION_TYPE as _PY_FUNCTION_TYPE
         from ..objects.bytes import BYTES_TYPE as _BYTES_TYPE
         from ..objects.null import null as _null
+        from ..objects.integer import get_integer as _get_integer
+        from ..objects.string import get_string as _get_string
         _not_loaded = False
 
     if pyobj is None:
@@ -271,13 +396,13 @@ def convert_to_ail_object(pyobj: object) -> AILObject:
     ail_t = _WRAPPER_TYPE
 
     if py_t is int:
-        ail_t = _INTEGER_TYPE
+        return _get_integer(pyobj)
     elif py_t is float:
         ail_t  = _FLOAT_TYPE
     elif py_t is complex:
         ail_t = _COMPLEX_TYPE
     elif py_t is str:
-        ail_t = _STRING_TYPE
+        return _get_string(pyobj)
     elif py_t is bytes:
         ail_t = _BYTES_TYPE
     elif py_t is bool:
@@ -317,13 +442,25 @@ def compare_type(o, *t):
 
 def has_attr(aobj: AILObject, name: str):
     if isinstance(aobj, AILObject):
-        return name in aobj.properties
+        if name == '__value__':
+            return aobj.value is not _NO_VALUE
+        if name == '__class__':
+            return aobj.obj_type is not None
+
+        p = aobj._properties
+        if p is not None and name in p:
+            return True
+
+        t = aobj.slot_table
+        return t is not None and name in t
     return False
 
 
 def unpack_ailobj(ailobj: AILObject):
-    if has_attr(ailobj, '__value__'):
-        return ailobj['__value__']
+    if isinstance(ailobj, AILObject):
+        v = ailobj.value
+        if v is not _NO_VALUE:
+            return v
     return ailobj
 
 
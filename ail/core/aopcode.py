@@ -137,6 +137,27 @@ pop_jump_forward_if_false_or_pop = 0x5a
 unpack_sequence = 0x5b
 build_tuple = 0x5c
 
+load_fast = 0x5d
+store_fast = 0x5e
+
+# 由虚拟机在运行时根据操作数类型改写 (quicken), 编译器不会生成
+binary_add_int = 0x5f
+binary_add_float = 0x60
+binary_sub_int = 0x61
+binary_sub_float = 0x62
+binary_mult_int = 0x63
+binary_mult_float = 0x64
+
+# 超级指令 (superinstruction), 由编译器改写常见字节码对的第一条得到,
+# 第二条原样保留 (见 SUPERINSTRUCTIONS)
+compare_jump_if_false = 0x65  # compare_op; pop_jump_forward_if_false_or_pop
+store_var_pop = 0x66  # store_var; pop_top
+store_fast_pop = 0x67  # store_fast; pop_top
+load_fast_load_const = 0x68  # load_fast; load_const
+load_variable_binary = 0x69  # load_variable; binary_*
+load_const_binary = 0x6a  # load_const; binary_*
+load_fast_binary = 0x6b  # load_fast; binary_*
+
 COMP_EQ = 0
 COMP_LEQ = 1
 COMP_SEQ = 2
@@ -166,6 +187,71 @@ BINARY_OPS = (
     binary_xor,
 )
 
+# 参数为跳转目标绝对偏移量的字节码
+JUMP_ABSOLUTE_OPS = (
+    jump_absolute,
+    jump_if_false_or_pop,
+    jump_if_true_or_pop,
+    jump_if_false,
+    pop_jump_if_false_or_pop,
+    pop_jump_if_true_or_pop,
+)
+
+# 参数为相对于本条字节码的偏移量的跳转
+JUMP_RELATIVE_OPS = (
+    jump_forward,
+    jump_forward_if_false,
+    jump_forward_if_false_or_pop,
+    jump_forward_true_or_pop,
+    pop_jump_forward_if_true_or_pop,
+    pop_jump_forward_if_false_or_pop,
+)
+
+# 绝对跳转 -> 语义相同的相对跳转
+# 编译器只生成绝对跳转, 由 ByteCode.assemble 对向前的跳转改用相对跳转
+FORWARD_JUMP_OPS = {
+    jump_absolute: jump_forward,
+    jump_if_false_or_pop: jump_forward_if_false_or_pop,
+    jump_if_true_or_pop: jump_forward_true_or_pop,
+    pop_jump_if_false_or_pop: pop_jump_forward_if_false_or_pop,
+    pop_jump_if_true_or_pop: pop_jump_forward_if_true_or_pop,
+}
+
+# 参数为块的处理地址 (绝对偏移量) 的字节码
+SETUP_BLOCK_OPS = (
+    setup_while,
+    setup_doloop,
+    setup_for,
+    setup_try,
+    setup_finally,
+)
+
+# 特化的字节码 -> 原来的字节码
+QUICKENED_OPS = {
+    binary_add_int: binary_add,
+    binary_add_float: binary_add,
+    binary_sub_int: binary_sub,
+    binary_sub_float: binary_sub,
+    binary_mult_int: binary_mult,
+    binary_mult_float: binary_mult,
+}
+
+# (字节码, 下一条字节码) -> 超级指令
+# 这些字节码对在 tests/ 与 examples/ 运行时执行得最多
+SUPERINSTRUCTIONS = {
+    (compare_op, pop_jump_forward_if_false_or_pop): compare_jump_if_false,
+    (store_var, pop_top): store_var_pop,
+    (store_fast, pop_top): store_fast_pop,
+    (load_fast, load_const): load_fast_load_const,
+}
+
+for _op in BINARY_OPS:
+    SUPERINSTRUCTIONS[load_variable, _op] = load_variable_binary
+    SUPERINSTRUCTIONS[load_const, _op] = load_const_binary
+    SUPERINSTRUCTIONS[load_fast, _op] = load_fast_binary
+
+del _op
+
 
 """
 _ = [
@@ -259,5 +345,22 @@ _ = [
     jump_forward_if_false,
     pop_jump_forward_if_true_or_pop,
     pop_jump_forward_if_false_or_pop,
+    unpack_sequence,
+    build_tuple,
+    load_fast,
+    store_fast,
+    binary_add_int,
+    binary_add_float,
+    binary_sub_int,
+    binary_sub_float,
+    binary_mult_int,
+    binary_mult_float,
+    compare_jump_if_false,
+    store_var_pop,
+    store_fast_pop,
+    load_fast_load_const,
+    load_variable_binary,
+    load_const_binary,
+    load_fast_binary,
 ]
 """
@@ -6,8 +6,9 @@ from typing import Union
 
 from . import aconfig
 
-from .alex import Token, TokenStream, Lex
+from .alex import Token, TokenStream, LazyTokenStream, Lex
 from . import asts as ast, test_utils
+from .afold import fold_constants
 from .error import error_msg
 from .pyast import *
 from .tokentype import *
@@ -62,6 +63,9 @@ _FROM_FUNC = 1
 _class_name_stack = list()
 
 
+_MEMO_PRUNE_SIZE = 4096
+
+
 def _make_private_name(name):
     return '$'.join(_class_name_stack)
 
@@ -88,12 +92,37 @@ class Parser:
 
         self.__pyc_mode = False
 
+        self.__states = []  # 还可能回退到的 ParserState, 单词流需要保留它们之后的单词
+
+        # packrat: 回退后会被重新分析的子表达式的结果
+        # (cursor, level, parenthesis_level) -> (AST, cursor, level, parenthesis_level)
+        self.__memo = {}
+
+        self.backtrack_count = 0  # set_state 回退的次数
+        self.memo_hit_count = 0  # 因回退而重新分析时命中 memo 的次数
+
     def get_state(self) -> ParserState:
-        return ParserState(self.__tc, self.__level, self.__parenthesis_level, self)
+        state = ParserState(self.__tc, self.__level, self.__parenthesis_level, self)
+        self.__states.append(state)
+        return state
 
     def set_state(self, state: ParserState):
+        if state.cursor < self.__tc:
+            self.backtrack_count += 1
+
         self.__tc, self.__level, self.__parenthesis_level = \
             state.cursor, state.level, state.parent_level
+        self.release_state(state)
+
+    def release_state(self, state: ParserState):
+        """
+        不会再回退到 state 时调用
+        """
+        states = self.__states
+        for i in range(len(states) - 1, -1, -1):
+            if states[i] is state:
+                del states[i]
+                break
 
     def __mov_tp(self, step=1):
         self.__tc += step
@@ -127,6 +156,9 @@ class Parser:
         if self.__parenthesis_level > 0:
             self.__skip_newlines()
 
+        self.__tok_stream.release(
+            self.__states[0].cursor if self.__states else self.__tc)
+
         return self.__tok_stream[self.__tc]
 
     def __skip_newlines(self):
@@ -420,6 +452,48 @@ class Parser:
         return ast.MemberAccessAST(left, rl, ln)
 
     def __parse_cell_or_call_expr(self) -> ast.SubscriptExprAST:
+        """
+        带 memo 的 __parse_subscript_or_call_expr
+        __parse_assign_expr 会把类型注释当作 cell_or_call 表达式试着分析, 失败后回退,
+        同一段单词再作为普通表达式被分析一次 (如 map 的 'key: value'),
+        嵌套时每层都要分析两次. 有可回退的 ParserState 时记录结果, 重新分析时直接使用
+        """
+        memo = self.__memo
+
+        if not memo and not self.__states:
+            return self.__parse_subscript_or_call_expr()
+
+        key = (self.__tc, self.__level, self.__parenthesis_level)
+
+        r = memo.get(key)
+        if r is not None:
+            self.memo_hit_count += 1
+            expr, self.__tc, self.__level, self.__parenthesis_level = r
+            return expr
+
+        expr = self.__parse_subscript_or_call_expr()
+
+        if self.__states and aconfig.PARSER_MEMO:
+            if len(memo) >= _MEMO_PRUNE_SIZE:
+                self.__prune_memo()
+            memo[key] = (expr, self.__tc, self.__level, self.__parenthesis_level)
+
+        return expr
+
+    def __prune_memo(self):
+        """
+        删除不会再用到的 memo: 只有回退才会重新分析, 最早的 ParserState 之前的位置不会再被分析
+        """
+        low = self.__states[0].cursor if self.__states else self.__tc
+        memo = self.__memo
+
+        for key in [k for k in memo if k[0] < low]:
+            del memo[key]
+
+        if len(memo) >= _MEMO_PRUNE_SIZE // 2:
+            memo.clear()
+
+    def __parse_subscript_or_call_expr(self) -> ast.SubscriptExprAST:
         # in fact, it is for subscript
         ca = self.__parse_low_cell_expr()
 
@@ -841,6 +915,8 @@ class Parser:
                 ttype != AIL_INP_POW:
             self.set_state(state)
             return left
+
+        self.release_state(state)
         
         # check left is valid or not
         if type(left) not in (ast.MemberAccessAST,
@@ -2010,21 +2086,20 @@ class Parser:
 
         return ast.BlockAST(stmtl, ln)
 
-    def parse(self, ts: TokenStream, 
+    def parse(self, ts: Union[TokenStream, LazyTokenStream],
               source: str, filename: str,
               pyc_mode: bool = False) -> ast.BlockAST:
         self.__init__()
         self.__tok_stream = ts
         self.__filename = filename
         self.__source = source
-        self.__tok_list = ts.token_list
 
         self.__tc = 0
         self.__level = 0  # level 0
 
         self.__pyc_mode = pyc_mode
 
-        if len(ts.token_list) == 0:
+        if ts.is_empty():
             return ast.BlockAST([], 0)
 
         while self.__now_tok.ttype == AIL_ENTER:  # skip enter at beginning
@@ -2090,6 +2165,7 @@ class PyTreeConvertException(Exception):
 class ASTConverter:
     def __init__(self):
         self.__block_stmt_append_func_stack = []
+        self.__convert_table = self.__make_convert_table()
 
     def __append_stmt_to_top_block(self, stmt: pyast.stmt):
         if self.__block_stmt_append_func_stack:
@@ -2113,7 +2189,7 @@ class ASTConverter:
         elif cell.value == 'true':
             return _set_lineno(constant_expr(True), cell.ln)
         elif cell.value == 'false':
-            return _set_lineno(constant_expr(True), cell.ln)
+            return _set_lineno(constant_expr(False), cell.ln)
         elif cell.type == AIL_NUMBER:
             return _set_lineno(constant_expr(eval(cell.value)), cell.ln)
         elif cell.type == AIL_STRING:
@@ -2535,119 +2611,90 @@ class ASTConverter:
         module_node = pyast.parse(code.code)
         return _increase_all_lineno(code.ln - 1, module_node.body)
 
-    def convert(self, a, as_stmt: bool = False) -> Union[pyast.AST, List[pyast.stmt]]:
-        if isinstance(a, ast.CellAST):
-            return self._convert_cell(a)
-
-        elif isinstance(a, ast.UnaryExprAST):
-            return self._convert_unary_expr(a)
-
-        elif type(a) in ast.BIN_OP_AST:
-            return self._convert_bin_op_expr(a.left, a.right, a.ln)
-
-        elif isinstance(a, ast.CallExprAST):
-            return self._convert_call_expr(a)
-
-        elif isinstance(a, ast.PrintStmtAST):
-            return self._convert_print_stmt(a)
-
-        elif isinstance(a, ast.InputStmtAST):
-            return self._convert_input_stmt(a)
-
-        elif isinstance(a, ast.AndTestAST):
-            return self._convert_bool_expr(a, pyast.And())
-
-        elif isinstance(a, ast.OrTestAST):
-            return self._convert_bool_expr(a, pyast.Or())
-
-        elif isinstance(a, ast.TestExprAST):
-            return self.convert(a.test, as_stmt)
-
-        elif isinstance(a, ast.BlockAST):
-            return self._convert_block(a, as_stmt)
-
-        elif isinstance(a, ast.IfStmtAST):
-            return self._convert_if_stmt(a)
-
-        elif isinstance(a, ast.WhileStmtAST):
-            return self._convert_while_stmt(a)
-
-        elif isinstance(a, ast.DoLoopStmtAST):
-            return self._convert_do_loop_stmt(a)
-
-        elif isinstance(a, ast.FunctionDefineAST):
-            return self._convert_function_def(a, as_stmt)
-
-        elif isinstance(a, ast.ClassDefineAST):
-            return self._convert_class_def_stmt(a)
-
-        elif isinstance(a, ast.ReturnStmtAST):
-            return _set_lineno(return_stmt(self.convert(a.expr)), a.ln)
-
-        elif isinstance(a, ast.BreakStmtAST):
-            return _set_lineno(break_stmt(), a.ln)
-
-        elif isinstance(a, ast.ContinueStmtAST):
-            return _set_lineno(continue_stmt(), a.ln)
-
-        elif isinstance(a, ast.GlobalStmtAST):
-            return _set_lineno(global_stmt([a.name]), a.ln)
-
-        elif isinstance(a, ast.NonlocalStmtAST):
-            return _set_lineno(nonlocal_stmt([a.name]), a.ln)
-
-        elif isinstance(a, ast.ArrayAST):
-            return self._convert_array_expr(a)
-
-        elif isinstance(a, ast.TupleAST):
-            return tuple_expr([self.convert(e) for e in a.items], load_ctx())
-
-        elif isinstance(a, ast.MapAST):
-            return self._convert_map_expr(a)
-
-        elif isinstance(a, ast.ItemListAST):
-            raise PyTreeConvertException('ItemListAST cannot be converted', a.ln)
-
-        elif isinstance(a, ast.SubscriptExprAST):
-            return self._convert_subscript_expr(a)
-
-        elif isinstance(a, ast.LoadStmtAST):
-            return self._convert_load_stmt(a)
-
-        elif isinstance(a, ast.ImportStmtAST):
-            return self._convert_import_stmt(a)
-
-        elif isinstance(a, ast.MemberAccessAST):
-            return self._convert_member_access_expr(a.left, a.members, a.ln)
-
-        elif isinstance(a, ast.AssignExprAST):
-            return self._convert_assign_expr(a, as_stmt)
-
-        elif isinstance(a, ast.StructDefineAST):
-            return self._convert_struct_def(a)
-
-        elif isinstance(a, ast.NotTestAST):
-            return self._convert_unary_expr(
-                ast.UnaryExprAST('!', a.expr, a.ln)
-            )
-
-        elif isinstance(a, ast.ForStmtAST):
-            return self._convert_for_stmt(a)
-
-        elif isinstance(a, ast.BinaryExprListAST):
-            raise PyTreeConvertException('BinaryExprListAST cannot be converted', a.ln)
-
-        elif isinstance(a, ast.AssertStmtAST):
-            return _set_lineno(assert_stmt(self.convert(a.test), None), a.ln)
-
-        elif isinstance(a, ast.ThrowStmtAST):
-            return _set_lineno(raise_stmt(self.convert(a.expr)), a.ln)
+    def __make_convert_table(self) -> list:
+        """
+        转换函数的分派表, 以 AST 的 kind 为下标
+        处理函数形如 f(tree, as_stmt), 为 None 的 AST 原样返回
+        """
+        table = [None] * len(ast.AST_KINDS)
+
+        for ast_type, handler in (
+                (ast.CellAST, lambda a, s: self._convert_cell(a)),
+                (ast.UnaryExprAST, lambda a, s: self._convert_unary_expr(a)),
+                (ast.CallExprAST, lambda a, s: self._convert_call_expr(a)),
+                (ast.PrintStmtAST, lambda a, s: self._convert_print_stmt(a)),
+                (ast.InputStmtAST, lambda a, s: self._convert_input_stmt(a)),
+                (ast.AndTestAST,
+                    lambda a, s: self._convert_bool_expr(a, pyast.And())),
+                (ast.OrTestAST,
+                    lambda a, s: self._convert_bool_expr(a, pyast.Or())),
+                (ast.TestExprAST, lambda a, s: self.convert(a.test, s)),
+                (ast.BlockAST, self._convert_block),
+                (ast.IfStmtAST, lambda a, s: self._convert_if_stmt(a)),
+                (ast.WhileStmtAST, lambda a, s: self._convert_while_stmt(a)),
+                (ast.DoLoopStmtAST,
+                    lambda a, s: self._convert_do_loop_stmt(a)),
+                (ast.FunctionDefineAST, self._convert_function_def),
+                (ast.ClassDefineAST,
+                    lambda a, s: self._convert_class_def_stmt(a)),
+                (ast.ReturnStmtAST,
+                    lambda a, s: _set_lineno(
+                        return_stmt(self.convert(a.expr)), a.ln)),
+                (ast.BreakStmtAST,
+                    lambda a, s: _set_lineno(break_stmt(), a.ln)),
+                (ast.ContinueStmtAST,
+                    lambda a, s: _set_lineno(continue_stmt(), a.ln)),
+                (ast.GlobalStmtAST,
+                    lambda a, s: _set_lineno(global_stmt([a.name]), a.ln)),
+                (ast.NonlocalStmtAST,
+                    lambda a, s: _set_lineno(nonlocal_stmt([a.name]), a.ln)),
+                (ast.ArrayAST, lambda a, s: self._convert_array_expr(a)),
+                (ast.TupleAST,
+                    lambda a, s: tuple_expr(
+                        [self.convert(e) for e in a.items], load_ctx())),
+                (ast.MapAST, lambda a, s: self._convert_map_expr(a)),
+                (ast.ItemListAST, self.__cannot_convert),
+                (ast.SubscriptExprAST,
+                    lambda a, s: self._convert_subscript_expr(a)),
+                (ast.LoadStmtAST, lambda a, s: self._convert_load_stmt(a)),
+                (ast.ImportStmtAST, lambda a, s: self._convert_import_stmt(a)),
+                (ast.MemberAccessAST,
+                    lambda a, s: self._convert_member_access_expr(
+                        a.left, a.members, a.ln)),
+                (ast.AssignExprAST, self._convert_assign_expr),
+                (ast.StructDefineAST, lambda a, s: self._convert_struct_def(a)),
+                (ast.NotTestAST,
+                    lambda a, s: self._convert_unary_expr(
+                        ast.UnaryExprAST('!', a.expr, a.ln))),
+                (ast.ForStmtAST, lambda a, s: self._convert_for_stmt(a)),
+                (ast.BinaryExprListAST, self.__cannot_convert),
+                (ast.AssertStmtAST,
+                    lambda a, s: _set_lineno(
+                        assert_stmt(self.convert(a.expr), None), a.ln)),
+                (ast.ThrowStmtAST,
+                    lambda a, s: _set_lineno(
+                        raise_stmt(self.convert(a.expr)), a.ln)),
+                (ast.TryCatchStmtAST, lambda a, s: self._convert_try_stmt(a)),
+                (ast.PyCodeBlock, lambda a, s: self._convert_py_code_block(a)),
+                ):
+            table[ast_type.kind] = handler
+
+        for ast_type in ast.BIN_OP_AST:
+            table[ast_type.kind] = lambda a, s: self._convert_bin_op_expr(
+                a.left, a.right, a.ln)
+
+        return table
+
+    def __cannot_convert(self, a, as_stmt: bool):
+        raise PyTreeConvertException(
+            '%s cannot be converted' % type(a).__name__, a.ln)
 
-        elif isinstance(a, ast.TryCatchStmtAST):
-            return self._convert_try_stmt(a)
+    def convert(self, a, as_stmt: bool = False) -> Union[pyast.AST, List[pyast.stmt]]:
+        if isinstance(a, ast.BaseAST):
+            handler = self.__convert_table[a.kind]
 
-        elif isinstance(a, ast.PyCodeBlock):
-            return self._convert_py_code_block(a)
+            if handler is not None:
+                return handler(a, as_stmt)
 
         elif isinstance(a, list):
             raise PyTreeConvertException('list cannot be converted', a.ln)
@@ -2655,12 +2702,12 @@ class ASTConverter:
         return a
 
     def convert_module(self, block: ast.BlockAST) -> pyast.Module:
-        body = self.convert(block, True)
+        body = self.convert(fold_constants(block), True)
 
         return _set_lineno(module(body), block.ln)
     
     def convert_single(self, block: ast.BlockAST) -> pyast.Interactive:
-        body = self.convert(block, True)
+        body = self.convert(fold_constants(block), True)
 
         return _set_lineno(interactive(body), block.ln)
 
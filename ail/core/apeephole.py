@@ -0,0 +1,377 @@
+# peephole 优化
+
+from .aconfig import BYTE_CODE_SIZE
+from .aobjects import AILObject
+from .aopcode import *
+
+'''
+在编译出的字节码上做的窥孔优化 (-O 开启):
+    常量条件折叠       load true; pop_jump_if_false_or_pop X  ->  (无)
+    冗余 load / store  store_fast a; pop_top; load_fast a  ->  store_fast a
+                       load_const c; pop_top  ->  (无)
+    跳转穿透           跳转到无条件跳转的跳转直接跳到最终目标
+    删除跳到下一条的无条件跳转
+    删除不可达的字节码 (return, throw, break 之后等)
+
+字节码被删除后重新计算所有跳转与块处理地址, 并同步 lineno_list.
+注意: 虚拟机执行 continue 时跳到 (循环块处理地址 - 2 条字节码),
+那里必须是循环的回跳, 所以循环块处理地址前的两条字节码永远保留
+'''
+
+__all__ = ['optimize']
+
+_REMOVED = -1
+_END = -2
+
+_MAX_PASSES = 8
+
+_LOOP_SETUP_OPS = (setup_while, setup_doloop, setup_for)
+
+_UNCONDITIONAL_JUMPS = (jump_absolute, jump_forward)
+
+# 执行后不会落到下一条的字节码
+_NO_FALL_THROUGH = (
+    jump_absolute, jump_forward, return_value, throw_error,
+    break_loop, continue_loop,
+)
+
+# 条件跳转 -> (TOS 为真时跳转, 跳转时弹出 TOS, 不跳转时弹出 TOS)
+_COND_JUMPS = {
+    jump_if_false_or_pop: (False, False, True),
+    jump_if_true_or_pop: (True, False, True),
+    pop_jump_if_false_or_pop: (False, True, True),
+    pop_jump_if_true_or_pop: (True, True, True),
+    jump_forward_if_false: (False, False, False),
+    jump_forward_if_false_or_pop: (False, False, True),
+    jump_forward_true_or_pop: (True, False, True),
+    pop_jump_forward_if_true_or_pop: (True, True, True),
+    pop_jump_forward_if_false_or_pop: (False, True, True),
+}
+
+# 不能被赋值的名称 (见 aparser._literal_names)
+_LITERAL_TRUTH = {'true': True, 'false': False}
+
+# 真值与 Interpreter.__bool_test 一致的常量
+_CONST_VALUE_TYPES = (int, float, str, bool)
+
+
+class _Unoptimizable(Exception):
+    pass
+
+
+class _Code:
+    """
+    解码后的字节码, 每条为 [op, argv, lineno, target]
+    target 为跳转目标 / 块处理地址的字节码下标, 没有则为 None
+    删除的字节码 op 为 _REMOVED, 末尾有一条 op 为 _END 的哨兵
+    """
+
+    def __init__(self, blist: list, lineno_list: list, consts: list,
+                 varnames: list, nonlocal_names):
+        n = len(blist) // BYTE_CODE_SIZE
+
+        if len(blist) % BYTE_CODE_SIZE or len(lineno_list) != n:
+            raise _Unoptimizable()
+
+        self.consts = consts
+        self.varnames = varnames
+        self.nonlocal_names = nonlocal_names
+
+        self.instrs = instrs = []
+        self.pinned = {}  # 循环回跳的下标 -> 循环 setup 的下标
+
+        for i in range(n):
+            op = blist[i * BYTE_CODE_SIZE]
+            argv = blist[i * BYTE_CODE_SIZE + 1]
+
+            if op in JUMP_ABSOLUTE_OPS or op in SETUP_BLOCK_OPS:
+                target = argv
+            elif op in JUMP_RELATIVE_OPS:
+                target = i * BYTE_CODE_SIZE + argv
+            else:
+                target = None
+
+            if target is not None:
+                if target % BYTE_CODE_SIZE or not 0 <= target <= len(blist):
+                    raise _Unoptimizable()
+                target //= BYTE_CODE_SIZE
+
+                if op in _LOOP_SETUP_OPS:
+                    if target < 2:
+                        raise _Unoptimizable()
+                    self.pinned[target - 2] = i
+                    self.pinned[target - 1] = i
+
+            instrs.append([op, argv, lineno_list[i], target])
+
+        instrs.append([_END, 0, -1, None])
+
+    def resolve(self, i: int) -> int:
+        """
+        :return: 下标 i 处 (若已删除, 则是之后第一条) 未删除的字节码的下标
+        """
+        instrs = self.instrs
+        while instrs[i][0] == _REMOVED:
+            i += 1
+        return i
+
+    def next_live(self, i: int) -> int:
+        return self.resolve(i + 1)
+
+    def live(self):
+        return [i for i, ins in enumerate(self.instrs)
+                if ins[0] != _REMOVED and ins[0] != _END]
+
+    def remove(self, i: int):
+        self.instrs[i][0] = _REMOVED
+
+    def jump_targets(self) -> set:
+        """
+        :return: 所有可能从别处到达的字节码的下标 (跳转目标, 块处理地址和循环回跳)
+        """
+        targets = set()
+        for i in self.live():
+            t = self.instrs[i][3]
+            if t is not None:
+                targets.add(self.resolve(t))
+        targets.update(self.pinned)
+        return targets
+
+    def const_truth(self, i: int):
+        """
+        :return: 字节码 i 压入的常量的真值, 不是常量则返回 None
+        """
+        op, argv = self.instrs[i][:2]
+
+        if op == load_const:
+            c = self.consts[argv]
+            if type(c) is AILObject and type(c.value) in _CONST_VALUE_TYPES:
+                return bool(c.value)
+
+        elif op == load_variable:
+            return _LITERAL_TRUTH.get(self.varnames[argv])
+
+        return None
+
+    def encode(self) -> tuple:
+        instrs = self.instrs
+        offsets = [0] * len(instrs)
+        ofs = 0
+
+        for i, ins in enumerate(instrs):
+            offsets[i] = ofs
+            if ins[0] != _REMOVED and ins[0] != _END:
+                ofs += BYTE_CODE_SIZE
+
+        blist = []
+        lineno_list = []
+
+        for i in self.live():
+            op, argv, ln, target = instrs[i]
+
+            if target is not None:
+                target = offsets[self.resolve(target)]
+
+                if op in SETUP_BLOCK_OPS:
+                    argv = target
+                else:
+                    # 虚拟机把跳到自己当作不跳转, 部分跳转返回 0 表示不跳转
+                    if target == offsets[i] or target == 0:
+                        raise _Unoptimizable()
+
+                    if op in JUMP_RELATIVE_OPS:
+                        argv = target - offsets[i]
+                    else:
+                        argv = target
+
+            blist += [op, argv]
+            lineno_list.append(ln)
+
+        return blist, lineno_list
+
+
+def _fold_const_jumps(code: _Code) -> bool:
+    """
+    常量后紧跟条件跳转时, 在编译期决定是否跳转
+    """
+    changed = False
+    instrs = code.instrs
+    targets = code.jump_targets()
+
+    for i in code.live():
+        if instrs[i][0] == _REMOVED or i in code.pinned:
+            continue
+
+        j = code.next_live(i)
+        jop = instrs[j][0]
+
+        if jop not in _COND_JUMPS or j in targets or j in code.pinned:
+            continue
+
+        truth = code.const_truth(i)
+        if truth is None:
+            continue
+
+        jump_if, pop_if_jump, pop_if_not = _COND_JUMPS[jop]
+        taken = truth == jump_if
+
+        if pop_if_jump if taken else pop_if_not:
+            code.remove(i)
+
+        if taken:
+            instrs[j][0] = jump_absolute
+        else:
+            code.remove(j)
+
+        changed = True
+
+    return changed
+
+
+def _remove_redundant_pairs(code: _Code) -> bool:
+    changed = False
+    instrs = code.instrs
+    targets = code.jump_targets()
+
+    for i in code.live():
+        op, argv = instrs[i][:2]
+        if op == _REMOVED or i in code.pinned:
+            continue
+
+        j = code.next_live(i)
+        if instrs[j][0] != pop_top or j in targets:
+            continue
+
+        if op in (load_const, push_none):
+            code.remove(i)
+            code.remove(j)
+            changed = True
+            continue
+
+        if op == store_fast:
+            load_op = load_fast
+        elif op == store_var and \
+                code.varnames[argv] not in code.nonlocal_names:
+            load_op = load_variable
+        else:
+            continue
+
+        # store a; pop_top; load a  ->  store a  (store 会把值留在栈上)
+        k = code.next_live(j)
+        if instrs[k][0] == load_op and instrs[k][1] == argv and \
+                k not in targets:
+            code.remove(j)
+            code.remove(k)
+            changed = True
+
+    return changed
+
+
+def _thread_jumps(code: _Code) -> bool:
+    changed = False
+    instrs = code.instrs
+
+    for i in code.live():
+        ins = instrs[i]
+        op, target = ins[0], ins[3]
+
+        if target is None or op in SETUP_BLOCK_OPS:
+            continue
+
+        t = code.resolve(target)
+        seen = {i}
+
+        while instrs[t][0] in _UNCONDITIONAL_JUMPS and t not in seen:
+            seen.add(t)
+            t = code.resolve(instrs[t][3])
+
+        # 相对跳转只能向前
+        if op in JUMP_RELATIVE_OPS and t <= i:
+            continue
+
+        if t != code.resolve(target):
+            ins[3] = t
+            changed = True
+
+    return changed
+
+
+def _remove_jumps_to_next(code: _Code) -> bool:
+    changed = False
+    instrs = code.instrs
+
+    for i in code.live():
+        if instrs[i][0] in _UNCONDITIONAL_JUMPS and i not in code.pinned and \
+                code.resolve(instrs[i][3]) == code.next_live(i):
+            code.remove(i)
+            changed = True
+
+    return changed
+
+
+def _remove_dead_code(code: _Code) -> bool:
+    instrs = code.instrs
+    loops = {}
+
+    for pin, setup in code.pinned.items():
+        loops.setdefault(setup, []).append(pin)
+
+    reached = set()
+    stack = [code.resolve(0)]
+
+    while stack:
+        i = stack.pop()
+        if i in reached or instrs[i][0] == _END:
+            continue
+        reached.add(i)
+
+        op, _, _, target = instrs[i]
+
+        if op not in _NO_FALL_THROUGH:
+            stack.append(code.next_live(i))
+
+        if target is not None:
+            stack.append(code.resolve(target))
+
+        if i in loops:
+            stack.extend(loops[i])
+
+    changed = False
+    for i in code.live():
+        if i not in reached:
+            code.remove(i)
+            changed = True
+
+    return changed
+
+
+def optimize(buffer) -> bool:
+    """
+    优化 ByteCodeFileBuffer 中的字节码 (原地修改)
+    :return: 是否做了优化
+    """
+    bytecode = buffer.bytecodes
+
+    try:
+        code = _Code(bytecode.blist, bytecode.lineno_list, buffer.consts,
+                     buffer.varnames, buffer.nonlocal_names)
+
+        for _ in range(_MAX_PASSES):
+            changed = _fold_const_jumps(code)
+            changed |= _remove_redundant_pairs(code)
+            changed |= _thread_jumps(code)
+            changed |= _remove_jumps_to_next(code)
+            changed |= _remove_dead_code(code)
+
+            if not changed:
+                break
+
+        blist, lineno_list = code.encode()
+    except _Unoptimizable:
+        return False
+
+    bytecode.blist[:] = blist
+    bytecode.lineno_list[:] = lineno_list
+    buffer.lineno_list = bytecode.lineno_list
+
+    return True
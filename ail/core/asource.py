@@ -0,0 +1,94 @@
+# 源码读取
+
+import mmap
+import os.path
+
+from contextlib import contextmanager
+from typing import Union
+
+from . import aconfig
+
+__all__ = ['MappedSource', 'read_source', 'open_source']
+
+
+class MappedSource:
+    """
+    用 mmap 映射的 UTF-8 源码文件
+    不一次性读入并解码, 而是按行对齐的块惰性解码, 页面由操作系统按需载入,
+    多个进程读取同一文件时共享页缓存
+    用完 (词法分析, 计算哈希之后) 需要 close(), 也可以用作上下文管理器
+    """
+
+    CHUNK_SIZE = 1 << 20  # 每块至少这么多字节, 块总是在换行符之后结束
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __repr__(self):
+        return '<MappedSource \'%s\' %s bytes>' % (self.path, len(self.buffer))
+
+    def chunks(self, size: int = None):
+        """
+        逐块解码源码, 换行符的处理与文本模式的 open() 相同 ('\\r\\n', '\\r' -> '\\n')
+        :returns: 生成 (text, is_last)
+        """
+        if size is None:
+            size = self.CHUNK_SIZE
+
+        buf = self.buffer
+        length = len(buf)
+        start = 0
+
+        while start < length:
+            end = buf.find(b'\n', start + size)
+            end = length if end == -1 else end + 1
+
+            text = buf[start:end].decode('utf-8')
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+            start = end
+            yield text, start >= length
+
+    def read(self) -> str:
+        return ''.join(text for text, _ in self.chunks())
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def read_source(path: str) -> Union[str, MappedSource]:
+    """
+    读取源码文件, 不小于 MMAP_SOURCE_SIZE 的文件返回 MappedSource
+    """
+    if 0 < aconfig.MMAP_SOURCE_SIZE <= os.path.getsize(path):
+        return MappedSource(path)
+
+    with open(path, encoding='UTF-8') as f:
+        return f.read()
+
+
+@contextmanager
+def open_source(path: str):
+    """
+    与 read_source 相同, 离开 with 块时关闭 MappedSource
+    """
+    source = read_source(path)
+
+    try:
+        yield source
+    finally:
+        if isinstance(source, MappedSource):
+            source.close()
@@ -2,35 +2,62 @@
 from typing import List, Tuple
 
 
-class ExprAST:
+AST_KINDS = []  # kind -> AST 类
+
+
+class BaseAST:
+    """
+    所有 AST 的父类
+    AST 类都定义 __slots__, 定义时按顺序分配一个整数 kind (类属性),
+    编译器与 ASTConverter 用 kind 作下标查分派表, 而不是逐个 isinstance
+    """
+
+    __slots__ = ()
+
+    kind = -1
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.kind = len(AST_KINDS)
+        AST_KINDS.append(cls)
+
+
+class ExprAST(BaseAST):
     """
     这是所有 表达式AST 的父类
     """
-    pass
+
+    __slots__ = ()
 
 
-class ArgItemAST:
+class ArgItemAST(BaseAST):
+    __slots__ = ('expr', 'star', 'ln')
+
     def __init__(self, expr: 'ExprAST', star: bool, ln: int):
         self.expr = expr
         self.star = star
         self.ln = ln
 
 
-class ArgListAST:
+class ArgListAST(BaseAST):
     """
     arg_list := expr [',' expr]*
     """
 
+    __slots__ = ('exp_list', 'ln')
+
     def __init__(self, item_list: List[ArgItemAST], ln: int):
         self.exp_list = item_list  # TODO: refactor exp_list -> item_list
         self.ln = ln
 
 
-class CellAST:
+class CellAST(BaseAST):
     """
     cell := NUMBER | NAME | STRING | call_expr
     """
 
+    __slots__ = ('value', 'type', 'ln')
+
     def __init__(self, value: object, _type: int, ln: int):
         self.value = value
         self.type = _type
@@ -42,51 +69,61 @@ class CellAST:
     __repr__ = __str__
 
 
-class MemberAccessAST:
+class MemberAccessAST(BaseAST):
+    __slots__ = ('left', 'members', 'ln')
+
     def __init__(self, left: CellAST, members: CellAST, ln: int):
         self.left = left
         self.members = members
         self.ln = ln
 
 
-class UnaryExprAST:
+class UnaryExprAST(BaseAST):
     """
     unary_expr := [unary_op] member_expr
     """
 
+    __slots__ = ('op', 'right_expr', 'ln')
+
     def __init__(self, op: str, right_expr: MemberAccessAST, ln: int):
         self.op = op
         self.right_expr = right_expr
         self.ln = ln
 
 
-class PowerExprAST:
+class PowerExprAST(BaseAST):
     """
     pow_expr := unary_expr ['^' unary_expr]
     """
 
+    __slots__ = ('left', 'right', 'ln')
+
     def __init__(self, left: UnaryExprAST, right: List[UnaryExprAST], ln: int):
         self.left = left
         self.right = right
         self.ln = ln
 
 
-class ModExprAST:
+class ModExprAST(BaseAST):
     """
     mod_expr := pow_expr ['mod' pow_expr]
     """
 
+    __slots__ = ('left', 'right', 'ln')
+
     def __init__(self, left: PowerExprAST, right: List[PowerExprAST], ln: int):
         self.left = left
         self.right = right
         self.ln = ln
 
 
-class MuitDivExprAST:
+class MuitDivExprAST(BaseAST):
     """
     md_expr := mod_expr [('*' | '/') mod_expr]
     """
 
+    __slots__ = ('op', 'left', 'right', 'ln')
+
     def __init__(self, op: str, left: ModExprAST, right: List[ModExprAST], ln: int):
         self.op = op
         self.left = left
@@ -94,11 +131,13 @@ class MuitDivExprAST:
         self.ln = ln
 
 
-class AddSubExprAST:
+class AddSubExprAST(BaseAST):
     """
     real_expr := md_expr [('+' | '-') md_expr]* | '(' real_expr ')'
     """
 
+    __slots__ = ('op', 'left', 'right', 'ln')
+
     def __init__(self, op: str,
                  left: MuitDivExprAST,
                  right: List[Tuple[str, MuitDivExprAST]], ln: int):
@@ -108,14 +147,18 @@ class AddSubExprAST:
         self.ln = ln
 
 
-class GenericBinaryExprAST:
+class GenericBinaryExprAST(BaseAST):
+    __slots__ = ('left', 'right', 'ln')
+
     def __init__(self, left, right: list, ln: int):
         self.left = left
         self.right = right
         self.ln = ln
 
 
-class BitShiftExprAST:
+class BitShiftExprAST(BaseAST):
+    __slots__ = ('op', 'left', 'right', 'ln')
+
     def __init__(self, op: str,
                  left: AddSubExprAST,
                  right: List[Tuple[str, AddSubExprAST]], ln: int):
@@ -125,7 +168,9 @@ class BitShiftExprAST:
         self.ln = ln
 
 
-class BinXorExprAST:
+class BinXorExprAST(BaseAST):
+    __slots__ = ('left', 'right', 'ln')
+
     def __init__(self,
                  left: BitShiftExprAST,
                  right: List[Tuple[str, BitShiftExprAST]], ln: int):
@@ -134,7 +179,9 @@ class BinXorExprAST:
         self.ln = ln
 
 
-class BitOpExprAST:
+class BitOpExprAST(BaseAST):
+    __slots__ = ('op', 'left', 'right', 'ln')
+
     def __init__(self, op: str,
                  left: BinXorExprAST,
                  right: List[Tuple[str, BinXorExprAST]], ln: int):
@@ -144,22 +191,26 @@ class BitOpExprAST:
         self.ln = ln
 
 
-class CallExprAST:
+class CallExprAST(BaseAST):
     """
     call_expr := NAME '(' arg_list ')'
     """
 
+    __slots__ = ('left', 'arg_list', 'ln')
+
     def __init__(self, left: AddSubExprAST, arg_list: ArgListAST, ln: int):
         self.left = left
         self.arg_list = arg_list
         self.ln = ln
 
 
-class ValueListAST:
+class ValueListAST(BaseAST):
     """
     val_list := NAME [',' NAME]
     """
 
+    __slots__ = ('value_list', 'ln')
+
     def __init__(self, v_list: list, ln: int):
         self.value_list = v_list
         self.ln = ln
@@ -173,6 +224,8 @@ class AssignExprAST(ExprAST):
     assi_expr := cell ['=' expr]* NEWLINE
     """
 
+    __slots__ = ('right', 'left', 'aug_assign', 'ln')
+
     def __init__(self, left: BitOpExprAST, right: BitOpExprAST, ln: int,
                  aug_assign: bool = False):
         self.right = right
@@ -186,6 +239,8 @@ class DefineExprAST(ExprAST):
     def_expr := NAME '=' expr NEWLINE
     """
 
+    __slots__ = ('value', 'name', 'ln')
+
     def __init__(self, name: str, value: ExprAST, ln: int):
         self.value = value
         self.name = name
@@ -197,6 +252,8 @@ class PrintStmtAST(ExprAST):
     print_expr := 'PRINT' expr [';' expr]* NEWLINE
     """
 
+    __slots__ = ('value_list', 'ln')
+
     def __init__(self, value_list: list, ln: int):
         self.value_list = value_list
         self.ln = ln
@@ -207,67 +264,79 @@ class InputStmtAST(ExprAST):
     input_expr := 'INPUT' expr ';' val_list NEWLINE
     """
 
+    __slots__ = ('msg', 'value_list', 'ln')
+
     def __init__(self, msg: ExprAST, val_list: ValueListAST, ln: int):
         self.msg = msg
         self.value_list = val_list
         self.ln = ln
 
 
-class CmpTestAST:
+class CmpTestAST(BaseAST):
     """
     cmp_test := expr [cmp_op expr]*
     """
 
+    __slots__ = ('left', 'right', 'ln')
+
     def __init__(self, left: ExprAST, right: list, ln: int):
         self.left = left
         self.right = right
         self.ln = ln
 
 
-class AndTestAST:
+class AndTestAST(BaseAST):
     """
     and_test := cmp_test ['and' cmp_test]
     """
 
+    __slots__ = ('left', 'right', 'ln')
+
     def __init__(self, left: CmpTestAST, right: list, ln: int):
         self.left = left
         self.right = right
         self.ln = ln
 
 
-class OrTestAST:
+class OrTestAST(BaseAST):
     """
     or_test := and_test ['or' and_test]*
     """
 
+    __slots__ = ('left', 'right', 'ln')
+
     def __init__(self, left: AndTestAST, right: list, ln: int):
         self.left = left
         self.right = right
         self.ln = ln
 
 
-class TestExprAST:
+class TestExprAST(BaseAST):
     """
     test := or_test
     """
 
+    __slots__ = ('test', 'ln')
+
     def __init__(self, test: OrTestAST, ln: int):
         self.test = test
         self.ln = ln
 
 
-class BlockAST:
+class BlockAST(BaseAST):
     """
     BLOCK := stmt*
     """
 
+    __slots__ = ('stmts', 'ln', 'new')
+
     def __init__(self, stmts: list, ln: int, new: bool = False):
         self.stmts = stmts
         self.ln = ln
         self.new = new
 
 
-class IfStmtAST:
+class IfStmtAST(BaseAST):
     """
     if_else_expr := 'if' test 'then' NEWLINE
                 BLOK
@@ -278,6 +347,8 @@ class IfStmtAST:
                 'endif'
     """
 
+    __slots__ = ('test', 'block', 'elif_list', 'else_block', 'ln')
+
     def __init__(self, test: TestExprAST,
                  block: BlockAST, elif_list: list, else_block: BlockAST, ln: int):
         self.test = test
@@ -287,39 +358,46 @@ class IfStmtAST:
         self.ln = ln
 
 
-class WhileStmtAST:
+class WhileStmtAST(BaseAST):
     """
     while_expr := 'while' test 'then'
         BLOCK
         'wend' NEWLINE'
     """
 
+    __slots__ = ('test', 'block', 'ln')
+
     def __init__(self, test: TestExprAST, block: BlockAST, ln: int):
         self.test = test
         self.block = block
         self.ln = ln
 
 
-class DoLoopStmtAST:
+class DoLoopStmtAST(BaseAST):
     """
     do_loop_expr := 'do' 'NEWLINE
                 BLOCK
                 'loop' 'until' test NEWLINE
     """
 
+    __slots__ = ('test', 'block', 'ln')
+
     def __init__(self, test: TestExprAST, block: BlockAST, ln: int):
         self.test = test
         self.block = block
         self.ln = ln
 
 
-class FunctionDefineAST:
+class FunctionDefineAST(BaseAST):
     """
     func_def := 'fun' ['(' NAME ')'] NAME '(' arg_list ')' NEWLINE
                 BLOCK
             'end'
     """
 
+    __slots__ = ('name', 'arg_list', 'block', 'bindto', 'decorator', 'ln',
+                 'doc_str', 'is_lambda', 'lambda_return')
+
     def __init__(self, name: str, arg_list: ArgListAST,
                  block: BlockAST, bindto: str, ln: int,
                  doc_str=''):
@@ -334,7 +412,9 @@ class FunctionDefineAST:
         self.lambda_return = None
 
 
-class ClassDefineAST:
+class ClassDefineAST(BaseAST):
+    __slots__ = ('name', 'func', 'bases', 'ln', 'doc_str')
+
     def __init__(self, 
                  name: str, func: FunctionDefineAST,
                  bases: List[ExprAST], ln: int,
@@ -346,100 +426,128 @@ class ClassDefineAST:
         self.doc_str = doc_str
 
 
-class ReturnStmtAST:
+class ReturnStmtAST(BaseAST):
     """
     return_stmt := 'return' expr
     """
 
+    __slots__ = ('expr', 'ln')
+
     def __init__(self, expr: ExprAST, ln: int):
         self.expr = expr
         self.ln = ln
 
 
-class GlobalStmtAST:
+class GlobalStmtAST(BaseAST):
+    __slots__ = ('name', 'ln')
+
     def __init__(self, name: str, ln: int):
         self.name = name
         self.ln = ln
 
 
-class NonlocalStmtAST:
+class NonlocalStmtAST(BaseAST):
+    __slots__ = ('name', 'ln')
+
     def __init__(self, name: str, ln: int):
         self.name = name
         self.ln = ln
 
 
-class ContinueStmtAST:
+class ContinueStmtAST(BaseAST):
     """
     continue_stmt := 'continue'
     """
 
+    __slots__ = ('ln',)
+
     def __init__(self, ln: int):
         self.ln = ln
 
 
-class BreakStmtAST:
+class BreakStmtAST(BaseAST):
     """
     break_stmt := 'break'
     """
 
+    __slots__ = ('ln',)
+
     def __init__(self, ln: int):
         self.ln = ln
 
 
-class NullLineAST:
+class NullLineAST(BaseAST):
     """
     null_line := NEWLINE
     """
 
+    __slots__ = ('ln',)
+
     def __init__(self, ln: int):
         self.ln = ln
 
 
-class EOFAST:
+class EOFAST(BaseAST):
+    __slots__ = ('ln',)
+
     def __init__(self, ln: int):
         self.ln = ln
 
 
-class ItemListAST:
+class ItemListAST(BaseAST):
+    __slots__ = ('item_list', 'ln')
+
     def __init__(self, item_list: list, ln: int):
         self.item_list = item_list
         self.ln = ln
 
 
-class ArrayAST:
+class ArrayAST(BaseAST):
+    __slots__ = ('items', 'ln')
+
     def __init__(self, items: ItemListAST, ln: int):
         self.items = items
         self.ln = ln
 
 
-class TupleAST:
+class TupleAST(BaseAST):
+    __slots__ = ('items', 'ln', 'store')
+
     def __init__(self, items: list, store: bool, ln: int):
         self.items = items
         self.ln = ln
         self.store = store
 
 
-class MapAST:
+class MapAST(BaseAST):
+    __slots__ = ('keys', 'values', 'ln')
+
     def __init__(self, keys: list, values: list, ln :int):
         self.keys = keys
         self.values = values
         self.ln = ln
 
 
-class SubscriptExprAST:
+class SubscriptExprAST(BaseAST):
+    __slots__ = ('expr', 'left', 'ln')
+
     def __init__(self, left: AddSubExprAST, expr: AddSubExprAST, ln: int):
         self.expr = expr
         self.left = left
         self.ln = ln
 
 
-class LoadStmtAST:
+class LoadStmtAST(BaseAST):
+    __slots__ = ('path', 'ln')
+
     def __init__(self, path: str, ln: int):
         self.path = path
         self.ln = ln
 
 
-class ImportStmtAST:
+class ImportStmtAST(BaseAST):
+    __slots__ = ('path', 'name', 'ln', 'members')
+
     def __init__(self, path: str, name: str, ln: int, members: List[str] = None):
         self.path = path
         self.name = name
@@ -447,7 +555,9 @@ class ImportStmtAST:
         self.members = members if members is not None else list()
 
 
-class StructDefineAST:
+class StructDefineAST(BaseAST):
+    __slots__ = ('name', 'name_list', 'protected_list', 'ln')
+
     def __init__(self, name: str, name_list: list, protected_list: list, ln: int):
         self.name = name
         self.name_list = name_list
@@ -455,25 +565,33 @@ class StructDefineAST:
         self.ln = ln
 
 
-class NotTestAST:
+class NotTestAST(BaseAST):
+    __slots__ = ('expr', 'ln')
+
     def __init__(self, expr: CmpTestAST, ln):
         self.expr = expr
         self.ln = ln
 
 
-class AssignExprListAST:
+class AssignExprListAST(BaseAST):
+    __slots__ = ('expr_list', 'ln')
+
     def __init__(self, expr_list: list, ln):
         self.expr_list = expr_list
         self.ln = ln
 
 
-class BinaryExprListAST:
+class BinaryExprListAST(BaseAST):
+    __slots__ = ('expr_list', 'ln')
+
     def __init__(self, expr_list: list, ln):
         self.expr_list = expr_list
         self.ln = ln
 
 
-class ForStmtAST:
+class ForStmtAST(BaseAST):
+    __slots__ = ('init_list', 'test', 'update_list', 'block', 'ln')
+
     def __init__(self, init_list: AssignExprListAST,
                  test: TestExprAST, update_list: BinaryExprListAST,
                  block: BlockAST, ln):
@@ -484,19 +602,25 @@ class ForStmtAST:
         self.ln = ln
 
 
-class ThrowStmtAST:
+class ThrowStmtAST(BaseAST):
+    __slots__ = ('expr', 'ln')
+
     def __init__(self, expr: AddSubExprAST, ln: int):
         self.expr = expr
         self.ln = ln
 
 
-class AssertStmtAST:
+class AssertStmtAST(BaseAST):
+    __slots__ = ('expr', 'ln')
+
     def __init__(self, expr: TestExprAST, ln: int):
         self.expr = expr
         self.ln = ln
 
 
-class TryCatchStmtAST:
+class TryCatchStmtAST(BaseAST):
+    __slots__ = ('try_block', 'catch_block', 'finally_block', 'name', 'ln')
+
     def __init__(self, try_block: BlockAST,
                  catch_block: BlockAST,
                  finally_block: BlockAST,
@@ -508,7 +632,9 @@ class TryCatchStmtAST:
         self.ln = ln
 
 
-class PyCodeBlock:
+class PyCodeBlock(BaseAST):
+    __slots__ = ('code', 'ln')
+
     def __init__(self, code: str, ln: int):
         self.code = code
         self.ln = ln
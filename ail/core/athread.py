@@ -7,8 +7,6 @@ from .aconfig import BYTE_CODE_SIZE
 from .aframe import Frame
 from .aobjects import get_state
 
-from .avmsig import VMInterrupt, MII_DO_JUMP
-
 
 _SCH_LOCK = Lock()
 
@@ -66,10 +64,16 @@ class ThreadScheduler:
     def del_thread(self, t_count: int):
         del self.__threads[t_count]
 
+    def has_thread(self) -> bool:
+        return bool(self.__threads)
+
     def __select_a_thread(self) -> ThreadState:
         return self.__threads[randint(0, len(self.__threads.keys()) - 1)]
 
     def schedule(self):
+        """
+        切换到另一个线程, 求值循环随后从 global_interpreter.op_counter 继续执行
+        """
         _SCH_LOCK.acquire()
 
         m_state = get_state()
@@ -89,7 +93,5 @@ class ThreadScheduler:
 
         _SCH_LOCK.release()
 
-        raise VMInterrupt(MII_DO_JUMP)
-
 
 THREAD_SCHEDULER = ThreadScheduler()
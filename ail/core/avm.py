@@ -3,6 +3,7 @@
 __author__ = 'LaomoBK'
 
 import copy
+import operator
 import re
 import sys
 import types
@@ -16,6 +17,7 @@ from . import (
     abuiltins,
     aopcode as opcs,
     aloader,
+    aconfig,
 )
 
 from .aframe import (
@@ -36,6 +38,7 @@ from .aobjects import (
 )
 
 from .astate import MAIN_INTERPRETER_STATE, NamespaceState
+from .anamespace import Namespace
 from .astacktrace import StackTrace
 
 from .athread import THREAD_SCHEDULER, ThreadState
@@ -49,7 +52,7 @@ from .error import (
 from . import shared
 
 from ..objects.string import STRING_TYPE, convert_to_string
-from ..objects.integer import INTEGER_TYPE
+from ..objects.integer import INTEGER_TYPE, get_integer
 from ..objects.bool import BOOL_TYPE
 from ..objects.wrapper import WRAPPER_TYPE
 from ..objects.float import FLOAT_TYPE
@@ -84,18 +87,23 @@ from .avmsig import *
 
 _BUILTINS = abuiltins.BUILTINS
 _new_namespace = new_namespace
+_Namespace = Namespace
 
 # GLOBAL SETTINGS
 REFERENCE_LIMIT = 8192
-_MAX_RECURSION_DEPTH = 888
+_MAX_RECURSION_DEPTH = 8888
+_MAX_EVAL_DEPTH = 888  # 求值循环的最大嵌套层数 (经过 Python 递归的函数调用)
 _MAX_BREAK_POINT_NUMBER = 50
 _INTERVAL = 100
 
+_NEW_FRAME = -1  # __call_in_loop 的返回值, 表示求值循环需要切换到新的帧
+
 _AIL_VERSION = AIL_VERSION
 
 shared.GLOBAL_SHARED_DATA.max_recursion_depth = _MAX_RECURSION_DEPTH
-sys.setrecursionlimit(_MAX_RECURSION_DEPTH * 3)  
-# three times of AIL recursion depth
+sys.setrecursionlimit(_MAX_EVAL_DEPTH * 4)  
+# four times of AIL recursion depth
+# (dispatch table engine uses one more python frame per call)
 
 true = convert_to_ail_object(True)
 false = convert_to_ail_object(False)
@@ -120,6 +128,35 @@ _binary_op_dict = {
     binary_xor: ('xor', '__xor__', '__xor__'),
 }
 
+# 特化的字节码也按原来的字节码处理 (switch 引擎不做特化)
+_binary_op_dict.update(
+    {q: _binary_op_dict[g] for q, g in QUICKENED_OPS.items()})
+
+# switch 引擎也使用 dispatch table 中的 handler 执行超级指令
+_SUPERINSTRUCTION_OPS = frozenset(SUPERINSTRUCTIONS.values())
+
+# 通用的字节码 -> (整数特化的字节码, 浮点数特化的字节码)
+_quicken_binary_op_dict = {
+    binary_add: (binary_add_int, binary_add_float),
+    binary_sub: (binary_sub_int, binary_sub_float),
+    binary_mult: (binary_mult_int, binary_mult_float),
+}
+
+
+def _new_float(v: float) -> AILObject:
+    return create_object(FLOAT_TYPE, v)
+
+
+# 特化的字节码 -> (操作数类型, 运算, 结果装箱函数)
+_quickened_op_info = {
+    binary_add_int: (INTEGER_TYPE, operator.add, get_integer),
+    binary_add_float: (FLOAT_TYPE, operator.add, _new_float),
+    binary_sub_int: (INTEGER_TYPE, operator.sub, get_integer),
+    binary_sub_float: (FLOAT_TYPE, operator.sub, _new_float),
+    binary_mult_int: (INTEGER_TYPE, operator.mul, get_integer),
+    binary_mult_float: (FLOAT_TYPE, operator.mul, _new_float),
+}
+
 _binary_compare_op = (
     '__eq__',
     '__ge__',
@@ -129,6 +166,16 @@ _binary_compare_op = (
     '__ne__', 
 )
 
+# a < b 不支持时 (如 int 与 float) 尝试 b > a
+_reflected_compare_op = {
+    '__eq__': '__eq__',
+    '__ge__': '__le__',
+    '__le__': '__ge__',
+    '__gt__': '__lt__',
+    '__lt__': '__gt__',
+    '__ne__': '__ne__',
+}
+
 
 class TempEnvironment:
     __slots__ = ['temp_var']
@@ -191,9 +238,14 @@ class Interpreter:
         self.__return_value = None
         self.__returning = False
 
+        self.__eval_depth = 0
+
         self.__raise_python_error = False
 
         self.main_lock = None
+
+        self.__dispatch_table = self.__make_dispatch_table()
+        self.__eval_bytecode = self.__select_engine()
     
     @property
     def __tof(self) -> Frame:
@@ -304,17 +356,18 @@ class Interpreter:
         return aobj
 
     def get_stack_trace(self) -> StackTrace:
+        self.__sync_lineno()
         tof = self.__tof
         return StackTrace([copy.copy(f) for f in self.__frame_stack],
                           tof.lineno, tof.code.filename, tof.code.name)
 
     def __store_var(self, name, value):
         if self.__tof is self.__global_frame:
-            self.__namespace_state.ns_global.ns_dict[name] = value
+            self.__namespace_state.ns_global.set(name, value)
         else:
             if name in self.__tof.code.global_names and \
                     name in self.__tof.code.global_names:
-                self.__namespace_state.ns_global.ns_dict[name] = value
+                self.__namespace_state.ns_global.set(name, value)
             elif name in self.__tof.code.nonlocal_names:
                 for outer in self.__tof.closure_outer:
                     if name in outer:
@@ -322,14 +375,27 @@ class Interpreter:
             else:
                 self.__tof.variable[name] = value
 
+    def __store_var_by_index(self, name_index: int, value):
+        tof = self.__tof
+        if tof.fast_locals is not None and name_index in tof.code.fast_locals:
+            tof.fast_locals[name_index] = value
+        else:
+            self.__store_var(tof.varnames[name_index], value)
+
     def __delete_name(self, name_index: int):
+        tof = self.__tof
+        if tof.fast_locals is not None and name_index in tof.code.fast_locals:
+            v = tof.fast_locals[name_index]
+            tof.fast_locals[name_index] = None
+            return v
+
         name = self.__tof.varnames[name_index]
 
         if self.__tof is self.__global_frame:
-            return self.__namespace_state.ns_global.ns_dict.pop(name, None)
+            return self.__namespace_state.ns_global.pop(name)
         else:
             if name in self.__tof.code.global_names:
-                return self.__namespace_state.ns_global.ns_dict.pop(name, None)
+                return self.__namespace_state.ns_global.pop(name)
             elif name in self.__tof.code.nonlocal_names:
                 del_target_dict = None
                 for outer in self.__tof.closure_outer:
@@ -343,6 +409,7 @@ class Interpreter:
                 return self.__tof.variable.pop(name, None)
 
     def make_runtime_error_obj(self, msg: str, err_type: str):
+        self.__sync_lineno()
         return make_err_struct_object(
                 AILRuntimeError(
                     msg, err_type, self.__tof, self.get_stack_trace()),
@@ -358,6 +425,7 @@ class Interpreter:
         raise VMInterrupt(MII_ERR_POP_TO_TRY)
 
     def raise_error(self, msg: str, err_type: str):
+        self.__sync_lineno()
         errs = make_err_struct_object(
             AILRuntimeError(
                 msg, err_type, self.__tof, self.get_stack_trace()),
@@ -457,6 +525,30 @@ class Interpreter:
 
         if lno >= 0:
             self.__tof.lineno = lno
+
+    def __sync_lineno(self):
+        """
+        根据 op_counter 更新栈顶帧的行号
+        (__run_bytecode_fast 不会逐条更新行号, 所以在生成栈回溯或
+         进入新的帧之前需要调用这个方法)
+        """
+        frame_stack = self.__frame_stack
+        if not frame_stack:
+            return
+
+        tof = frame_stack[-1]
+        if tof.code is None:
+            return
+
+        lno_list = tof.code.lineno_list
+        ln_index = min(self.op_counter // 2, len(lno_list) - 1)
+
+        while ln_index >= 0:
+            lno = lno_list[ln_index]
+            if lno >= 0:
+                tof.lineno = lno
+                return
+            ln_index -= 1
     
     @lru_cache(None)
     def __binary_op(self, op: str, pymth: str, ailmth: str, a, b):
@@ -557,6 +649,8 @@ class Interpreter:
         
         if a_cls.otype in _num_otypes and b_cls.otype in _num_otypes:
             res = getattr(a_val, cmp_opm)(b_val)
+            if res is NotImplemented:
+                res = getattr(b_val, _reflected_compare_op[cmp_opm])(a_val)
             if res is not NotImplemented:
                 return true if res else false
             self.raise_error('Not support \'%s\' between %s and %s' % 
@@ -582,14 +676,19 @@ class Interpreter:
 
         return true if res else false
 
-    def __check_block(self, block: Block, for_return: bool = False) -> VMInterrupt:
+    def __check_block(self, block: Block, for_return: bool = False) -> bool:
+        """
+        :return: True if jump to the finally block
+        """
         if block.type == BLOCK_FINALLY:
             self.op_counter = block.handler
             if for_return:
                 self.__push_back(self.__return_value)
                 self.__push_back(WHY_RETURN)
-            return VMInterrupt(MII_DO_JUMP)
-        return None
+            self.__interrupted = True
+            self.__interrupt_signal = MII_DO_JUMP
+            return True
+        return False
 
     def __pop_and_get_block(self, b_type: int) -> Block:
         stack = self.__block_stack
@@ -618,10 +717,13 @@ class Interpreter:
     
     @lru_cache(None)
     def __bool_test(self, obj):
-        if '__value__' in obj.properties:
-            return bool(obj.properties['__value__'])
+        if has_attr(obj, '__value__'):
+            return bool(obj['__value__'])
 
     def __pop_and_unwind_block(self, why) -> Block:
+        """
+        :return: 弹出的块, 需要先执行 finally 块时返回 None (此时不弹出)
+        """
         stack = self.__block_stack
         b = self.__block_stack[-1]
 
@@ -635,7 +737,9 @@ class Interpreter:
                 self.__push_back(loop_b.handler)
                 self.__push_back(why)
                 self.op_counter = b.handler
-                raise VMInterrupt(MII_DO_JUMP)
+                self.__interrupted = True
+                self.__interrupt_signal = MII_DO_JUMP
+                return None
 
         stack.pop()
         return b
@@ -644,6 +748,8 @@ class Interpreter:
         stack = self.__block_stack
         while stack:
             b = self.__pop_and_unwind_block(WHY_BREAK)
+            if b is None:
+                return None
             if b.type == BLOCK_LOOP:
                 return b.handler
         self.raise_error('no block to handle \'break\'', 'VMError')
@@ -662,7 +768,8 @@ class Interpreter:
             if b.type == BLOCK_LOOP:
                 loop_block = b
                 break
-            self.__pop_and_unwind_block(WHY_CONTINUE)
+            if self.__pop_and_unwind_block(WHY_CONTINUE) is None:
+                return None
         else:
             self.raise_error('no block to handle continue', 'VMError')
 
@@ -683,6 +790,30 @@ class Interpreter:
                 if n in outer:
                     return outer[n]
 
+            return self.__lookup_global(n)
+
+        ns_state = self.__namespace_state
+        g = ns_state.ns_global.ns_dict
+
+        # 内联缓存: 记录本条指令上次在哪个 ns_dict 找到该名称
+        cache = tof.code.name_cache
+        i = self.op_counter >> 1
+        e = cache[i]
+        if e is not None and e[0] == _Namespace.version and e[1] is g:
+            v = e[2].get(n)
+            if v is not None:
+                return v
+
+        d = ns_state.ns_global.lookup(n)
+        if d is None:
+            d = ns_state.ns_builtins.lookup(n)
+            if d is None:
+                return None
+
+        cache[i] = (_Namespace.version, g, d)
+        return d[n]
+
+    def __lookup_global(self, n: str) -> AILObject:
         ns_state = self.__namespace_state
 
         v = ns_state.ns_global.get(n)
@@ -699,66 +830,107 @@ class Interpreter:
         self.call_function(func, argc, argl, ex, frame)
         THREAD_SCHEDULER.del_thread(thread_count)
 
+    def __make_function_frame(self, func, argc, argl,
+                              ex: bool = False, frame=None) -> Frame:
+        """
+        为 AIL 函数 func 的调用创建帧, 并检查参数个数
+        """
+        c: AILCodeObject = func['__code__']
+        var_arg = c.var_arg
+        if var_arg is not None:
+            ex = True
+
+        n = c.argcount
+
+        # 接收者 (struct 方法的 this, 类方法的 self) 按引用作为第一个参数
+        # struct 对象的 this 在创建对象时就已经带有 _pthis_ 标记
+        # now variable 'this' is replace by param 'this'
+        # 2020-10-13
+        this = func['__this__']
+
+        if func['__self__'] is not None:
+            if this is not None:
+                argl = [this] + argl
+                argc += 1
+            this = func['__self__']
+
+        if this is not None:
+            argc += 1
+            if not n:  # 只有可变参数
+                argl = [this] + argl
+                this = None
+
+        if (n != argc and not ex) or (n > argc and ex):
+            self.raise_error(
+                '\'%s\' takes %d argument(s), but got %d.' % (
+                    c.name, n, argc),
+                'TypeError'
+            )
+
+        # 不含接收者的参数个数
+        nargs = n if this is None else n - 1
+
+        # init new frame
+        f = Frame() if frame is None else frame
+
+        if c.fast_locals:
+            # 参数位于 varnames 的最前面
+            fast_locals = [None] * len(c.varnames)
+            if this is None:
+                fast_locals[:n] = argl[:n]
+            else:
+                fast_locals[0] = this
+                fast_locals[1:n] = argl[:nargs]
+            if ex:
+                fast_locals[n] = convert_to_array(argl[nargs:])
+            f.fast_locals = fast_locals
+        else:
+            variable = f.variable
+            varnames = c.varnames
+            i = 0
+            if this is not None:
+                variable[varnames[0]] = this
+                i = 1
+            for k, v in zip(varnames[i:n], argl):
+                variable[k] = v
+            if ex:
+                variable[var_arg] = convert_to_array(argl[nargs:])
+
+        f.varnames = c.varnames
+        f.code = c
+        f.consts = c.consts
+
+        if c.closure:
+            f.closure_outer = c._closure_outer
+
+        return f
+
     def call_function(self,
                       func, argc, argl,
                       ex: bool=False, frame=None, t_state: ThreadState = None):
         if isinstance(func, AILObject):  # it should be FUNCTION_TYPE
             if func['__class__'] == FUNCTION_TYPE:
                 c: AILCodeObject = func['__code__']
-                var_arg = c.var_arg
-                if var_arg is not None:
-                    ex = True
+                f = self.__make_function_frame(func, argc, argl, ex, frame)
 
-                try:
-                    if func['__this__'] is not None:
-                        this = copy.copy(func['__this__'])
-                        this._pthis_ = True  # add _pthis_ attr
-
-                        # now variable 'this' is replace by param 'this'
-                        # 2020-10-13
-                        # f.variable['this'] = this  # add this pointer
-
-                        argc += 1
-                        argl.insert(0, this)
-
-                    if func['__self__'] is not None:
-                        this = copy.copy(func['__self__'])
-                        argc += 1
-                        argl.insert(0, this)
-                except TypeError:
-                    pass
-                
-                if (c.argcount != argc and not ex) or (c.argcount > argc and ex):
+                if self.__eval_depth >= _MAX_EVAL_DEPTH:
                     self.raise_error(
-                        '\'%s\' takes %d argument(s), but got %d.' % (
-                            c.name, c.argcount, argc),
-                        'TypeError'
-                    )
-                
-                argd = {k: v for k, v in zip(c.varnames[:c.argcount], argl)}
-                if ex:
-                    argd[var_arg] = convert_to_array(argl[c.argcount:])
-
-                # init new frame
-                f = Frame() if frame is None else frame
-
-                f.varnames = c.varnames
-                f.variable.update(argd)
-                f.code = c
-                f.consts = c.consts
-
-                if c.closure:
-                    f.closure_outer = c._closure_outer
+                        'Maximum recursion depth exceeded', 'RecursionError')
 
                 try:
                     self.__tof._latest_call_opcounter = self.op_counter
+                    self.__sync_lineno()
 
                     # now_globals = self.__namespace_state.ns_global.ns_dict
                     
-                    with self.get_context():
-                        if func['__global_ns__'] is not None:
-                            self.__set_globals(func['__global_ns__'])
-                        why = self.__run_bytecode(c, f, t_state=t_state)
+                    self.__eval_depth += 1
+                    try:
+                        with self.get_context():
+                            if func['__global_ns__'] is not None:
+                                self.__set_globals(func['__global_ns__'])
+                            why = self.__eval_bytecode(c, f, t_state=t_state)
+                    finally:
+                        self.__eval_depth -= 1
 
                     ok = True
 
@@ -784,8 +956,7 @@ class Interpreter:
 
                 if func['__this__'] is not None:
                     has_this = True
-                    this = copy.copy(func['__this__'])
-                    argl.insert(0, this)  # add this to 0
+                    argl.insert(0, func['__this__'])  # add this to 0
                     argc += 1
 
                 if func['__self__'] is not None:
@@ -856,22 +1027,1009 @@ class Interpreter:
                     '\'%s\' object is not callable.' %
                     func['__class__'].name, 'TypeError')
 
+    def __call_in_loop(self, func, argc, argl, ex: bool = False) -> int:
+        """
+        在当前的求值循环中调用 AIL 函数: 压入新的帧, 不经过 Python 递归
+        函数返回或抛出未处理的异常时, 由求值循环调用 __leave_loop_call 回到调用者
+        :return: _NEW_FRAME
+        """
+        f = self.__make_function_frame(func, argc, argl, ex)
+
+        self.__tof._latest_call_opcounter = self.op_counter
+        self.__sync_lineno()
+
+        self.__push_new_frame(None, f)
+
+        ns_global = self.__namespace_state.ns_global
+        f._caller_globals = ns_global.ns_dict
+        if func['__global_ns__'] is not None:
+            ns_global.ns_dict = func['__global_ns__']
+
+        self.op_counter = 0
+        return _NEW_FRAME
+
+    def __leave_loop_call(self) -> Frame:
+        """
+        弹出由 __call_in_loop 压入的帧, op_counter 回到调用处
+        :return: 调用者的帧
+        """
+        frame_stack = self.__frame_stack
+        f = frame_stack.pop()
+
+        self.__set_globals(f._caller_globals)
+
+        caller = frame_stack[-1]
+        self.op_counter = caller._latest_call_opcounter
+
+        return caller
+
+    def __loop_code(self, cobj: AILCodeObject, base_depth: int) -> list:
+        """
+        :return: 求值循环当前的帧的字节码
+        """
+        frame_stack = self.__frame_stack
+        if len(frame_stack) > base_depth:
+            return frame_stack[-1].code.bytecodes
+        return cobj.bytecodes
+
     def __return(self, set_value: bool = True):
         if set_value:
             self.__return_value = self.pop_top()
         stack = self.__block_stack
         while stack:
-            block = stack[-1]
-            interrupt = self.__check_block(block, True)
-            if interrupt is not None:
-                raise interrupt
+            if self.__check_block(stack[-1], True):
+                return
             stack.pop()
-        raise VMInterrupt(MII_RETURN)
+        self.__interrupted = True
+        self.__interrupt_signal = MII_RETURN
+
+    # dispatch table engine
+    # 每个 handler 只接收 argv, 若需要跳转则返回目标 op_counter, 否则返回 None
+
+    def __make_dispatch_table(self) -> list:
+        table = [self.__op_nop] * 256
+
+        for op, handler in (
+                (pop_top, self.__op_pop_top),
+                (print_value, self.__op_print_value),
+                (input_value, self.__op_input_value),
+                (store_var, self.__op_store_var),
+                (load_fast, self.__op_load_fast),
+                (store_fast, self.__op_store_fast),
+                (load_const, self.__op_load_const),
+                (load_varname, self.__op_load_varname),
+                (load_variable, self.__op_load_variable),
+                (delete_var, self.__op_delete_var),
+                (load_global, self.__op_load_global),
+                (push_none, self.__op_push_none),
+                (return_value, self.__op_return_value),
+                (setup_for, self.__op_setup_for),
+                (setup_doloop, self.__op_setup_loop),
+                (setup_while, self.__op_setup_loop),
+                (pop_for, self.__op_pop_for),
+                (pop_loop, self.__op_pop_block),
+                (jump_absolute, self.__op_jump_absolute),
+                (jump_forward, self.__op_jump_forward),
+                (jump_if_false, self.__op_jump_if_false),
+                (jump_if_false_or_pop, self.__op_jump_if_false_or_pop),
+                (jump_if_true_or_pop, self.__op_jump_if_true_or_pop),
+                (pop_jump_if_false_or_pop, self.__op_pop_jump_if_false_or_pop),
+                (pop_jump_if_true_or_pop, self.__op_pop_jump_if_true_or_pop),
+                (jump_forward_if_false, self.__op_jump_forward_if_false),
+                (jump_forward_if_false_or_pop,
+                    self.__op_jump_forward_if_false_or_pop),
+                (jump_forward_true_or_pop, self.__op_jump_forward_true_or_pop),
+                (pop_jump_forward_if_true_or_pop,
+                    self.__op_pop_jump_forward_if_true_or_pop),
+                (pop_jump_forward_if_false_or_pop,
+                    self.__op_pop_jump_forward_if_false_or_pop),
+                (binary_not, self.__op_binary_not),
+                (compare_op, self.__op_compare_op),
+                (break_loop, self.__op_break_loop),
+                (continue_loop, self.__op_continue_loop),
+                (call_func, self.__op_call_func),
+                (call_func_ex, self.__op_call_func_ex),
+                (make_function, self.__op_make_function),
+                (build_array, self.__op_build_array),
+                (build_tuple, self.__op_build_tuple),
+                (unpack_sequence, self.__op_unpack_sequence),
+                (build_map, self.__op_build_map),
+                (build_const_key_map, self.__op_build_const_key_map),
+                (join_array, self.__op_join_array),
+                (binary_subscr, self.__op_binary_subscr),
+                (unary_negative, self.__op_unary_negative),
+                (unary_invert, self.__op_unary_invert),
+                (unary_inc, self.__op_unary_inc),
+                (unary_dec, self.__op_unary_dec),
+                (load_module, self.__op_load_module),
+                (import_name, self.__op_import_name),
+                (import_from, self.__op_import_from),
+                (store_subscr, self.__op_store_subscr),
+                (load_attr, self.__op_load_attr),
+                (store_attr, self.__op_store_attr),
+                (store_struct, self.__op_store_struct),
+                (build_class, self.__op_build_class),
+                (set_protected, self.__op_set_protected),
+                (throw_error, self.__op_throw_error),
+                (setup_finally, self.__op_setup_finally),
+                (setup_try, self.__op_setup_try),
+                (setup_catch, self.__op_setup_catch),
+                (pop_try, self.__op_pop_block),
+                (pop_finally, self.__op_pop_block),
+                (end_finally, self.__op_end_finally),
+                (pop_catch, self.__op_pop_catch),
+                (bind_function, self.__op_bind_function),
+                (compare_jump_if_false, self.__op_compare_jump_if_false),
+                (store_var_pop, self.__op_store_var_pop),
+                (store_fast_pop, self.__op_store_fast_pop),
+                (load_fast_load_const, self.__op_load_fast_load_const),
+                (load_variable_binary, self.__op_load_variable_binary),
+                (load_const_binary, self.__op_load_const_binary),
+                (load_fast_binary, self.__op_load_fast_binary)):
+            table[op] = handler
+
+        for op in BINARY_OPS:
+            table[op] = self.__make_binary_op_handler(
+                *_binary_op_dict[op], _quicken_binary_op_dict.get(op))
+
+        for op, generic_op in QUICKENED_OPS.items():
+            table[op] = self.__make_quickened_op_handler(
+                generic_op, table[generic_op], *_quickened_op_info[op])
+
+        return table
+
+    def __op_nop(self, argv):
+        pass
+
+    def __op_pop_top(self, argv):
+        self.__tof.stack.pop()
+
+    def __op_print_value(self, argv):
+        tosl = [self.pop_top() for _ in range(argv)][::-1]
+
+        for tos in tosl:
+            tosm = self.check_object(
+                    tos['__str__'](tos), not_convert=True)
+
+            sys.stdout.write(tosm + ' ')
+        sys.stdout.write('\n')
+
+    def __op_input_value(self, argv):
+        vc = argv
+
+        vl = [self.pop_top() for _ in range(vc)][::-1]
+        tos = self.pop_top()
+
+        if isinstance(tos, AILObject):
+            msg = self.check_object(tos['__str__'](tos))
+        else:
+            msg = str(tos)
+
+        inp = input(msg)
+
+        if vc > 1:
+            sip = [convert_to_string(x)
+                   for x in re.split(r'\s+', inp) if x]
+        else:
+            sip = [convert_to_string(inp)]
+
+        if vl and len(vl) != len(sip):
+            self.raise_error(
+                'required input value is not enough',
+                'ValueError')
+        else:
+            for k, v in zip(vl, sip):
+                self.__store_var(k, v)
+
+    def __op_store_var(self, argv):
+        tof = self.__tof
+        v = tof.stack.pop()
+
+        self.__store_var(tof.varnames[argv], v)
+        tof.stack.append(v)
+
+    def __op_load_fast(self, argv):
+        tof = self.__tof
+        var = tof.fast_locals[argv]
+
+        if var is None:
+            # 还未赋值, 按名称查找 (闭包, 全局, 内建)
+            var = self.__load_name(argv)
+            if var is None:
+                self.raise_error(
+                    'name \'%s\' is not defined' % tof.varnames[argv],
+                    'NameError')
+
+        tof.stack.append(var)
+
+    def __op_store_fast(self, argv):
+        tof = self.__tof
+        tof.fast_locals[argv] = tof.stack[-1]
+
+    def __op_load_const(self, argv):
+        tof = self.__tof
+        tof.stack.append(tof.consts[argv])
+
+    def __op_load_varname(self, argv):
+        tof = self.__tof
+        tof.stack.append(tof.varnames[argv])
+
+    def __op_load_variable(self, argv):
+        var = self.__load_name(argv)
+        if var is None:
+            name = self.__tof.varnames[argv]
+            self.raise_error(
+                'name \'%s\' is not defined' % name, 'NameError')
+        else:
+            self.__tof.stack.append(var)
+
+    def __op_delete_var(self, argv):
+        v = self.__delete_name(argv)
+        if v is None:
+            name = self.__tof.varnames[argv]
+            self.raise_error(
+                'name \'%s\' is not defined' % name, 'NameError')
+
+    def __op_load_global(self, argv):
+        n = self.__tof.varnames[argv]
+
+        for f in self.__frame_stack:
+            if n in f.variable:
+                o = f.variable[n]
+                o.reference += 1
+                self.__tof.stack.append(o)
+                break
+        else:
+            self.raise_error(
+                'name \'%s\' is not defined' % n, 'NameError')
+
+    def __op_push_none(self, argv):
+        self.__tof.stack.append(None)
+
+    def __op_return_value(self, argv):
+        self.__return()
+
+    def __op_setup_for(self, argv):
+        self.__temp_env_stack.append(TempEnvironment())
+        self.__push_block(BLOCK_LOOP, argv)
+
+    def __op_setup_loop(self, argv):
+        self.__push_block(BLOCK_LOOP, argv)
+
+    def __op_pop_for(self, argv):
+        self.__temp_env_stack.pop()
+        self.__pop_block()
+
+    def __op_pop_block(self, argv):
+        self.__pop_block()
+
+    def __op_jump_absolute(self, argv):
+        return argv
+
+    def __op_jump_forward(self, argv):
+        return self.op_counter + argv
+
+    def __op_jump_if_false(self, argv):
+        return self.__get_jump(argv, False, 0)
+
+    def __op_jump_if_false_or_pop(self, argv):
+        stack = self.__tof.stack
+        tos = stack.pop()
+
+        if not self.__bool_test(tos):
+            stack.append(tos)
+            return argv
+
+    def __op_jump_if_true_or_pop(self, argv):
+        stack = self.__tof.stack
+
+        if self.__bool_test(stack[-1]):
+            return argv
+        stack.pop()
+
+    def __op_pop_jump_if_false_or_pop(self, argv):
+        if not self.__bool_test(self.__tof.stack.pop()):
+            return argv
+
+    def __op_pop_jump_if_true_or_pop(self, argv):
+        if self.__bool_test(self.__tof.stack.pop()):
+            return argv
+
+    def __op_jump_forward_if_false(self, argv):
+        if not self.__bool_test(self.__tof.stack[-1]):
+            return self.op_counter + argv
+
+    def __op_jump_forward_if_false_or_pop(self, argv):
+        stack = self.__tof.stack
+        tos = stack.pop()
+
+        if not self.__bool_test(tos):
+            stack.append(tos)
+            return self.op_counter + argv
+
+    def __op_jump_forward_true_or_pop(self, argv):
+        stack = self.__tof.stack
+
+        if self.__bool_test(stack[-1]):
+            return self.op_counter + argv
+        stack.pop()
+
+    def __op_pop_jump_forward_if_true_or_pop(self, argv):
+        if self.__bool_test(self.__tof.stack.pop()):
+            return self.op_counter + argv
+
+    def __op_pop_jump_forward_if_false_or_pop(self, argv):
+        if not self.__bool_test(self.__tof.stack.pop()):
+            return self.op_counter + argv
+
+    def __make_binary_op_handler(self, op: str, pym: str, ailm: str,
+                                 quick: tuple = None):
+        binary_op = self.__binary_op
+        quicken = self.__quicken_binary_op
+
+        def handler(argv):
+            stack = self.__tof.stack
+            b = stack.pop()
+            a = stack.pop()
+
+            res = self.check_object(binary_op(op, pym, ailm, a, b))
+
+            self.__tof.stack.append(res)
+
+            if quick is not None:
+                quicken(a, b, quick)
+
+        return handler
+
+    def __quicken_binary_op(self, a, b, quick: tuple):
+        """
+        两个操作数同为整数或浮点数时, 将当前字节码改写为特化的版本
+        :param quick: (整数特化的字节码, 浮点数特化的字节码)
+        """
+        if type(a) is not AILObject or type(b) is not AILObject:
+            return
+
+        t = a.obj_type
+        if t is not b.obj_type:
+            return
+
+        if t is INTEGER_TYPE:
+            q = quick[0]
+        elif t is FLOAT_TYPE:
+            q = quick[1]
+        else:
+            return
+
+        self.__tof.code.bytecodes[self.op_counter] = q
+
+    def __make_quickened_op_handler(self, generic_op: int, generic_handler,
+                                    obj_type, py_op, box):
+        def handler(argv):
+            stack = self.__tof.stack
+            a = stack[-2]
+            b = stack[-1]
+
+            if type(a) is AILObject and type(b) is AILObject and \
+                    a.obj_type is obj_type and b.obj_type is obj_type:
+                del stack[-1]
+                stack[-1] = box(py_op(a.value, b.value))
+                return None
+
+            # 操作数类型改变, 改写回通用的字节码 (deoptimize)
+            self.__tof.code.bytecodes[self.op_counter] = generic_op
+            return generic_handler(argv)
+
+        return handler
+
+    def __op_binary_not(self, argv):
+        b = not self.__bool_test(self.pop_top())
+
+        self.__tof.stack.append(true if b else false)
+
+    def __op_compare_op(self, argv):
+        stack = self.__tof.stack
+        b = stack.pop()
+        a = stack.pop()
+
+        res = self.__compare(
+            a, b, _binary_compare_op[argv], COMPARE_OPERATORS[argv])
+
+        self.__tof.stack.append(res)
+
+    # 超级指令 (见 aopcode.SUPERINSTRUCTIONS)
+    # 执行完第一条后把 op_counter 移到第二条再执行第二条,
+    # 不跳转时返回第二条的 op_counter, 让引擎跳过第二条
+
+    def __op_second(self):
+        """
+        执行超级指令的第二条字节码
+        """
+        pc = self.op_counter = self.op_counter + BYTE_CODE_SIZE
+        code = self.__tof.code.bytecodes
+
+        jump_to = self.__dispatch_table[code[pc]](code[pc + 1])
+        return pc if jump_to is None else jump_to
+
+    def __op_compare_jump_if_false(self, argv):
+        tof = self.__tof
+        stack = tof.stack
+        b = stack.pop()
+        a = stack.pop()
+
+        res = self.__compare(
+            a, b, _binary_compare_op[argv], COMPARE_OPERATORS[argv])
+
+        pc = self.op_counter = self.op_counter + BYTE_CODE_SIZE
+
+        if not self.__bool_test(res):
+            return pc + tof.code.bytecodes[pc + 1]
+        return pc
+
+    def __op_store_var_pop(self, argv):
+        tof = self.__tof
+        self.__store_var(tof.varnames[argv], tof.stack.pop())
+
+        self.op_counter += BYTE_CODE_SIZE
+        return self.op_counter
+
+    def __op_store_fast_pop(self, argv):
+        tof = self.__tof
+        tof.fast_locals[argv] = tof.stack.pop()
+
+        self.op_counter += BYTE_CODE_SIZE
+        return self.op_counter
+
+    def __op_load_fast_load_const(self, argv):
+        tof = self.__tof
+        var = tof.fast_locals[argv]
+
+        if var is None:
+            self.__op_load_fast(argv)
+        else:
+            tof.stack.append(var)
+
+        pc = self.op_counter = self.op_counter + BYTE_CODE_SIZE
+        tof.stack.append(tof.consts[tof.code.bytecodes[pc + 1]])
+
+        return pc
+
+    def __op_load_variable_binary(self, argv):
+        self.__op_load_variable(argv)
+        return self.__op_second()
+
+    def __op_load_const_binary(self, argv):
+        tof = self.__tof
+        tof.stack.append(tof.consts[argv])
+
+        return self.__op_second()
+
+    def __op_load_fast_binary(self, argv):
+        tof = self.__tof
+        var = tof.fast_locals[argv]
+
+        if var is None:
+            self.__op_load_fast(argv)
+        else:
+            tof.stack.append(var)
+
+        return self.__op_second()
+
+    def __op_break_loop(self, argv):
+        return self.__check_break()
+
+    def __op_continue_loop(self, argv):
+        return self.__check_continue()
+
+    def __op_call_func(self, argv):
+        stack = self.__tof.stack
+
+        if argv:
+            argl = stack[-argv:]
+            del stack[-argv:]
+        else:
+            argl = []
+
+        func = stack.pop()
+
+        if isinstance(func, AILObject) and func['__class__'] is FUNCTION_TYPE:
+            return self.__call_in_loop(func, argv, argl)
+
+        self.call_function(func, argv, argl)
+
+    def __op_call_func_ex(self, argv):
+        arg_array = self.pop_top()
+        func = self.pop_top()
+        arr_list = unpack_ailobj(arg_array)
+
+        if isinstance(func, AILObject) and func['__class__'] is FUNCTION_TYPE:
+            return self.__call_in_loop(func, len(arr_list), arr_list, True)
+
+        self.call_function(func, len(arr_list), arr_list, ex=True)
+
+    def __op_make_function(self, argv):
+        tof = self.__tof
+        tos = copy.copy(tof.stack.pop())  # type: AILCodeObject
+
+        if tos.closure:
+            tos._closure_outer = []
+            if tof.code.closure:
+                tos._closure_outer.extend(tof.closure_outer.copy())
+            tos._closure_outer.insert(0, tof.variable)
+
+        tosf = create_object(
+            FUNCTION_TYPE, tos, tof.variable, tos.name
+        )
+
+        if self.__exec_for_module:
+            tosf['__global_ns__'] = self.__namespace_state.ns_global.ns_dict
+
+        tosf['__signature__'] = tos._function_signature
+
+        tof.stack.append(tosf)
+
+    def __op_build_array(self, argv):
+        l = [self.__stack.pop() for _ in range(argv)][::-1]
+
+        self.__tof.stack.append(create_object(ARRAY_TYPE, l))
+
+    def __op_build_tuple(self, argv):
+        l = [self.__stack.pop() for _ in range(argv)][::-1]
+
+        self.__tof.stack.append(create_object(TUPLE_TYPE, l))
+
+    def __op_unpack_sequence(self, argv):
+        top = unpack_ailobj(self.pop_top())
+
+        if type(top) not in _seq_types:
+            self.raise_error(
+                'unpack object must be list or tuple)', 'TypeError')
+
+        if argv != len(top):
+            self.raise_error(
+                'not enough values to unpack (expected %s, got %s)'
+                    % (argv, len(top)),
+                'ValueError')
+
+        self.__stack.extend(top)
+
+    def __op_build_map(self, argv):
+        m = dict()
+
+        for _ in range(argv):
+            v = self.pop_top()
+            k = self.pop_top()
+
+            m[k] = v
+
+        self.__push_back(create_object(MAP_TYPE, m))
+
+    def __op_build_const_key_map(self, argv):
+        m = dict()
+
+        keys = self.pop_top()['__value__']
+        # 'keys' is an array object
+        for i in range(argv):
+            value = self.pop_top()
+            m[keys[i]] = value
+
+        self.__push_back(create_object(MAP_TYPE, m))
+
+    def __op_join_array(self, argv):
+        arr_list = [self.__stack.pop() for _ in range(argv)][::-1]
+
+        result = []
+
+        for arr in arr_list:
+            if not compare_type(arr, ARRAY_TYPE):
+                self.raise_error(
+                    'argument after \'*\' must an array, but got %s'
+                        % arr['__class__'],
+                    'TypeError'
+                    )
+            result.extend(arr['__value__'])
+
+        self.__tof.stack.append(convert_to_array(result))
+
+    def __op_binary_subscr(self, argv):
+        v = self.pop_top()
+        l = self.pop_top()
+
+        if isinstance(l, AILObject):
+            if l['__getitem__'] is None:
+                self.raise_error(
+                        '%s object is not subscriptable' %
+                        l['__class__'].name, 'TypeError')
+
+            rtn = self.check_object(l['__getitem__'](l, v))
+
+            self.__tof.stack.append(rtn)
+
+    def __op_unary_negative(self, argv):
+        v = self.pop_top()
+
+        if v['__class__'] in (INTEGER_TYPE, FLOAT_TYPE):
+            vnum = -unpack_ailobj(v)
+            self.__tof.stack.append(convert_to_ail_object(vnum))
+
+            self.__decref(v)
+        else:
+            self.raise_error(
+                'cannot do \'-\' for type: %s' %
+                v['__class__'].name, 'TypeError')
+
+    def __op_unary_invert(self, argv):
+        v = self.pop_top()
+
+        if v['__class__'] is INTEGER_TYPE:
+            vnum = ~unpack_ailobj(v)
+            self.__tof.stack.append(convert_to_ail_object(vnum))
+
+            self.__decref(v)
+        else:
+            self.raise_error(
+                'cannot do \'~\' for type: %s' %
+                v['__class__'].name, 'TypeError')
+
+    def __unary_inc_dec(self, target_method: str, op: str):
+        v = self.pop_top()
+        method = v[target_method]
+        if method is None:
+            self.raise_error(
+                    'Cannot \'%s\' to type %s' %
+                        (op, v['__class__']),
+                    'TypeError')
+        else:
+            res = self.check_object(method(v))
+            self.__push_back(res)
+
+    def __op_unary_inc(self, argv):
+        self.__unary_inc_dec('__inc__', '++')
+
+    def __op_unary_dec(self, argv):
+        self.__unary_inc_dec('__dec__', '--')
+
+    def __op_load_module(self, argv):
+        name = self.__tof.consts[argv]['__value__']
+
+        namespace, _ = aloader.MAIN_LOADER.load_namespace(name)
+
+        if namespace is None:
+            pass
+        elif namespace == 1:
+            self.raise_error('No module named \'%s\'' % name, 'LoadError')
+        elif namespace == 2:
+            self.raise_error(
+                'Cannot load module \'%s\' ' % name +
+                '(may caused circular load)', 'LoadError')
+        elif namespace == 3:
+            # error while loading this module
+            self.__interrupted = True
+            self.__interrupt_signal = MII_ERR_BREAK
+        else:
+            for name, value in namespace.items():
+                self.__store_var(name, value)
+
+    def __op_import_name(self, argv):
+        name = self.__tof.consts[argv]['__value__']
+
+        namespace, module_path = aloader.MAIN_LOADER.load_namespace(
+            name, True)
+
+        namespace = self.check_object(namespace, True)
+
+        if namespace is None:
+            pass
+        elif namespace == 1:
+            self.raise_error(
+                'No module named \'%s\'' % name, 'ImportError')
+        elif namespace == 2:
+            self.raise_error(
+                'Cannot import module \'%s\' ' % name +
+                '(may caused circular import)', 'ImportError')
+        elif namespace == 3:
+            self.__interrupted = True
+            self.__interrupt_signal = MII_ERR_POP_TO_TRY
+
+        elif namespace == 4:
+            pass
+
+        else:
+            module_object = new_module_object(
+                name, module_path, namespace)
+            self.__push_back(module_object)
+
+    def __op_import_from(self, argv):
+        tof = self.__tof
+        module_object = tof.stack[-1]
+        name = tof.varnames[argv]
+
+        ns = module_object._properties['__namespace__']
+        m_name = module_object._properties['__name__']
+        if name in ns:
+            tof.stack.append(ns[name])
+        else:
+            self.raise_error(
+                    'Cannot import \'%s\' from \'%s\'' % (
+                        name, m_name),
+                    'ImportError')
+
+    def __op_store_subscr(self, argv):
+        i = self.pop_top()
+        o = self.pop_top()
+        v = self.pop_top()
+
+        if isinstance(o, AILObject):
+            if o['__setitem__'] is None:
+                self.raise_error('%s object is not subscriptable' %
+                                 o['__class__'].name, 'TypeError')
+
+            else:
+                self.check_object(call(o['__setitem__'], o, i, v))
+                self.__tof.stack.append(v)
+
+    def __op_load_attr(self, argv):
+        o = self.pop_top()
+        vn = self.__tof.varnames[argv]
+
+        r = self.check_object(o['__getattr__'](o, vn))
+
+        self.__tof.stack.append(r)
+
+    def __op_store_attr(self, argv):
+        o = self.pop_top()
+        ni = self.__tof.varnames[argv]
+        v = self.pop_top()
+
+        self.check_object(o['__setattr__'](o, ni, v))
+
+        self.__tof.stack.append(v)
+
+    def __op_store_struct(self, argv):
+        name = self.pop_top()
+        nl = [self.pop_top() for _ in range(argv)][::-1]
+        pl = [nl[i - 1] for i in range(len(nl))
+              if nl[i] == PROTECTED_SIGNAL]
+        nl = [x for x in nl if x != PROTECTED_SIGNAL]
+
+        o = create_object(
+            STRUCT_TYPE, name, nl, pl)
+
+        self.__store_var(name, o)
+
+    def __op_build_class(self, argv):
+        pops = [self.pop_top() for _ in range(argv)]
+        *bases, class_name, class_func = pops
+
+        bases = bases[::-1]
+        cls = build_class_func(
+            class_func, class_name, bases)
+
+        self.__push_back(cls)
+
+    def __op_set_protected(self, argv):
+        self.__tof.stack.append(PROTECTED_SIGNAL)
+
+    def __op_throw_error(self, argv):
+        _err = unpack_ailobj(self.pop_top())
+        e_msg = ''
+        e_type = ''
+        if isinstance(_err, str):
+            e_msg = _err
+            e_type = 'Throw'
+        elif compare_type(_err, STRUCT_OBJ_TYPE):
+            if struct_obj_isinstance(_err, get_err_struct()):
+                e_msg = unpack_ailobj(_err.members['err_msg'])
+                e_type = unpack_ailobj(_err.members['err_type'])
+            else:
+                self.raise_error('needs Error object or string', 'TypeError')
+        elif _err is None:
+            self._err_reraise()
+        else:
+            self.raise_error('needs Error object or string', 'TypeError')
+        self.raise_error(e_msg, e_type)
+
+    def __op_setup_finally(self, argv):
+        self.__push_block(BLOCK_FINALLY, argv)
+
+    def __op_setup_try(self, argv):
+        self.__push_block(BLOCK_TRY, argv)
+
+    def __op_setup_catch(self, argv):
+        self.__temp_env_stack.append(TempEnvironment())
+
+        self.__push_block(BLOCK_CATCH, -1)
+
+        err = self.__now_state.err_stack.pop()
+        self.__now_state.err_stack.clear()  # throw away
+        self.__now_state.handling_err_stack.append(err)
+        self.__store_var_by_index(argv, err)  # store this error with 'name'
+
+    def __op_end_finally(self, argv):
+        why = self.pop_top()  # if no why, None will be pushed.
+
+        if why == WHY_RETURN:
+            self.__return_value = self.pop_top()
+            self.__return(False)
+
+        elif why == WHY_HANDLING_ERR:
+            self.__interrupted = True
+            self.__interrupt_signal = MII_ERR_POP_TO_TRY
+
+        elif why == WHY_CONTINUE or why == WHY_BREAK:
+            goto = self.pop_top()
+            goto -= BYTE_CODE_SIZE * 2 * int(why == WHY_CONTINUE)
+            # if is continue, go back one bytecode
+
+            self.op_counter = goto
+            self.__interrupted = True
+            self.__interrupt_signal = MII_DO_JUMP
+
+    def __op_pop_catch(self, argv):
+        ts = self.__temp_env_stack.pop()
+
+        self.__pop_block()
+
+        self.__now_state.handling_err_stack.pop(0)  # queue
+
+        for n in ts.temp_var:
+            del self.__tof.variable[n]
+
+    def __op_bind_function(self, argv):
+        target_struct = self.__load_name(argv)
+        if target_struct is None:
+            self.raise_error('can not find bound target', 'NameError')
+        else:
+            func_name = unpack_ailobj(self.pop_top())
+            bound_function = self.pop_top()
+
+            if not compare_type(
+                    bound_function,
+                    FUNCTION_TYPE, PY_FUNCTION_TYPE):
+                self.raise_error('require function', 'TypeError')
+
+            else:
+                if not compare_type(target_struct, STRUCT_TYPE):
+                    self.raise_error(
+                        'function must be bound to a struct type')
+
+                target_struct['__bind_functions__'][func_name] = \
+                    bound_function
+
+    def __select_engine(self):
+        if aconfig.VM_ENGINE == 'switch':
+            return self.__run_bytecode
+
+        # 没有线程和调试钩子时使用快速循环
+        if sys.gettrace() is None and alock.GLOBAL_INTERPRETER_LOCK is None \
+                and not THREAD_SCHEDULER.has_thread():
+            return self.__run_bytecode_fast
+        return self.__run_bytecode_table
+
+    # 各个求值循环共用的部分
+
+    def __acquire_locks(self, t_state: ThreadState, counter: int) -> int:
+        """
+        多线程时在执行每条字节码前调用: 获取锁, 每 _INTERVAL 条字节码调度一次线程
+        :return: 新的 counter, 切换了线程时返回 -1, 此时求值循环应从 op_counter 继续
+        """
+        if alock.GLOBAL_INTERPRETER_LOCK is not None:
+            alock.GLOBAL_INTERPRETER_LOCK.acquire()
+
+        if alock.GLOBAL_INTERPRETER_LOCK is not None:
+            counter += 1
+
+            if counter >= _INTERVAL:
+                THREAD_SCHEDULER.schedule()
+                if alock.GLOBAL_INTERPRETER_LOCK.locked():
+                    alock.GLOBAL_INTERPRETER_LOCK.release()
+                return -1
+
+        if t_state is not None:
+            t_state.lock.acquire()
+        elif self.main_lock is not None:
+            self.main_lock.acquire()
+
+        return counter
+
+    def __release_locks(self, t_state: ThreadState):
+        if alock.GLOBAL_INTERPRETER_LOCK is not None:
+            if alock.GLOBAL_INTERPRETER_LOCK.locked():
+                alock.GLOBAL_INTERPRETER_LOCK.release()
+            if self.main_lock is not None and self.main_lock.locked():
+                self.main_lock.release()
+            if t_state is not None and t_state.lock.locked():
+                t_state.lock.release()
+
+    def __catch_interrupt(self, interrupt: VMInterrupt):
+        if interrupt.signal != MII_CONTINUE:
+            if interrupt.handle_it:
+                self.__interrupted = True
+                signal = interrupt.signal
+                if signal != -1:
+                    self.__interrupt_signal = signal
+
+    def __catch_keyboard_interrupt(self):
+        try:
+            self.raise_error('KeyboardInterrupt', 'Interrupt')
+        except VMInterrupt as interrupt:
+            if interrupt.signal != MII_ERR_BREAK:
+                print_exception_for_vm(
+                        self.__now_state.handling_err_stack,
+                            make_err_struct_object(
+                                AILRuntimeError(
+                                    'KeyboardInterrupt',
+                                    'Interrupt',
+                                    self.__tof,
+                                    self.get_stack_trace()),
+                                self.__tof.code.name,
+                                self.__tof.lineno))
+            self.__interrupted = True
+            self.__interrupt_signal = MII_ERR_BREAK
+
+    def __catch_builtin_error(self, err: BuiltinAILRuntimeError):
+        try:
+            self.raise_error(str(err), 'AILRuntimeError')
+        except VMInterrupt as interrupt:
+            self.__interrupted = True
+            self.__interrupt_signal = interrupt.signal
+
+    def __handle_interrupt(self, base_depth: int) -> int:
+        """
+        在 __interrupted 为 True 时处理中断, 包括在求值循环中调用的函数的返回与异常的回溯
+        :param base_depth: 求值循环开始时帧栈的深度
+        :return: 求值循环结束的原因 (WHY_*), 从 op_counter 继续执行时返回 None
+        """
+        frame_stack = self.__frame_stack
+
+        if self.__interrupt_signal == MII_ERR_POP_TO_TRY:
+            self.__handle_error()
+
+            # 异常未被处理, 回到在本循环中调用的函数的调用者继续寻找
+            while self.__interrupt_signal == MII_ERR_POP_TO_TRY \
+                    and len(frame_stack) > base_depth:
+                self.__leave_loop_call()
+                self.__handle_error()
+
+        self.__can = 1
+        self.__interrupted = False
+        signal = self.__interrupt_signal
+
+        if signal == MII_DO_JUMP:
+            return None
+
+        elif signal == MII_RETURN:
+            if len(frame_stack) > base_depth:
+                self.__leave_loop_call().stack.append(self.__return_value)
+                self.op_counter += BYTE_CODE_SIZE
+                return None
+
+            frame_stack.pop()
+            return WHY_NORMAL
+
+        elif signal == MII_ERR_BREAK:
+            self.__can_update_opc = False
+            self.__interrupted = len(frame_stack) > 2
+            return WHY_ERROR
+
+        elif signal == MII_ERR_EXIT:
+            self.__can_update_opc = False
+            return WHY_ERR_EXIT
+
+        elif signal == MII_ERR_POP_TO_TRY:
+            self.__interrupted = True
+            frame_stack.pop()
+            self.__can = 0
+            return WHY_HANDLING_ERR
+
+        # MII_DO_JUMP_NEXT
+        self.op_counter += BYTE_CODE_SIZE
+        return None
 
     def __run_bytecode(
             self, cobj: AILCodeObject, frame: Frame = None, 
             t_state: ThreadState = None):
         self.__push_new_frame(cobj, frame)
+        base_depth = len(self.__frame_stack)
         code = cobj.bytecodes
         len_code = len(code)
 
@@ -887,22 +2045,11 @@ class Interpreter:
                 try:
 
                     if FUTURE_MULT_THREAD:
-                        if alock.GLOBAL_INTERPRETER_LOCK is not None:
-                            alock.GLOBAL_INTERPRETER_LOCK.acquire()
-
-                        if alock.GLOBAL_INTERPRETER_LOCK is not None:
-                            counter += 1
-
-                            if counter >= _INTERVAL:
-                                THREAD_SCHEDULER.schedule()
-                                if alock.GLOBAL_INTERPRETER_LOCK.locked():
-                                    alock.GLOBAL_INTERPRETER_LOCK.release()
-                                counter = 0
-                        
-                        if t_state is not None:
-                            t_state.lock.acquire()
-                        elif self.main_lock is not None:
-                            self.main_lock.acquire()
+                        counter = self.__acquire_locks(t_state, counter)
+                        if counter < 0:
+                            counter = 0
+                            jump_to = self.op_counter
+                            continue  # 从切换到的线程的 op_counter 继续
 
                     op = code[self.op_counter]
                     argv = code[self.op_counter + 1]
@@ -969,6 +2116,20 @@ class Interpreter:
                         self.__store_var(n, v)
                         self.__tof.stack.append(v)
 
+                    elif op == load_fast:
+                        var = self.__tof.fast_locals[argv]
+                        if var is None:
+                            var = self.__load_name(argv)
+                            if var is None:
+                                name = self.__tof.varnames[argv]
+                                self.raise_error(
+                                    'name \'%s\' is not defined' % name,
+                                    'NameError')
+                        self.__tof.stack.append(var)
+
+                    elif op == store_fast:
+                        self.__tof.fast_locals[argv] = self.__tof.stack[-1]
+
                     elif op == load_const:
                         self.__tof.stack.append(
                             self.__tof.consts[argv])
@@ -1113,7 +2274,7 @@ class Interpreter:
                         if not self.__bool_test(tos):
                             jump_to += argv
 
-                    elif op in BINARY_OPS:
+                    elif op in _binary_op_dict:
                         op, pym, ailm = _binary_op_dict.get(op)
 
                         b = self.pop_top()
@@ -1129,8 +2290,7 @@ class Interpreter:
 
                         b = not self.__bool_test(o)
 
-                        self.__tof.stack.append(
-                            create_object(BOOL_TYPE, b))
+                        self.__tof.stack.append(true if b else false)
 
                     elif op == compare_op:
                         cmp_opm = _binary_compare_op[argv]
@@ -1153,14 +2313,24 @@ class Interpreter:
                         argl = [self.pop_top() for _ in range(argv)][::-1]
                         func: AILObject = self.pop_top()
 
-                        self.call_function(func, argv, argl)
+                        if isinstance(func, AILObject) and \
+                                func['__class__'] is FUNCTION_TYPE:
+                            jump_to = self.__call_in_loop(func, argv, argl)
+                        else:
+                            self.call_function(func, argv, argl)
 
                     elif op == call_func_ex:
                         arg_array = self.pop_top()
                         func = self.pop_top()
                         arr_list = unpack_ailobj(arg_array)
 
-                        self.call_function(func, len(arr_list), arr_list, ex=True)
+                        if isinstance(func, AILObject) and \
+                                func['__class__'] is FUNCTION_TYPE:
+                            jump_to = self.__call_in_loop(
+                                func, len(arr_list), arr_list, True)
+                        else:
+                            self.call_function(
+                                func, len(arr_list), arr_list, ex=True)
 
                     elif op == make_function:
                         tos = copy.copy(self.pop_top())  # type: AILCodeObject
@@ -1373,8 +2543,8 @@ class Interpreter:
                         module_object = self.__tof.stack[-1]
                         name = self.__tof.varnames[argv]
 
-                        ns = module_object.properties['__namespace__']
-                        m_name = module_object.properties['__name__']
+                        ns = module_object._properties['__namespace__']
+                        m_name = module_object._properties['__name__']
                         if name in ns:
                             self.__tof.stack.append(ns[name])
                         else:
@@ -1465,7 +2635,6 @@ class Interpreter:
                         self.__push_block(BLOCK_TRY, argv)
 
                     elif op == setup_catch:
-                        name = self.__tof.varnames[argv]
                         self.__temp_env_stack.append(TempEnvironment())
 
                         self.__push_block(BLOCK_CATCH, -1)
@@ -1473,7 +2642,7 @@ class Interpreter:
                         err = self.__now_state.err_stack.pop()
                         self.__now_state.err_stack.clear()  # throw away
                         self.__now_state.handling_err_stack.append(err)
-                        self.__store_var(name, err)  # store this error with 'name'
+                        self.__store_var_by_index(argv, err)  # store this error with 'name'
 
                     elif op == pop_try:
                         self.__pop_block()
@@ -1489,7 +2658,8 @@ class Interpreter:
                             self.__return(False)
 
                         elif why == WHY_HANDLING_ERR:
-                            raise VMInterrupt(MII_ERR_POP_TO_TRY)
+                            self.__interrupted = True
+                            self.__interrupt_signal = MII_ERR_POP_TO_TRY
 
                         elif why == WHY_CONTINUE or why == WHY_BREAK:
                             goto = self.pop_top()
@@ -1497,7 +2667,8 @@ class Interpreter:
                             # if is continue, go back one bytecode
                             
                             self.op_counter = goto
-                            raise VMInterrupt(MII_DO_JUMP)
+                            self.__interrupted = True
+                            self.__interrupt_signal = MII_DO_JUMP
 
                     elif op == pop_catch:
                         ts = self.__temp_env_stack.pop()
@@ -1533,98 +2704,40 @@ class Interpreter:
 
                                 target_struct['__bind_functions__'][func_name] = \
                                     bound_function
-                except VMInterrupt as interrupt:
-                    if interrupt.signal != MII_CONTINUE:
-                        if interrupt.handle_it:
-                            self.__interrupted = True
-                            signal = interrupt.signal
-                            if signal != -1:
-                                self.__interrupt_signal = signal
 
+                    elif op in _SUPERINSTRUCTION_OPS:
+                        jump_to = self.__dispatch_table[op](argv)
+                except VMInterrupt as interrupt:
+                    self.__catch_interrupt(interrupt)
                 except KeyboardInterrupt as _:
-                    try:
-                        self.raise_error('KeyboardInterrupt', 'Interrupt')
-                    except VMInterrupt as interrupt:
-                        if interrupt.signal != MII_ERR_BREAK:
-                            print_exception_for_vm(
-                                    self.__now_state.handling_err_stack,
-                                        make_err_struct_object(
-                                            AILRuntimeError(
-                                                'KeyboardInterrupt',
-                                                'Interrupt',
-                                                self.__tof,
-                                                self.get_stack_trace()),
-                                            self.__tof.code.name,
-                                            self.__tof.lineno))
-                        self.__interrupted = True
-                        self.__interrupt_signal = MII_ERR_BREAK
-
+                    self.__catch_keyboard_interrupt()
                 except BuiltinAILRuntimeError as err:
-                    try:
-                        self.raise_error(str(err), 'AILRuntimeError')
-                    except VMInterrupt as interrupt:
-                        self.__interrupted = True
-                        self.__interrupt_signal = interrupt.signal
+                    self.__catch_builtin_error(err)
                 finally:
                     if FUTURE_MULT_THREAD:
-                        if alock.GLOBAL_INTERPRETER_LOCK is not None:
-                            if alock.GLOBAL_INTERPRETER_LOCK.locked():
-                                alock.GLOBAL_INTERPRETER_LOCK.release()
-                            if self.main_lock is not None and self.main_lock.locked():
-                                self.main_lock.release()
-                            if t_state is not None and t_state.lock.locked():
-                                t_state.lock.release()
-
-                if self.__interrupted and \
-                        self.__interrupt_signal == MII_ERR_POP_TO_TRY:
-                    self.__handle_error()
+                        self.__release_locks(t_state)
 
                 # handle interruption
                 if self.__interrupted:
-                    if not self.__can:
-                        self.__can = 1
-                    self.__interrupted = False
-                    if self.__interrupt_signal == MII_DO_JUMP:
-                        jump_to = self.op_counter
-                        continue
-
-                    elif self.__interrupt_signal == MII_RETURN:
-                        self.__frame_stack.pop()
-                        why = WHY_NORMAL
+                    stop = self.__handle_interrupt(base_depth)
+                    if stop is not None:
+                        why = stop
                         break
 
-                    elif self.__interrupt_signal == MII_DO_JUMP_NEXT:
-                        jump_to = self.op_counter + BYTE_CODE_SIZE
-                        continue
-
-                    elif self.__interrupt_signal == MII_ERR_BREAK:
-                        why = WHY_ERROR
-                        self.__can_update_opc = False
-
-                        if len(self.__frame_stack) > 2:
-                            self.__interrupted = True
-                        else:
-                            self.__interrupted = False
-                        break
-                    
-                    elif self.__interrupt_signal == MII_ERR_EXIT:
-                        why = WHY_ERR_EXIT
-                        self.__can_update_opc = False
-                        break
-
-                    elif self.__interrupt_signal == MII_ERR_POP_TO_TRY:
-                        self.__interrupted = True
-                        self.__interrupt_signal = MII_ERR_POP_TO_TRY
-                        self.__frame_stack.pop()
-                        self.__can = 0
-                        why = WHY_HANDLING_ERR
-                        break
+                    code = self.__loop_code(cobj, base_depth)
+                    len_code = len(code)
+                    jump_to = self.op_counter
+                    continue
 
                 if not self.__can:
                     self.__can = 1
                     break
 
-                if jump_to != self.op_counter:
+                if jump_to == _NEW_FRAME:
+                    code = self.__tof.code.bytecodes
+                    len_code = len(code)
+                    jump_to = self.op_counter
+                elif jump_to != self.op_counter:
                     self.op_counter = jump_to
                 else:
                     self.op_counter += BYTE_CODE_SIZE
@@ -1636,7 +2749,138 @@ class Interpreter:
 
         return why
 
+    def __run_bytecode_table(
+            self, cobj: AILCodeObject, frame: Frame = None, 
+            t_state: ThreadState = None):
+        """
+        与 __run_bytecode 语义相同, 但通过 dispatch table 分派字节码
+        """
+        self.__push_new_frame(cobj, frame)
+        base_depth = len(self.__frame_stack)
+        code = cobj.bytecodes
+        len_code = len(code)
+        table = self.__dispatch_table
+
+        self.op_counter = 0
+
+        why = WHY_NORMAL
+
+        counter = 0
+
+        try:
+            while self.op_counter < len_code - 1:  # included argv index
+                pc = self.op_counter
+                jump_to = None
+
+                try:
+                    if FUTURE_MULT_THREAD:
+                        counter = self.__acquire_locks(t_state, counter)
+                        if counter < 0:
+                            counter = 0
+                            continue  # 从切换到的线程的 op_counter 继续
+
+                    self.__update_lineno()
+
+                    jump_to = table[code[pc]](code[pc + 1])
+
+                except VMInterrupt as interrupt:
+                    self.__catch_interrupt(interrupt)
+                except KeyboardInterrupt as _:
+                    self.__catch_keyboard_interrupt()
+                except BuiltinAILRuntimeError as err:
+                    self.__catch_builtin_error(err)
+                finally:
+                    if FUTURE_MULT_THREAD:
+                        self.__release_locks(t_state)
+
+                if self.__interrupted:
+                    stop = self.__handle_interrupt(base_depth)
+                    if stop is not None:
+                        why = stop
+                        break
+
+                    code = self.__loop_code(cobj, base_depth)
+                    len_code = len(code)
+                    continue
+
+                if jump_to is None:
+                    jump_to = pc
+
+                if jump_to == _NEW_FRAME:
+                    code = self.__tof.code.bytecodes
+                    len_code = len(code)
+                elif jump_to != self.op_counter:
+                    self.op_counter = jump_to
+                else:
+                    self.op_counter += BYTE_CODE_SIZE
+        except EOFError as e:
+            self.raise_error(str(type(e).__name__), 'RuntimeError')
+
+        return why
+
+    def __run_bytecode_fast(
+            self, cobj: AILCodeObject, frame: Frame = None, 
+            t_state: ThreadState = None):
+        """
+        __run_bytecode_table 的单线程版本:
+        不做线程检查, 行号只在需要时 (见 __sync_lineno) 才计算
+        """
+        if t_state is not None or self.main_lock is not None:
+            return self.__run_bytecode_table(cobj, frame, t_state)
+
+        self.__push_new_frame(cobj, frame)
+        base_depth = len(self.__frame_stack)
+        code = cobj.bytecodes
+        len_code = len(code)
+        table = self.__dispatch_table
+
+        self.op_counter = 0
+
+        why = WHY_NORMAL
+
+        try:
+            while self.op_counter < len_code - 1:  # included argv index
+                pc = self.op_counter
+                jump_to = None
+
+                try:
+                    jump_to = table[code[pc]](code[pc + 1])
+
+                except VMInterrupt as interrupt:
+                    self.__catch_interrupt(interrupt)
+                except KeyboardInterrupt as _:
+                    self.__catch_keyboard_interrupt()
+                except BuiltinAILRuntimeError as err:
+                    self.__catch_builtin_error(err)
+
+                if self.__interrupted:
+                    stop = self.__handle_interrupt(base_depth)
+                    if stop is not None:
+                        why = stop
+                        break
+
+                    code = self.__loop_code(cobj, base_depth)
+                    len_code = len(code)
+                    continue
+
+                if jump_to is None:
+                    jump_to = pc
+
+                if jump_to == _NEW_FRAME:
+                    code = self.__tof.code.bytecodes
+                    len_code = len(code)
+                elif jump_to != self.op_counter:
+                    self.op_counter = jump_to
+                else:
+                    self.op_counter += BYTE_CODE_SIZE
+        except EOFError as e:
+            self.raise_error(str(type(e).__name__), 'RuntimeError')
+
+        return why
+
     def exec_for_import(self, cobj, frame: Frame, globals: dict = None):
+        self.__sync_lineno()
+
         with self.get_context():
             why = self.exec(cobj, frame, True, globals=globals)
 
@@ -1656,18 +2900,23 @@ class Interpreter:
         self.__namespace_state.ns_global.ns_dict = dict() \
             if globals is None \
             else globals
-        self.__namespace_state.ns_builtins = abuiltins.BUILTINS_NAMESPACE
+
+        if self.__namespace_state.ns_builtins is not abuiltins.BUILTINS_NAMESPACE:
+            self.__namespace_state.ns_builtins = abuiltins.BUILTINS_NAMESPACE
+            _Namespace.touch()
 
         f.lineno = cobj.firstlineno
 
-        self.__namespace_state.ns_global.ns_dict['__main__'] = \
-            convert_to_ail_object(cobj.is_main)
+        self.__namespace_state.ns_global.set(
+            '__main__', convert_to_ail_object(cobj.is_main))
 
         self.__global_frame = f
 
         self.__exec_for_module = exec_for_module
 
-        return self.__run_bytecode(cobj, f)
+        self.__eval_bytecode = self.__select_engine()
+
+        return self.__eval_bytecode(cobj, f)
 
     def exec(self, cobj, frame=None,
              exec_for_module=False, globals: dict = None):
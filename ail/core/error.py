@@ -81,10 +81,10 @@ def error_msg(line: int, msg: str, filename: str, errcode=1, source: str = None)
     filename : 文件名
     errcode : 错误码 / 程序返回值
     """
-    if source is None:
-        source_line = get_line_from_file(line, filename)
-    else:
+    if isinstance(source, str):
         source_line = get_line_from_source(line, source)
+    else:  # None 或 MappedSource
+        source_line = get_line_from_file(line, getattr(source, 'path', filename))
 
     if source_line != '':
         err_msg = '  File \'{0}\', line {2}:\n   {3}\n{1}\n'.format(
@@ -1,5 +1,6 @@
 # python compatible
 
+from .acache import load_cached_pycode, cache_pycode
 from .alex import Lex
 from .aparser import ASTConverter, Parser
 
@@ -36,14 +37,18 @@ def exec_as_python(source: str, filename: str, globals: dict) -> int:
     """
     :return: code: 0 -> ok | 1 -> exception occurred | 2 -> system exit
     """
-    l = Lex()
-    ts = l.lex(source, filename)
+    code = load_cached_pycode(filename, source)
 
-    p = Parser()
-    node = p.parse(ts, source, filename, True)
+    if code is None:
+        l = Lex()
+        ts = l.lex_stream(source, filename)
 
-    converter = ASTConverter()
-    code = compile(converter.convert_module(node), filename, 'exec')
+        p = Parser()
+        node = p.parse(ts, source, filename, True)
+
+        converter = ASTConverter()
+        code = compile(converter.convert_module(node), filename, 'exec')
+        cache_pycode(filename, source, code)
 
     fill_namespace(globals)
     
@@ -31,12 +31,18 @@ def obj_func_init(aobj):
 def obj_func_eq(aobj, oobj):
     b = 0 if id(aobj) != id(oobj) else 1
 
-    return obj.ObjectCreater.new_object(bool.BOOL_TYPE, b)
+    return bool.get_bool(b)
 
 
 def obj_getattr(aobj, name):
-    if not _is_reserved_attr_name(name) and name in aobj.properties:
-        return aobj[name]
+    if not _is_reserved_attr_name(name):
+        p = aobj._properties
+        if p is not None and name in p:
+            return aobj[name]
+
+        m = obj.ObjectCreater.bind_method(aobj, name)
+        if m is not None:
+            return m
 
     return AILRuntimeError('\'%s\' object has no attribute \'%s\'' %
                            (aobj['__class__'].name, name),
@@ -54,7 +60,7 @@ def obj_setattr(aobj, name, value):
                                (aobj['__class__'].name, name),
                                'AttributeError')
 
-    aobj.properties[name] = value
+    aobj[name] = value
 
 
 def obj_equals(self, other):
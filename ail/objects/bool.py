@@ -19,7 +19,7 @@ def bool_init(self: AILObject, v: AILObject):
 
 
 def bool_eq(self: AILObject, o: AILObject) -> AILObject:
-    return obj.create_object(BOOL_TYPE, o is self)
+    return get_bool(o is self)
 
 
 def bool_str(self: AILObject):
@@ -30,3 +30,26 @@ BOOL_TYPE = AILObjectType('<bool type>', types.I_TYPE_TYPE,
                               __init__=bool_init,
                               __eq__=bool_eq,
                               __str__=bool_str)
+
+
+_BOOL_POOL = None
+
+
+def get_bool(v) -> AILObject:
+    """
+    get a bool object.
+
+    always returns the object in pool, so there are only one true and
+    one false object.
+
+    :return: Bool object
+    """
+    global _BOOL_POOL
+
+    if _BOOL_POOL is None:
+        _BOOL_POOL = (obj.create_object(BOOL_TYPE, 0),
+                      obj.create_object(BOOL_TYPE, 1))
+        for b in _BOOL_POOL:
+            b.reference += 1
+
+    return _BOOL_POOL[1] if v else _BOOL_POOL[0]
@@ -1,5 +1,5 @@
 
-from copy import deepcopy
+from copy import copy
 from typing import List
 
 from .function import PY_FUNCTION_TYPE, FUNCTION_TYPE
@@ -20,6 +20,17 @@ from ..core.avmsig import VMInterrupt, MII_CONTINUE
 
 _func_type = (FUNCTION_TYPE, PY_FUNCTION_TYPE)
 
+_NOT_CACHED = object()
+
+
+def touch_class(cls):
+    """
+    类的 __dict__ 被修改后调用, 递增 cls 的版本号 _attr_version (没有时为 0),
+    使 mro 中含有 cls 的类的属性缓存失效 (见 _lookup)
+    若绕过 class_setattr 直接修改类的 __dict__, 需要手动调用
+    """
+    cls._attr_version = getattr(cls, '_attr_version', 0) + 1
+
 
 def _clear_empty(x):
     i = 0
@@ -40,8 +51,9 @@ def _get_method_str_func(obj_name: str, is_pyfunc: bool=False):
 
 
 def _copy_function(f: AILObject) -> AILObject:
-    new_f = deepcopy(f)
-    new_f.properties = f.properties.copy()
+    new_f = copy(f)
+    p = f._properties
+    new_f._properties = None if p is None else p.copy()
 
     return new_f
 
@@ -75,26 +87,59 @@ def class_init(self,
     dict_['__doc__'] = doc_string
 
 
-def class_getattr_with_default(cls, name, default=None):
+def _lookup(cls, name):
+    """
+    沿 cls 的 mro 查找 name, 结果 (包括找不到时的 None) 缓存在 cls 上
+    建立缓存时记录 mro 上所有类的版本号之和, 版本号只增不减,
+    所以和改变即说明 mro 上某个类被修改过, 此时清空缓存
+    """
     mro = cls['__mro__']
-    for cls in mro:
-        val = cls['__dict__'].get(name)
+
+    stamp = 0
+    for c in mro:
+        stamp += getattr(c, '_attr_version', 0)
+
+    try:
+        cache = cls._attr_cache
+    except AttributeError:  # 第一次查找
+        cache = cls._attr_cache = dict()
+        cls._attr_cache_stamp = stamp
+
+    if cls._attr_cache_stamp != stamp:
+        cache.clear()
+        cls._attr_cache_stamp = stamp
+
+    val = cache.get(name, _NOT_CACHED)
+    if val is not _NOT_CACHED:
+        return val
+
+    val = None
+    for c in mro:
+        val = c['__dict__'].get(name)
         if val is not None:
-            return val
+            break
+
+    cache[name] = val
+    return val
+
+
+def class_getattr_with_default(cls, name, default=None):
+    val = _lookup(cls, name)
+    if val is not None:
+        return val
     return default
 
 
 def class_getattr(cls, name):
-    mro = cls['__mro__']
-    for cls in mro:
-        val = cls['__dict__'].get(name)
-        if val is not None:
-            return val
+    val = _lookup(cls, name)
+    if val is not None:
+        return val
     return AILRuntimeError('name %s is not define' % name, NAME_ERROR)
 
 
 def class_setattr(self, name, value):
     self['__dict__'][name] = value
+    touch_class(self)
 
 
 def class_str(self):
@@ -230,16 +275,16 @@ def object_getattr(self, name):
     if val['__class__'] not in _func_type:
         return val
 
-    # method key = %CLASS_NAME%$%INSTANCE_ID%$%METHOD_NAME%
-    method_key = '%s$%s$%s' % (cls['__name__'], id(self), name)
+    # 绑定的方法缓存在实例上: 名称 -> (类中的方法, 绑定的方法)
+    # 类中的方法被替换后重新绑定
     bound_methods = self._bound_methods
-    m = bound_methods.get(method_key)
-    
-    if m is not None:
-        return m
+    b = bound_methods.get(name)
+
+    if b is not None and b[0] is val:
+        return b[1]
 
     m = _check_bound(self, val, cls['__name__'])
-    bound_methods[method_key] = m
+    bound_methods[name] = (val, m)
     
     return m
 
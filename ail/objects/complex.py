@@ -110,10 +110,8 @@ def complex_div(self: AILObject, other: AILObject) -> AILObject:
 
 def complex_eq(self: AILObject, o: AILObject):
     if isinstance(o, AILObject):
-        return create_object(
-                abool.BOOL_TYPE, self['__value__'] == o['__value__'])
-    return create_object(
-            abool.BOOL_TYPE, self['__value__'] == o)
+        return abool.get_bool(self['__value__'] == o['__value__'])
+    return abool.get_bool(self['__value__'] == o)
 
 
 def int_to_string(self):
@@ -7,6 +7,8 @@ from .struct import STRUCT_TYPE
 
 
 class FastNumber(obj.AILObject):
+    __slots__ = ('_value',)
+
     def __init__(self, pynum: Union[int, float]):
         super().__init__(
             __str__=self.__str,
@@ -26,7 +26,7 @@ def float_init(self: AILObject, value: AILObject):
     _vtype = type(value)
 
     if _vtype is float or _vtype is int:
-        self.properties['__value__'] = value
+        self['__value__'] = value
     elif value['__class__'] is FLOAT_TYPE:
         self['__value__'] = value['__value__']
     else:
@@ -17,6 +17,7 @@ from ..core.aobjects import AILObject, AILCodeObject
 from ..core.error import AILRuntimeError
 from . import wrapper
 from . import types
+from . import bool as abool
 
 
 _new_object = None
@@ -35,9 +36,9 @@ def _make_cache():
 
 
 def pyfunc_func_init(self: AILObject, func: t.FunctionType):
-    self.properties['__pyfunction__'] = func
-    self.properties['__value__'] = func
-    self.properties['__name__'] = func.__name__
+    self['__pyfunction__'] = func
+    self['__value__'] = func
+    self['__name__'] = func.__name__
 
     set_doc(self, func.__doc__)
 
@@ -56,6 +57,15 @@ def pyfunc_func_call(self: AILObject, *args) -> AILObject:
         return AILRuntimeError(str(e), 'PythonError')
 
 
+def pyfunc_func_eq(self: AILObject, o: AILObject) -> AILObject:
+    # 方法在访问时才绑定, 所以同一对象的同一方法要按内容比较
+    if not isinstance(o, AILObject):
+        return abool.get_bool(False)
+    return abool.get_bool(
+        o['__pyfunction__'] is self['__pyfunction__'] and
+        o['__this__'] is self['__this__'])
+
+
 def pyfunc_func_str(self: AILObject):
     return '<python function \'%s\'>' % self['__name__']
 
@@ -102,6 +112,7 @@ PY_FUNCTION_TYPE = AILObjectType('<python funtion wrapper type>',
                                      types.I_PYFUNC_TYPE,
                                      __init__=pyfunc_func_init,
                                      __call__=pyfunc_func_call,
+                                     __eq__=pyfunc_func_eq,
                                      __str__=pyfunc_func_str,
                                      __repr__=pyfunc_func_str)
 
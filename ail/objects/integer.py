@@ -16,8 +16,8 @@ from .bool import BOOL_TYPE
 from .float import FLOAT_TYPE
 
 
-POOL_RANGE_MIN = -1
-POOL_RANGE_MAX = 100
+POOL_RANGE_MIN = -5
+POOL_RANGE_MAX = 257
 POOL_RANGE = (POOL_RANGE_MIN, POOL_RANGE_MAX)
 
 
@@ -46,7 +46,10 @@ def int_init(self: AILObject, value: AILObject):
     elif isinstance(value, float):
         o = create_object(FLOAT_TYPE, value)
         self.reference = o.reference
-        self.properties = o.properties
+        self['__class__'] = o['__class__']
+        self['__value__'] = o['__value__']
+        self.slot_table = o.slot_table
+        self._properties = o._properties
     elif compare_type(value, INTEGER_TYPE):
         self['__value__'] = value['__value__']
     else:
@@ -228,8 +231,8 @@ def int_dec(self: AILObject):
 
 def int_eq(self: AILObject, o: AILObject):
     if isinstance(o, AILObject):
-        return create_object(BOOL_TYPE, self['__value__'] == o['__value__'])
-    return create_object(BOOL_TYPE, self['__value__'] == o)
+        return abool.get_bool(self['__value__'] == o['__value__'])
+    return abool.get_bool(self['__value__'] == o)
 
 
 def int_to_string(self):
@@ -270,7 +273,7 @@ def get_integer(pyint: int) -> AILObject:
     if not isinstance(pyint, int):
         return pyint
 
-    if POOL_RANGE_MIN < pyint < POOL_RANGE_MAX:
+    if POOL_RANGE_MIN <= pyint < POOL_RANGE_MAX:
         return INTEGER_POOL[pyint - POOL_RANGE_MIN]
     return create_object(INTEGER_TYPE, pyint)
 
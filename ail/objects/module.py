@@ -3,6 +3,7 @@
 from .types import I_MODULE_TYPE
 
 from ..core.aobjects import AILObject, AILObjectType, ObjectCreater, create_object
+from ..core.anamespace import Namespace
 from ..core.error import AILRuntimeError
 
 
@@ -17,6 +18,9 @@ def module_setattr(self, name: str, value: AILObject):
 
     assert isinstance(name, str)
 
+    if name not in namespace:
+        Namespace.touch()  # 名称集合改变, 使名称查找缓存失效
+
     namespace[name] = value
 
 
@@ -6,6 +6,11 @@ from . import bool, integer, function
 from . import types
 
 
+INTERN_MAX_LENGTH = 40
+INTERN_TABLE_SIZE = 10000
+
+_INTERN_TABLE = dict()
+
 _new_object = None
 _compare_type = None
 _convert_to_ail_object = None
@@ -56,7 +61,7 @@ def str_add(self, ostr: AILObject) -> AILObject:
 
     rs = ss + str(os)
 
-    return _new_object(STRING_TYPE, rs)
+    return get_string(rs)
 
 
 def str_muit(self, times: AILObject) -> AILObject:
@@ -118,10 +123,10 @@ def str_eq(self, ostr: AILObject) -> AILObject:
     os = ostr['__value__']
 
     if len(ss) != len(os):
-        return _new_object(bool.BOOL_TYPE, 0)
+        return bool.get_bool(0)
     else:
         s = sum([a == b for a, b in zip(ss, os)])
-        return _new_object(bool.BOOL_TYPE, s == len(os))
+        return bool.get_bool(s == len(os))
 
 
 def str_len(self):
@@ -205,7 +210,48 @@ def convert_to_string(aobj) -> obj.AILObject:
     if isinstance(aobj, obj.AILObject):
         return aobj['__str__'](aobj)
     else:
-        return _new_object(STRING_TYPE, str(aobj))
+        return get_string(str(aobj))
+
+
+def intern_string(pystr: str) -> obj.AILObject:
+    """
+    get an interned string object.
+
+    if the intern table is full, create a string object.
+
+    :return: String object
+    """
+    o = _INTERN_TABLE.get(pystr)
+    if o is not None:
+        return o
+
+    _make_cache()
+
+    o = _new_object(STRING_TYPE, pystr)
+    if len(_INTERN_TABLE) < INTERN_TABLE_SIZE:
+        o.reference += 1
+        _INTERN_TABLE[pystr] = o
+    return o
+
+
+def get_string(pystr: str) -> obj.AILObject:
+    """
+    get a string object.
+
+    if pystr looks like an identifier (and not longer than INTERN_MAX_LENGTH),
+    returns the interned string, otherwise, create a string object.
+
+    :return: String object
+    """
+    o = _INTERN_TABLE.get(pystr)
+    if o is not None:
+        return o
+
+    if len(pystr) <= INTERN_MAX_LENGTH and pystr.isidentifier():
+        return intern_string(pystr)
+
+    _make_cache()
+    return _new_object(STRING_TYPE, pystr)
 
 
 STRING_TYPE = obj.AILObjectType('<string type>', types.I_STR_TYPE,
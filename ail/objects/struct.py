@@ -1,4 +1,4 @@
-from copy import deepcopy
+from copy import copy
 
 from ..core import aobjects as obj
 
@@ -23,8 +23,9 @@ def _is_reserved_name(name):
 
 
 def _copy_function(f: AILObject) -> AILObject:
-    new_f = deepcopy(f)
-    new_f.properties = f.properties.copy()
+    new_f = copy(f)
+    p = f._properties
+    new_f._properties = None if p is None else p.copy()
 
     return new_f
 
@@ -46,7 +47,7 @@ def _check_bound(self, aobj: AILObject):
             return _BIND_BOUND_FUNCTION
 
         aobj['__repr__'] = _get_method_str_func(self['__name__'])
-        aobj['__this__'] = self  # bound self to __this__
+        aobj['__this__'] = self._this  # bound self to __this__
     return aobj
 
 
@@ -70,10 +71,18 @@ def structobj_init(self, name: str, members: dict, struct_type: AILObject,
 
     members.update(bind_funcs)
 
-    self.members = {k: _check_bound(self, v)
-                    for k, v in members.items()}
+    self.members = bound_members = {}
     self.protected = protected_members
 
+    # 方法中的 this: 与 self 共享成员, 带有 _pthis_ 标记 (可以访问保护成员)
+    # 每个对象只创建一次, 调用方法时直接传入
+    this = copy(self)
+    this._pthis_ = True
+    self._this = this._this = this
+
+    bound_members.update(
+        (k, _check_bound(self, v)) for k, v in members.items())
+
 
 def struct_getattr(self, name: str):
     pthis = hasattr(self, '_pthis_')
@@ -48,7 +48,8 @@ def super_setattr(self, name, value):
     cls = _find_class_from_order(self, name)
 
     if cls is not None:
-        cls['__dict__'][name] = convert_to_ail_object(value)
+        # 经过 class_setattr, 使类属性查找缓存失效
+        cls['__setattr__'](cls, name, convert_to_ail_object(value))
 
 
 def super_str(self):
@@ -3,6 +3,7 @@ from json import dumps
 from os.path import split
 
 from .core.alex import Lex
+from .core.asource import open_source
 from .core.aparser import Parser
 from .core.test_utils import make_ast_tree
 
@@ -13,10 +14,9 @@ def parse_main(argv):
 
     filename, *_ = argv
 
-    source = open(filename, encoding='UTF-8').read()
-
-    ts = Lex().lex(source, filename)
-    tree = Parser().parse(ts, source, filename)
+    with open_source(filename) as source:
+        ts = Lex().lex_stream(source, filename)
+        tree = Parser().parse(ts, source, filename)
     
     print(dumps(make_ast_tree(tree)))
 
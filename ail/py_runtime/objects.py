@@ -10,6 +10,7 @@ from . import shared as _shared
 
 from ..core.aloader import MAIN_LOADER as _LOADER
 from ..core.aobjects import AILObject, convert_to_ail_object
+from ..core.asource import MappedSource, open_source
 from ..core.error import AILRuntimeError as _RTError
 
 from ..objects.null import _NULL_TYPE
@@ -120,7 +121,8 @@ class AILImporter:
                     module_obj = None
 
             if module_obj is None:
-                ns = self.get_namespace(path, self.get_source(path))
+                with open_source(path) as source:
+                    ns = self.get_namespace(path, source)
                 ns = self.get_export(ns, ns.get('__export__', None))
                 module_obj = AILModule(name, path, ns)
 
@@ -153,7 +155,10 @@ class AILImporter:
 
     @staticmethod
     def get_source(path: str) -> str:
-        return open(path, encoding='UTF-8').read()
+        with open_source(path) as source:
+            if isinstance(source, MappedSource):
+                return source.read()
+            return source
 
     @staticmethod
     def get_namespace(path: str, source: str) -> dict:
@@ -0,0 +1,83 @@
+# core_test 共用的工具
+#
+# 在仓库根目录运行:
+#     python -m unittest discover -s tests/core_test
+
+import contextlib
+import io
+
+from ail import ail_main  # noqa: F401, 设置 boot_dir 与模块查找路径
+from ail.core import asts as ast
+from ail.core.abuiltins import init_builtins
+from ail.core.aconfig import BYTE_CODE_SIZE
+from ail.core.acompiler import Compiler
+from ail.core.alex import Lex
+from ail.core.aobjects import AILCodeObject, AILObject
+from ail.core.aparser import Parser
+from ail.core.astate import MAIN_INTERPRETER_STATE
+from ail.core.test_utils import get_opname
+
+
+def parse_source(source: str, filename: str = '<test>'):
+    return Parser().parse(Lex().lex(source, filename), source, filename)
+
+
+def dump_ast(tree):
+    """
+    :return: tree 的嵌套 tuple / list 表示, 用于比较两棵 AST
+    """
+    if isinstance(tree, ast.BaseAST):
+        names = [n for c in type(tree).__mro__
+                 for n in getattr(c, '__slots__', ())]
+        return (type(tree).__name__,) + tuple(
+            (n, dump_ast(getattr(tree, n, None))) for n in sorted(set(names)))
+
+    if isinstance(tree, (list, tuple)):
+        return [dump_ast(x) for x in tree]
+
+    return tree
+
+
+def compile_source(source: str, filename: str = '<test>') -> AILCodeObject:
+    tree = parse_source(source, filename)
+    return Compiler(filename=filename).compile(tree).code_object
+
+
+def run_code(cobj: AILCodeObject) -> tuple:
+    """
+    :return: (why, stdout 的输出), 错误信息 (stderr) 被丢弃
+    """
+    init_builtins()
+    cobj.is_main = True
+
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), \
+            contextlib.redirect_stderr(io.StringIO()):
+        why = MAIN_INTERPRETER_STATE.global_interpreter.exec(cobj)
+
+    return why, out.getvalue()
+
+
+def run_source(source: str, filename: str = '<test>') -> tuple:
+    return run_code(compile_source(source, filename))
+
+
+def opnames(cobj: AILCodeObject) -> list:
+    b = cobj.bytecodes
+    return [get_opname(b[i]) for i in range(0, len(b), BYTE_CODE_SIZE)]
+
+
+def const_values(cobj: AILCodeObject) -> list:
+    return [c['__value__'] if isinstance(c, AILObject) else c
+            for c in cobj.consts]
+
+
+def code_objects(cobj: AILCodeObject):
+    """
+    :return: cobj 以及其中 (递归) 定义的所有 code object
+    """
+    yield cobj
+
+    for c in cobj.consts:
+        if isinstance(c, AILCodeObject):
+            yield from code_objects(c)
@@ -0,0 +1,191 @@
+import contextlib
+import io
+import os
+import os.path
+import tempfile
+import unittest
+
+from unittest import mock
+
+from ail.core import abytecode, acache, aconfig, aloader, pyexec, shared
+from ail.core.aobjects import AILCodeObject
+from ail.core.aparser import ASTConverter
+
+from ailtest import compile_source, const_values, parse_source, run_code
+
+
+_MODULE_SOURCE = '''
+PI = 3.14
+NAMES = ['a', 'b']
+
+fun area(r) {
+    return PI * r * r
+}
+
+i = 0
+s = 0
+while i < 10 {
+    s += i
+    i += 1
+}
+
+print area(2), s, NAMES[1], null
+'''
+
+
+def _code_shape(cobj: AILCodeObject) -> tuple:
+    consts = tuple(_code_shape(c) if isinstance(c, AILCodeObject) else v
+                   for c, v in zip(cobj.consts, const_values(cobj)))
+
+    return (cobj.name, cobj.argcount, tuple(cobj.bytecodes),
+            tuple(cobj.varnames), tuple(cobj.lineno_list), consts)
+
+
+class AILCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        self.dir = tmp.name
+        self.path = os.path.join(self.dir, 'mod.ail')
+        self.__write(_MODULE_SOURCE)
+
+    def __write(self, source: str):
+        with open(self.path, 'w', encoding='UTF-8') as f:
+            f.write(source)
+
+    def __compile_and_cache(self) -> AILCodeObject:
+        cobj = compile_source(_MODULE_SOURCE, self.path)
+        self.assertTrue(acache.cache_code(self.path, _MODULE_SOURCE, cobj))
+        return cobj
+
+    def test_round_trip(self):
+        cobj = self.__compile_and_cache()
+
+        self.assertTrue(os.path.isfile(acache.get_cache_path(self.path)))
+
+        cached = acache.load_cached_code(self.path, _MODULE_SOURCE)
+
+        self.assertIsNotNone(cached)
+        self.assertEqual(_code_shape(cached), _code_shape(cobj))
+        self.assertEqual(run_code(cached), run_code(cobj))
+
+    def test_invalidated_by_source_change(self):
+        self.__compile_and_cache()
+
+        source = _MODULE_SOURCE.replace('3.14', '3.1416')
+        self.__write(source)
+
+        self.assertIsNone(acache.load_cached_code(self.path, source))
+
+    def test_invalidated_by_format_version(self):
+        self.__compile_and_cache()
+
+        with mock.patch.object(abytecode, 'AILC_FORMAT_VERSION',
+                               abytecode.AILC_FORMAT_VERSION + 1):
+            self.assertIsNone(
+                acache.load_cached_code(self.path, _MODULE_SOURCE))
+
+    def test_optimized_code_cached_separately(self):
+        self.__compile_and_cache()
+
+        with mock.patch.object(aconfig, 'OPTIMIZE', True):
+            self.assertIsNone(
+                acache.load_cached_code(self.path, _MODULE_SOURCE))
+
+    def test_disabled_at_run_time(self):
+        cobj = compile_source(_MODULE_SOURCE, self.path)
+
+        with mock.patch.object(aconfig, 'BYTE_CODE_CACHE', False):
+            self.assertFalse(
+                acache.cache_code(self.path, _MODULE_SOURCE, cobj))
+
+        self.assertFalse(os.path.exists(acache.get_cache_path(self.path)))
+
+    def test_import_uses_cache(self):
+        hits = []
+
+        def load_cached_code(source_path, source):
+            cobj = acache.load_cached_code(source_path, source)
+            hits.append(cobj is not None)
+            return cobj
+
+        with mock.patch.object(shared.GLOBAL_SHARED_DATA,
+                               'find_path', [self.dir]), \
+                mock.patch.object(aloader, 'load_cached_code',
+                                  load_cached_code), \
+                mock.patch('sys.stdout'):
+            ns1, _ = aloader.ModuleLoader().load_namespace('mod')
+            ns2, _ = aloader.ModuleLoader().load_namespace('mod')
+
+        self.assertEqual(hits, [False, True])
+        self.assertEqual(ns1['s']['__value__'], 45)
+        self.assertEqual(ns2['s']['__value__'], 45)
+
+
+
+class PycCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        self.path = os.path.join(tmp.name, 'main.ail')
+        self.__write(_MODULE_SOURCE)
+
+    def __write(self, source: str):
+        with open(self.path, 'w', encoding='UTF-8') as f:
+            f.write(source)
+
+    def __compile_and_cache(self):
+        tree = parse_source(_MODULE_SOURCE, self.path)
+        code = compile(
+            ASTConverter().convert_module(tree), self.path, 'exec')
+
+        self.assertTrue(acache.cache_pycode(self.path, _MODULE_SOURCE, code))
+        return code
+
+    def __exec(self, source: str) -> str:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(
+                pyexec.exec_as_python(source, self.path, dict()), 0)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        code = self.__compile_and_cache()
+
+        self.assertEqual(
+            acache.load_cached_pycode(self.path, _MODULE_SOURCE), code)
+
+    def test_invalidated_by_source_change(self):
+        self.__compile_and_cache()
+
+        source = _MODULE_SOURCE.replace('3.14', '3.1416')
+        self.__write(source)
+
+        self.assertIsNone(acache.load_cached_pycode(self.path, source))
+
+    def test_invalidated_by_format_version(self):
+        self.__compile_and_cache()
+
+        with mock.patch.object(acache, 'PYC_FORMAT_VERSION',
+                               acache.PYC_FORMAT_VERSION + 1):
+            self.assertIsNone(
+                acache.load_cached_pycode(self.path, _MODULE_SOURCE))
+
+    def test_exec_uses_cache(self):
+        first = self.__exec(_MODULE_SOURCE)
+
+        self.assertIsNotNone(
+            acache.load_cached_pycode(self.path, _MODULE_SOURCE))
+
+        with mock.patch.object(pyexec, 'Parser') as parser:
+            second = self.__exec(_MODULE_SOURCE)
+
+        parser.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(first.split()[:3], ['12.56', '45', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
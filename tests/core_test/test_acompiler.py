@@ -0,0 +1,208 @@
+import unittest
+
+from unittest import mock
+
+from ail.core import aconfig
+from ail.core.aconfig import BYTE_CODE_SIZE
+from ail.core.abytecode import ByteCode, Label
+from ail.core.aopcode import (
+    JUMP_ABSOLUTE_OPS, JUMP_RELATIVE_OPS, SETUP_BLOCK_OPS,
+    jump_absolute, jump_forward, load_const, pop_top, setup_while,
+)
+
+from ailtest import code_objects, compile_source, run_code
+
+
+_ASSERT_SOURCE = '''
+assert 1 == 1
+print 'after assert'
+
+try {
+    assert 1 == 2
+    print 'not here'
+} catch e {
+    print 'caught'
+}
+
+fun check(x) {
+    assert x > 0
+    return x * 2
+}
+print check(3)
+'''
+
+_ASSERT_OUTPUT = 'after assert \ncaught \n6 \n'
+
+# do ... loop until 中的 if 与 while 曾经得到错误的跳转地址
+_DO_LOOP_SOURCE = '''
+i = 0
+n = 0
+do {
+    i += 1
+    if i mod 2 == 0 {
+        n += 1
+    } else {
+        n += 0
+    }
+    j = 0
+    while j < 2 {
+        j += 1
+    }
+} loop until i == 10
+print i, n, j
+
+k = 0
+do {
+    k += 1
+    if k == 3 {
+        break
+    }
+} loop until k == 10
+print k
+'''
+
+_DO_LOOP_OUTPUT = '10 5 2 \n3 \n'
+
+_FINALLY_SOURCE = '''
+fun f() {
+    try {
+        return 'try'
+    } finally {
+        print 'finally 1'
+    }
+}
+print f()
+
+i = 0
+while i < 3 {
+    try {
+        i += 1
+        if i == 2 {
+            break
+        }
+    } finally {
+        print 'finally', i
+    }
+}
+
+try {
+    try {
+        1 / 0
+    } finally {
+        print 'inner finally'
+    }
+} catch e {
+    print 'caught'
+}
+print 'end'
+'''
+
+_FINALLY_OUTPUT = ('finally 1 \ntry \nfinally 1 \nfinally 2 \n'
+                   'inner finally \ncaught \nend \n')
+
+
+def _targets(cobj):
+    """
+    :return: (下标, 字节码, 目标偏移量) 的列表, 包括块处理地址
+    """
+    b = cobj.bytecodes
+    targets = []
+
+    for i in range(0, len(b), BYTE_CODE_SIZE):
+        op, argv = b[i], b[i + 1]
+
+        if op in JUMP_ABSOLUTE_OPS or op in SETUP_BLOCK_OPS:
+            targets.append((i, op, argv))
+        elif op in JUMP_RELATIVE_OPS:
+            targets.append((i, op, i + argv))
+
+    return targets
+
+
+class LabelTest(unittest.TestCase):
+    def test_forward_and_backward_jumps(self):
+        start = Label()
+        end = Label()
+
+        bc = ByteCode()
+        bc.mark(start)
+        bc.add_bytecode(load_const, 0, 1)
+        bc.add_jump(jump_absolute, end, 1)
+        bc.add_bytecode(pop_top, 0, 1)
+        bc.add_jump(jump_absolute, start, 1)
+        bc.mark(end)
+        bc.add_bytecode(pop_top, 0, 1)
+        bc.assemble()
+
+        # 向前的跳转改为相对跳转, 向后的跳转保持绝对跳转
+        self.assertEqual(bc.blist, [
+            load_const, 0,
+            jump_forward, 6,
+            pop_top, 0,
+            jump_absolute, 0,
+            pop_top, 0,
+        ])
+
+    def test_labels_in_fragments(self):
+        handler = Label()
+
+        body = ByteCode()
+        body.add_bytecode(load_const, 0, 1)
+        body.mark(handler)
+        body.add_bytecode(pop_top, 0, 1)
+
+        inner = ByteCode()
+        inner.add_jump(setup_while, handler, 1)
+        inner += body
+
+        bc = ByteCode()
+        bc.add_bytecode(load_const, 1, 1)
+        bc.add_bytecode(pop_top, 0, 1)
+        bc += inner
+        bc.assemble()
+
+        # 子序列中的 Label 按子序列在整个序列中的位置解析, 块处理地址为绝对地址
+        self.assertEqual(bc.blist[4:6], [setup_while, 8])
+        self.assertEqual(len(bc.lineno_list), 5)
+
+
+class LabelAssembleTest(unittest.TestCase):
+    def assertRuns(self, source: str, output: str):
+        for engine in ('table', 'switch'):
+            for optimize in (False, True):
+                with self.subTest(engine=engine, optimize=optimize), \
+                        mock.patch.object(aconfig, 'VM_ENGINE', engine), \
+                        mock.patch.object(aconfig, 'OPTIMIZE', optimize):
+                    _, out = run_code(compile_source(source))
+                    self.assertEqual(out, output)
+
+    def assertTargetsValid(self, source: str):
+        for c in code_objects(compile_source(source)):
+            size = len(c.bytecodes)
+
+            for i, op, target in _targets(c):
+                with self.subTest(code=c.name, offset=i):
+                    self.assertEqual(target % BYTE_CODE_SIZE, 0)
+                    self.assertTrue(0 <= target <= size)
+
+                    # 块处理地址与向前的跳转在 setup / 跳转之后
+                    if op in SETUP_BLOCK_OPS or op in JUMP_RELATIVE_OPS:
+                        self.assertGreater(target, i)
+                    else:
+                        self.assertLessEqual(target, i)
+
+    def test_assert(self):
+        self.assertTargetsValid(_ASSERT_SOURCE)
+        self.assertRuns(_ASSERT_SOURCE, _ASSERT_OUTPUT)
+
+    def test_do_loop(self):
+        self.assertTargetsValid(_DO_LOOP_SOURCE)
+        self.assertRuns(_DO_LOOP_SOURCE, _DO_LOOP_OUTPUT)
+
+    def test_finally(self):
+        self.assertTargetsValid(_FINALLY_SOURCE)
+        self.assertRuns(_FINALLY_SOURCE, _FINALLY_OUTPUT)
+
+
+if __name__ == '__main__':
+    unittest.main()
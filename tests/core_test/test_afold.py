@@ -0,0 +1,123 @@
+import math
+import unittest
+
+from ail.core.avmsig import WHY_ERROR, WHY_HANDLING_ERR
+
+from ailtest import compile_source, const_values, opnames, run_source
+
+
+# (第一个操作数, 其余部分), 折叠的结果必须与运行时计算的结果一致
+_FOLDABLE = [
+    ('60', '* 60 * 24'),
+    ('1', '+ 2.0'),
+    ('7', '/ 2'),
+    ('7', 'mod 3'),
+    ('2', '** 10'),
+    ('1', '<< 4'),
+    ('0xff', '& 0x0f | 1'),
+    ('5', '^ 3'),
+    ('0.1', '+ 0.2'),
+    ('1', '- 2 - 3'),
+    ('3', '* 1.5'),
+    ("'a'", "+ 'b'"),
+    ('1', '< 2'),
+    ('2', '>= 3'),
+    ("'a'", "== 'a'"),
+]
+
+_UNARY = [('-', '5'), ('-', '2.5'), ('~', '5'), ('not ', '0'), ('not ', "''")]
+
+# 运行时才报错或结果不适合作为常量的表达式, 不能折叠
+_NOT_FOLDABLE = [
+    ('1 / 0', 'binary_div'),
+    ('1 mod 0', 'binary_mod'),
+    ("'a' + 1", 'binary_add'),
+    ("'a' - 'b'", 'binary_sub'),
+    ('2 ** 200', 'binary_pow'),
+    ('1 << 200', 'binary_lshift'),
+    ('1e308 * 10', 'binary_mult'),
+]
+
+# 字符串只折叠 '+', 其余运算留给运行时
+_NOT_FOLDABLE_OPERANDS = [
+    ("'a'", '+ 1'),
+    ("'a'", "- 'b'"),
+    ("'ab'", '* 2'),
+]
+
+
+def _assign_ops(expr: str) -> list:
+    # 去掉赋值与结尾的 return
+    return [op for op in opnames(compile_source('x = %s\n' % expr))
+            if op not in ('store_var_pop', 'pop_top', 'return_value')][:-1]
+
+
+class ConstantFoldTest(unittest.TestCase):
+    def test_same_result_as_run_time(self):
+        for first, rest in _FOLDABLE:
+            with self.subTest(expr='%s %s' % (first, rest)):
+                folded = run_source('print %s %s\n' % (first, rest))
+                run_time = run_source('a = %s\nprint a %s\n' % (first, rest))
+
+                self.assertTrue(folded[1])
+                self.assertEqual(folded, run_time)
+
+    def test_unary_same_result_as_run_time(self):
+        for op, value in _UNARY:
+            with self.subTest(expr=op + value):
+                folded = run_source('print %s%s\n' % (op, value))
+                run_time = run_source('a = %s\nprint %sa\n' % (value, op))
+
+                self.assertEqual(folded, run_time)
+
+    def test_folded_to_one_const(self):
+        for first, rest in _FOLDABLE:
+            expr = '%s %s' % (first, rest)
+
+            with self.subTest(expr=expr):
+                self.assertIn(_assign_ops(expr), (['load_const'],
+                                                  ['load_variable']))
+
+    def test_const_prefix(self):
+        # 运算从左到右, 只有常量前缀被折叠
+        cobj = compile_source('x = 60 * 60 * y\nz = y * 60 * 60\n')
+
+        self.assertEqual(opnames(cobj).count('binary_mult'), 3)
+        self.assertIn(3600, const_values(cobj))
+        self.assertNotIn(216000, const_values(cobj))
+
+    def test_not_foldable(self):
+        for expr, op in _NOT_FOLDABLE:
+            with self.subTest(expr=expr):
+                self.assertIn(op, _assign_ops(expr))
+
+    def test_not_foldable_same_result_as_run_time(self):
+        for first, rest in _NOT_FOLDABLE_OPERANDS:
+            with self.subTest(expr='%s %s' % (first, rest)):
+                self.assertEqual(
+                    run_source('print %s %s\n' % (first, rest)),
+                    run_source('a = %s\nprint a %s\n' % (first, rest)))
+
+    def test_errors_stay_at_run_time(self):
+        for expr in ('1 / 0', '1 mod 0'):
+            with self.subTest(expr=expr):
+                why, out = run_source("print 'before'\nx = %s\n" % expr)
+
+                self.assertEqual(out, 'before \n')
+                self.assertIn(why, (WHY_ERROR, WHY_HANDLING_ERR))
+
+    def test_number_types_kept(self):
+        values = const_values(compile_source(
+            'a = 1 + 2.0\nb = 3\nc = 0.0\nd = 0.0 * -1\n'))
+
+        floats = [v for v in values if type(v) is float]
+
+        # 3.0 与 3, 0.0 与 -0.0 不共用常量
+        self.assertIn(3, values)
+        self.assertEqual(sorted(math.copysign(1, v) for v in floats),
+                         [-1, 1, 1])
+        self.assertEqual(len(floats), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
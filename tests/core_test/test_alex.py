@@ -0,0 +1,103 @@
+import glob
+import os.path
+import unittest
+
+from unittest import mock
+
+from ail.core import aconfig, error
+from ail.core.alex import Lex
+from ail.core.asource import MappedSource, read_source
+
+
+_ROOT = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+
+_SOURCE = r'''
+// line comment
+/* block
+   comment */
+a = 0x1f + 0b101 + 0o17 + 1.5 + .5 + 10. + 3e4 + 2.5e-3 + 1_000
+b = 'single \'quoted\' \n\t\\' + "double \"quoted\""
+名字 = a mod 3 ** 2 // 4
+d = [1, 2, 3][0]
+e = {'k': -1, 'v': ~2}
+f = a << 1 >> 2 & 3 | 4 ^ 5
+if a >= 1 and b != '' or not c <= 2 {
+    d += 1; d -= 1; d *= 2; d /= 2
+}
+g = fun (x, *y) -> x
+i = a.b.c(d)[e] \
+    + 1
+$ @ ;
+'''
+
+_BAD_SOURCES = [
+    "a = 'unterminated\n",
+    'a = "unterminated\n',
+    'a = /* unterminated\n',
+    'c = `raw string`\n',
+    'h = a == b ? c : d\n',
+]
+
+
+def _lex(source, engine: str) -> list:
+    with mock.patch.object(aconfig, 'LEX_ENGINE', engine):
+        return [(t.value, t.ttype, t.ln) for t in Lex().lex(source, 't.ail')]
+
+
+def _lex_error(source, engine: str) -> str:
+    with mock.patch.object(error, 'THROW_ERROR_TO_PYTHON', True):
+        try:
+            _lex(source, engine)
+        except error.BuiltinAILRuntimeError as e:
+            return str(e)
+    return None
+
+
+class LexEngineTest(unittest.TestCase):
+    """
+    'regex' 引擎产生的单词流必须与 'char' 引擎完全一致
+    """
+
+    def assertSameTokens(self, source):
+        tokens = _lex(source, 'regex')
+
+        self.assertTrue(tokens)
+        self.assertEqual(tokens, _lex(source, 'char'))
+
+    def test_source(self):
+        self.assertSameTokens(_SOURCE)
+
+    def test_repository_sources(self):
+        paths = glob.glob(
+            os.path.join(_ROOT, '**', '*.ail'), recursive=True)
+
+        self.assertTrue(paths)
+
+        for path in paths:
+            with self.subTest(path=os.path.relpath(path, _ROOT)):
+                with open(path, encoding='UTF-8') as f:
+                    self.assertSameTokens(f.read())
+
+    def test_mapped_source(self):
+        path = os.path.join(_ROOT, 'tests', 'test_class.ail')
+
+        with mock.patch.object(aconfig, 'MMAP_SOURCE_SIZE', 1):
+            source = read_source(path)
+
+        self.assertIsInstance(source, MappedSource)
+
+        with source:
+            self.assertEqual(_lex(source, 'regex'), _lex(source, 'char'))
+
+    def test_errors(self):
+        for source in _BAD_SOURCES:
+            with self.subTest(source=source):
+                msg = _lex_error(source, 'regex')
+
+                self.assertIsNotNone(msg)
+                self.assertEqual(msg, _lex_error(source, 'char'))
+
+
+if __name__ == '__main__':
+    unittest.main()
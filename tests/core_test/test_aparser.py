@@ -0,0 +1,78 @@
+import contextlib
+import glob
+import io
+import os.path
+import unittest
+
+from unittest import mock
+
+from ail.core import aconfig
+from ail.core.alex import Lex
+from ail.core.aparser import Parser
+
+from ailtest import dump_ast
+
+
+_ROOT = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+
+
+def _nested_map(depth: int) -> str:
+    m = '1'
+    for i in range(depth):
+        m = "{'k%d': %s, 'v': [%s]}" % (i, m, i)
+    return 'm = %s\nprint m\n' % m
+
+
+def _parse(source: str, memo: bool, pyc_mode: bool = False):
+    parser = Parser()
+
+    with mock.patch.object(aconfig, 'PARSER_MEMO', memo):
+        tree = parser.parse(
+            Lex().lex(source, '<test>'), source, '<test>', pyc_mode)
+
+    return parser, tree
+
+
+class ParserMemoTest(unittest.TestCase):
+    def assertSameAST(self, source: str):
+        for pyc_mode in (False, True):
+            _, with_memo = _parse(source, True, pyc_mode)
+            _, without_memo = _parse(source, False, pyc_mode)
+
+            self.assertEqual(dump_ast(with_memo), dump_ast(without_memo))
+
+    def test_repository_sources(self):
+        paths = glob.glob(
+            os.path.join(_ROOT, '**', '*.ail'), recursive=True)
+
+        self.assertTrue(paths)
+
+        for path in paths:
+            with open(path, encoding='UTF-8') as f:
+                source = f.read()
+
+            # 有语法错误的文件 (如故意写错的测试) 不比较
+            try:
+                with contextlib.redirect_stderr(io.StringIO()):
+                    _parse(source, False)
+            except SystemExit:
+                continue
+
+            with self.subTest(path=os.path.relpath(path, _ROOT)):
+                self.assertSameAST(source)
+
+    def test_nested_map(self):
+        self.assertSameAST(_nested_map(6))
+
+    def test_nested_map_is_linear(self):
+        # 没有 memo 时每层都会重新分析右边的整个 map, 回退次数随深度指数增长
+        depth = 12
+        parser, _ = _parse(_nested_map(depth), True)
+
+        self.assertGreater(parser.memo_hit_count, 0)
+        self.assertLessEqual(parser.backtrack_count, 4 * depth)
+
+
+if __name__ == '__main__':
+    unittest.main()
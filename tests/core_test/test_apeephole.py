@@ -0,0 +1,153 @@
+import unittest
+
+from unittest import mock
+
+from ail.core import aconfig
+from ail.core.aconfig import BYTE_CODE_SIZE
+from ail.core.aopcode import (
+    JUMP_ABSOLUTE_OPS, JUMP_RELATIVE_OPS, jump_absolute, jump_forward,
+)
+
+from ailtest import code_objects, compile_source, opnames, run_code
+
+
+_SOURCE = '''
+fun f(n) {
+    s = 0
+    i = 0
+    while i < n {
+        if i mod 2 == 0 {
+            if i > 4 {
+                s += i
+            }
+        } else {
+            s -= 1
+        }
+        i += 1
+    }
+    return s
+    print 'dead'
+}
+
+while true {
+    break
+}
+
+if false {
+    print 'never'
+}
+
+print f(10)
+'''
+
+_LOOP_SOURCE = '''
+s = 0
+for (i = 0; i < 10; i += 1) {
+    if i == 3 {
+        continue
+    }
+    j = 0
+    while true {
+        j += 1
+        if j < 3 {
+            continue
+        }
+        break
+    }
+    s += i * j
+}
+print s, i, j
+'''
+
+
+def _compile(source: str, optimize: bool):
+    with mock.patch.object(aconfig, 'OPTIMIZE', optimize):
+        return compile_source(source)
+
+
+def _function(cobj, name: str):
+    for c in code_objects(cobj):
+        if c.name == name:
+            return c
+    raise KeyError(name)
+
+
+def _jumps(cobj):
+    """
+    :return: (跳转的下标, 跳转目标的下标) 的列表, 下标以字节码条数计
+    """
+    b = cobj.bytecodes
+    jumps = []
+
+    for i in range(0, len(b), BYTE_CODE_SIZE):
+        op, argv = b[i], b[i + 1]
+
+        if op in JUMP_ABSOLUTE_OPS:
+            target = argv
+        elif op in JUMP_RELATIVE_OPS:
+            target = i + argv
+        else:
+            continue
+
+        jumps.append((i // BYTE_CODE_SIZE, target // BYTE_CODE_SIZE))
+
+    return jumps
+
+
+def _jumps_to_jumps(cobj) -> list:
+    b = cobj.bytecodes
+    return [(i, t) for i, t in _jumps(cobj)
+            if b[t * BYTE_CODE_SIZE] in (jump_absolute, jump_forward)]
+
+
+class PeepholeTest(unittest.TestCase):
+    def test_jump_threading(self):
+        plain = _function(_compile(_SOURCE, False), 'f')
+        optimized = _function(_compile(_SOURCE, True), 'f')
+
+        # 内层 if 的跳转落在外层 if 的 jump_forward 上
+        self.assertTrue(_jumps_to_jumps(plain))
+        self.assertEqual(_jumps_to_jumps(optimized), [])
+
+    def test_jump_targets_in_range(self):
+        for c in code_objects(_compile(_SOURCE + _LOOP_SOURCE, True)):
+            n = len(c.bytecodes) // BYTE_CODE_SIZE
+
+            self.assertEqual(len(c.lineno_list), n)
+            for i, target in _jumps(c):
+                self.assertTrue(0 < target < n and target != i)
+
+    def test_dead_code_after_return(self):
+        plain = opnames(_function(_compile(_SOURCE, False), 'f'))
+        optimized = opnames(_function(_compile(_SOURCE, True), 'f'))
+
+        self.assertIn('print_value', plain)
+        self.assertNotIn('print_value', optimized)
+        self.assertEqual(optimized[-1], 'return_value')
+        self.assertEqual(optimized.count('return_value'), 1)
+
+    def test_constant_conditions(self):
+        optimized = opnames(_compile(_SOURCE, True))
+
+        # while true 不再测试条件, if false 整个被删除
+        loop = optimized[:optimized.index('pop_loop')]
+
+        self.assertNotIn('load_variable', loop)
+        self.assertEqual(optimized.count('print_value'), 1)
+
+    def test_same_output(self):
+        for source in (_SOURCE, _LOOP_SOURCE):
+            plain = run_code(_compile(source, False))
+            optimized = run_code(_compile(source, True))
+
+            self.assertTrue(plain[1])
+            self.assertEqual(plain, optimized)
+
+    def test_same_output_switch_engine(self):
+        with mock.patch.object(aconfig, 'VM_ENGINE', 'switch'):
+            self.assertEqual(run_code(_compile(_LOOP_SOURCE, True)),
+                             run_code(_compile(_LOOP_SOURCE, False)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import sys
+import unittest
+
+from unittest import mock
+
+from ail.core import aconfig, athread
+from ail.core.aobjects import AILObject, convert_to_ail_object
+from ail.core.avmsig import WHY_ERROR, WHY_HANDLING_ERR
+from ail.objects.class_object import (
+    CLASS_OBJECT, class_getattr, class_setattr, new_class, touch_class,
+)
+
+from ailtest import run_source
+
+
+_RECURSION_SOURCE = '''
+fun depth(n) {
+    if n == 0 {
+        return 0
+    }
+    return depth(n - 1) + 1
+}
+print depth(5000)
+
+fun is_even(n) {
+    if n == 0 {
+        return true
+    }
+    return is_odd(n - 1)
+}
+
+fun is_odd(n) {
+    if n == 0 {
+        return false
+    }
+    return is_even(n - 1)
+}
+print is_even(5001)
+
+fun fail(n) {
+    if n == 0 {
+        1 / 0
+    }
+    return fail(n - 1)
+}
+
+try {
+    fail(5000)
+} catch e {
+    print 'caught', e.err_type
+}
+
+class Node {
+    fun down(self, n) {
+        if n == 0 {
+            return 'bottom'
+        }
+        return self.down(n - 1)
+    }
+}
+print Node().down(5000)
+'''
+
+_RECURSION_OUTPUT = '5000 \nfalse \ncaught ZeroDivisionError \nbottom \n'
+
+_OVERFLOW_SOURCE = '''
+fun f(n) {
+    return f(n + 1)
+}
+f(0)
+'''
+
+
+class StacklessCallTest(unittest.TestCase):
+    def assertDeepRecursion(self):
+        # 每层 AIL 调用哪怕只占两个 Python 栈帧, 5000 层也会超过递归限制
+        self.assertGreater(2 * 5000, sys.getrecursionlimit())
+        self.assertEqual(run_source(_RECURSION_SOURCE)[1], _RECURSION_OUTPUT)
+
+    def test_fast_engine(self):
+        self.assertDeepRecursion()
+
+    def test_table_engine(self):
+        # 有线程时不使用快速循环
+        with mock.patch.object(athread.THREAD_SCHEDULER, 'has_thread',
+                               return_value=True):
+            self.assertDeepRecursion()
+
+    def test_switch_engine(self):
+        with mock.patch.object(aconfig, 'VM_ENGINE', 'switch'):
+            self.assertDeepRecursion()
+
+    def test_overflow(self):
+        for engine in ('table', 'switch'):
+            with self.subTest(engine=engine), \
+                    mock.patch.object(aconfig, 'VM_ENGINE', engine):
+                why, out = run_source(_OVERFLOW_SOURCE)
+
+                # AIL 的 RecursionError, 而不是 Python 的 RecursionError
+                self.assertIn(why, (WHY_ERROR, WHY_HANDLING_ERR))
+                self.assertGreater(out.count('in f'), 5000)
+
+                # 出错后解释器仍然可用
+                self.assertEqual(run_source('print 1\n')[1], '1 \n')
+
+
+_CLASS_SOURCE = '''
+class A {
+    fun hi(self) {
+        return 'A.hi'
+    }
+}
+
+class B extends A {
+    z = 0
+}
+
+class C extends B {}
+
+b = B()
+c = C()
+bound = b.hi
+print b.hi(), c.hi()
+
+A.hi = fun (self) {
+    return 'A.hi2'
+}
+print b.hi(), c.hi(), bound()
+
+B.hi = fun (self) {
+    return 'B.hi'
+}
+print b.hi(), c.hi(), A().hi()
+
+b.hi = 'own'
+print b.hi, c.hi()
+
+for (i = 0; i < 3; i += 1) {
+    A.n = i
+    print c.n, C().n
+}
+'''
+
+# 替换基类的方法后, 已有的对象 (包括子类的对象) 取到新的方法,
+# 替换前取到的绑定方法不变
+_CLASS_OUTPUT = (
+    'A.hi A.hi \n'
+    'A.hi2 A.hi2 A.hi \n'
+    'B.hi B.hi A.hi2 \n'
+    'own B.hi \n'
+    '0 0 \n'
+    '1 1 \n'
+    '2 2 \n'
+)
+
+
+def _value(obj):
+    return obj['__value__'] if isinstance(obj, AILObject) else obj
+
+
+class ClassAttributeCacheTest(unittest.TestCase):
+    def test_rebind_through_base_class(self):
+        for engine in ('table', 'switch'):
+            with self.subTest(engine=engine), \
+                    mock.patch.object(aconfig, 'VM_ENGINE', engine):
+                self.assertEqual(run_source(_CLASS_SOURCE)[1], _CLASS_OUTPUT)
+
+    def test_touch_class(self):
+        base = new_class('Base', [CLASS_OBJECT],
+                         {'x': convert_to_ail_object(1)})
+        sub = new_class('Sub', [base], {})
+
+        self.assertEqual(_value(class_getattr(sub, 'x')), 1)
+
+        # 绕过 class_setattr 修改 __dict__ 后需要 touch_class
+        base['__dict__']['x'] = convert_to_ail_object(2)
+        touch_class(base)
+        self.assertEqual(_value(class_getattr(sub, 'x')), 2)
+
+        class_setattr(base, 'x', convert_to_ail_object(3))
+        self.assertEqual(_value(class_getattr(sub, 'x')), 3)
+        self.assertEqual(_value(class_getattr(base, 'x')), 3)
+
+    def test_class_without_class_init(self):
+        cls = AILObject()
+        cls['__mro__'] = [cls]
+        cls['__dict__'] = {'x': convert_to_ail_object(1)}
+
+        self.assertEqual(_value(class_getattr(cls, 'x')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()